@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:21
+
+import accounts.models
+import wikitunes.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_rename_role_socialrole_alter_account_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='bio_text',
+            field=wikitunes.fields.HybridTextField(blank=True, file_field='bio', help_text='Bio, stored inline when small enough.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='bio',
+            field=models.FileField(blank=True, help_text='File containing uploaded bio.', upload_to=accounts.models.text_dir_path),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.contrib.auth.hashers import make_password, check_password
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from wikitunes.fields import HybridTextField
+
 
 def dynamic_dir_path(instance, filename, folder):
     """
@@ -86,7 +88,8 @@ class Account(User):
     )
     height = models.PositiveIntegerField(null=True, help_text="height of image in pixel/cm/mm.")
     width = models.PositiveIntegerField(null=True, help_text="width of image in pixel/cm/mm.")
-    bio = models.FileField(upload_to=text_dir_path, help_text="File containing uploaded bio.")
+    bio = models.FileField(upload_to=text_dir_path, blank=True, help_text="File containing uploaded bio.")
+    bio_text = HybridTextField(file_field='bio', help_text="Bio, stored inline when small enough.")
     reg_device_ip = models.GenericIPAddressField(
         protocol = 'both',
         unpack_ipv4 = False,
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytics'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from content.models import SiteReaction
+        from .ingest import event_buffer
+        from .models import METRIC_MODELS, View
+        from .trending import record_events, record_reaction
+        from .visitors import record_views
+
+        event_buffer.listen(View, record_views)
+        for metric, model in METRIC_MODELS.items():
+            event_buffer.listen(model, record_events(metric))
+        post_save.connect(record_reaction, sender=SiteReaction)
@@ -0,0 +1,106 @@
+"""
+HyperLogLog cardinality sketches.
+
+A sketch estimates the number of distinct values added to it with a fixed amount of
+memory (2 ** precision one-byte registers, 4 KB at the default precision of 12, for
+a standard error of about 1.6%). Sketches of the same precision merge losslessly,
+so the distinct count of a union of sets is the estimate of their merged sketches.
+
+Counts use the improved estimator of Otmar Ertl ("New cardinality estimation
+algorithms for HyperLogLog sketches", 2017), computed from the histogram of the
+register values. It needs neither the linear counting switch nor the empirical
+bias tables of HyperLogLog++ and stays unbiased from empty sketches to large
+cardinalities.
+"""
+import hashlib
+import math
+
+PRECISION = 12
+
+
+def sigma(x):
+    """
+    Correction term of the empty registers, x being their fraction (below 1).
+    """
+    y = 1.0
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def tau(x):
+    """
+    Correction term of the saturated registers, 1 - x being their fraction.
+    """
+    if x == 0 or x == 1:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    def __init__(self, registers=None, precision=PRECISION):
+        """
+        Parameters:
+            registers (bytes): Registers of a stored sketch, an empty sketch when omitted.
+            precision (int): Number of hash bits selecting the register (4 to 16).
+        """
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f"A sketch of precision {precision} has {self.size} registers.")
+
+    def add(self, value):
+        """
+        Adds a value (e.g. a visitor identifier) to the sketch.
+        """
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remaining = (hashed << self.precision) & 0xFFFFFFFFFFFFFFFF
+        # Position of the leftmost 1 bit in the bits not used by the index.
+        rank = min(64 - remaining.bit_length() + 1, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """
+        Adds all the values of another sketch of the same precision to this one.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Only sketches of the same precision can be merged.")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """
+        Returns the estimated number of distinct values added.
+        """
+        size = self.size
+        bits = 64 - self.precision
+        histogram = [0] * (bits + 2)
+        for register in self.registers:
+            histogram[register] += 1
+        if histogram[0] == size:
+            return 0
+        z = size * tau(1 - histogram[bits + 1] / size)
+        for rank in range(bits, 0, -1):
+            z = 0.5 * (z + histogram[rank])
+        z += size * sigma(histogram[0] / size)
+        return round(size * size / (2 * math.log(2) * z))
+
+    def __bytes__(self):
+        return bytes(self.registers)
@@ -0,0 +1,215 @@
+"""
+Buffered ingestion of analytics events.
+
+Recording an event with enqueue() only queues an unsaved model instance (e.g. a
+research.SearchHistory row, see research.searchlog) in a bounded per-process
+buffer. A background thread writes the queued events with one
+bulk_create per model whenever BATCH_SIZE events are waiting or FLUSH_INTERVAL
+seconds have passed, and the buffer is flushed when the process exits.
+
+When the writer cannot keep up and the queue is full, enqueue() waits at most
+BLOCK_TIMEOUT seconds for room (backpressure) and then drops the event, counting
+it in `dropped`, rather than slowing requests down any further.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+STOP = object()
+
+
+class EventBuffer:
+    """
+    Bounded queue of unsaved model instances written in batches by a background thread.
+    """
+    def __init__(self, max_queue, batch_size, flush_interval, block_timeout):
+        """
+        Parameters:
+            max_queue (int): Maximum number of queued events.
+            batch_size (int): Number of queued events triggering a write.
+            flush_interval (float): Maximum delay in seconds before a queued event is written.
+            block_timeout (float): Time in seconds enqueue() waits for room in a full queue.
+        """
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.lock = threading.Lock()
+        self.pid = None
+        self.queue = None
+        self.thread = None
+        self.preparers = {}
+        self.listeners = {}
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def prepare(self, model, callback):
+        """
+        Registers `callback(instances)`, called in the writer thread with every batch of
+        `model` events before it is written (e.g. to resolve deferred lookups).
+        """
+        self.preparers.setdefault(model, []).append(callback)
+
+    def listen(self, model, callback):
+        """
+        Registers `callback(instances)`, called with every batch of `model` events once written.
+        """
+        self.listeners.setdefault(model, []).append(callback)
+
+    def start(self):
+        """
+        Starts the writer thread of the current process (again after a fork).
+        """
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.queue = queue.Queue(maxsize=self.max_queue)
+            self.thread = threading.Thread(target=self.run, name='analytics-ingest', daemon=True)
+            self.thread.start()
+
+    def submit(self, instance):
+        """
+        Queues an unsaved instance.
+
+        Returns:
+            bool: False if the event was dropped because the queue stayed full.
+        """
+        if self.pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put(instance, timeout=self.block_timeout)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.accepted += 1
+        return True
+
+    def take_batch(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                instance = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if instance is not STOP:
+                batch.append(instance)
+        return batch
+
+    def run(self):
+        while True:
+            first = self.queue.get()
+            if first is STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    instance = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if instance is STOP:
+                    self.write_from_thread(batch)
+                    return
+                batch.append(instance)
+            self.write_from_thread(batch)
+
+    def write_from_thread(self, batch):
+        # The writer thread keeps its connection between batches, unlike requests
+        # nothing else closes it once too old or broken.
+        close_old_connections()
+        self.write(batch)
+
+    def write(self, batch):
+        """
+        Writes a batch of events with one bulk_create per model.
+        """
+        by_model = {}
+        for instance in batch:
+            by_model.setdefault(type(instance), []).append(instance)
+        for model, instances in by_model.items():
+            try:
+                for callback in self.preparers.get(model, []):
+                    callback(instances)
+                model.objects.bulk_create(instances, batch_size=self.batch_size)
+            except Exception:
+                logger.exception("Writing %d %s events failed.", len(instances), model.__name__)
+                with self.lock:
+                    self.failed += len(instances)
+                continue
+            with self.lock:
+                self.written += len(instances)
+            for callback in self.listeners.get(model, []):
+                try:
+                    callback(instances)
+                except Exception:
+                    logger.exception("Processing %d written %s events failed.", len(instances), model.__name__)
+
+    def flush(self):
+        """
+        Writes every queued event now, from the calling thread.
+        """
+        if self.queue is None or self.pid != os.getpid():
+            return
+        while batch := self.take_batch(self.batch_size):
+            self.write(batch)
+
+    def shutdown(self, timeout=5):
+        """
+        Stops the writer thread once it wrote the batch it is collecting, then flushes the queue.
+        """
+        if self.thread is None or self.pid != os.getpid():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'queued': self.queue.qsize() if self.queue is not None else 0,
+                'accepted': self.accepted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+
+event_buffer = EventBuffer(
+    max_queue=settings.ANALYTICS_INGEST['MAX_QUEUE'],
+    batch_size=settings.ANALYTICS_INGEST['BATCH_SIZE'],
+    flush_interval=settings.ANALYTICS_INGEST['FLUSH_INTERVAL'],
+    block_timeout=settings.ANALYTICS_INGEST['BLOCK_TIMEOUT'],
+)
+atexit.register(event_buffer.shutdown)
+
+
+def enqueue(instance):
+    """
+    Queues an unsaved model instance for the background writer (or writes it now in SYNC mode).
+
+    Returns:
+        bool: False if the instance was dropped because the ingestion buffer is overloaded.
+    """
+    if settings.ANALYTICS_INGEST['SYNC']:
+        event_buffer.write([instance])
+        return True
+    return event_buffer.submit(instance)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analytics.trending import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Forgets the items whose trending score decayed away and rebuilds the precomputed top-K "
+        "trending listings. Meant to be run every few minutes."
+    )
+
+    def handle(self, *args, **options):
+        forgotten, written = compact()
+        self.stdout.write(f"{forgotten} decayed items forgotten, {written} listing entries written.")
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from analytics.partitions import (
+    PARTITIONED_TABLES,
+    add_months,
+    create_partition,
+    is_supported,
+    month_start,
+    partitions,
+    purge_default,
+    remove_partition,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the monthly partitions of the analytics event tables ahead of time and detaches/drops "
+        "the partitions older than the retention window. Meant to be run daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.ANALYTICS_PARTITIONS['MONTHS_AHEAD'],
+            help="Number of future months to create partitions for.",
+        )
+        parser.add_argument(
+            '--retention', type=int, default=settings.ANALYTICS_PARTITIONS['RETENTION_MONTHS'],
+            help="Number of past months of events kept (0 keeps everything).",
+        )
+        parser.add_argument(
+            '--detach-only', action='store_true',
+            help="Detach expired partitions without dropping them (e.g. to archive them first).",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be done.")
+
+    def handle(self, *args, **options):
+        if not is_supported(connection):
+            self.stdout.write("Analytics tables are only partitioned on PostgreSQL, nothing to do.")
+            return
+
+        current = month_start(timezone.now())
+        cutoff = add_months(current, -options['retention']) if options['retention'] else None
+        for table in PARTITIONED_TABLES:
+            with transaction.atomic(), connection.cursor() as cursor:
+                existing = partitions(cursor, table)
+                for offset in range(options['ahead'] + 1):
+                    month = add_months(current, offset)
+                    if month in existing:
+                        continue
+                    if not options['dry_run']:
+                        create_partition(cursor, connection.ops.quote_name, table, month)
+                    self.stdout.write(f"{table}: partition for {month:%Y-%m} created.")
+                if cutoff is None:
+                    continue
+                for month, name in sorted(existing.items()):
+                    if month >= cutoff:
+                        break
+                    if not options['dry_run']:
+                        remove_partition(cursor, connection.ops.quote_name, table, name, drop=not options['detach_only'])
+                    action = "detached" if options['detach_only'] else "dropped"
+                    self.stdout.write(f"{table}: partition {name} {action}.")
+                if not options['dry_run'] and not options['detach_only']:
+                    purged = purge_default(cursor, connection.ops.quote_name, table, cutoff)
+                    if purged:
+                        self.stdout.write(f"{table}: {purged} expired events deleted from the default partition.")
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from analytics.models import METRIC_MODELS
+from analytics.rollups import roll_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Counts the analytics events received since the last run into the hourly and daily rollup "
+        "tables. Meant to be run periodically (e.g. every few minutes from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Number of event ids per transaction.")
+        parser.add_argument(
+            '--lag', type=int, default=300,
+            help="Seconds during which new events are left to the next run (default: 300).",
+        )
+
+    def handle(self, *args, **options):
+        for metric in METRIC_MODELS:
+            rolled_up = roll_up(metric, chunk_size=options['chunk_size'], lag=timedelta(seconds=options['lag']))
+            self.stdout.write(f"{metric}: {rolled_up} events rolled up.")
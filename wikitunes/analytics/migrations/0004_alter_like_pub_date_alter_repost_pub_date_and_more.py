@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_alter_like_user_alter_repost_user_alter_share_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='like',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date when the analytics data was published.'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date when the analytics data was published.'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date when the analytics data was published.'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='pub_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Date when the analytics data was published.'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_alter_like_pub_date_alter_repost_pub_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('view', 'Views'), ('like', 'Likes'), ('share', 'Shares'), ('repost', 'Reposts')], help_text='Kind of event counted.', max_length=10, unique=True)),
+                ('last_id', models.PositiveBigIntegerField(default=0, help_text='Id of the last event rolled up.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp of the last rollup run.')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('view', 'Views'), ('like', 'Likes'), ('share', 'Shares'), ('repost', 'Reposts')], help_text='Kind of event counted.', max_length=10)),
+                ('target_type', models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], help_text='Type of the target.')),
+                ('target_id', models.PositiveBigIntegerField(help_text='Primary key of the target.')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], help_text='Length of the bucket.', max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day counted.')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Number of events in the bucket.')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'target_type', 'target_id', 'granularity', 'bucket'), name='unique_event_rollup')],
+            },
+        ),
+    ]
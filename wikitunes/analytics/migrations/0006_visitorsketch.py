@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_rollupwatermark_eventrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitorSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], help_text='Type of the target.')),
+                ('target_id', models.PositiveBigIntegerField(help_text='Primary key of the target.')),
+                ('day', models.DateField(help_text='Day of the views.')),
+                ('registers', models.BinaryField(help_text='Registers of the HyperLogLog sketch.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp of the last merged view.')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('target_type', 'target_id', 'day'), name='unique_visitor_sketch')],
+            },
+        ),
+    ]
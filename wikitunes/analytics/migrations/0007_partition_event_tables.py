@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:41
+
+from django.db import migrations
+
+from analytics.partitions import is_supported, partition_table
+
+MONTHS_AHEAD = 3
+
+
+def partition_event_tables(apps, schema_editor):
+    # Native range partitioning is PostgreSQL only, other databases keep plain tables.
+    if not is_supported(schema_editor.connection):
+        return
+    for model_name in ('View', 'Like', 'Share', 'Repost'):
+        partition_table(schema_editor, apps.get_model('analytics', model_name), MONTHS_AHEAD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_visitorsketch'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_event_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,311 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# TARGET_TYPES of the analytics models when the target keys were added.
+TARGET_TYPES = [
+    (1, 'post'),
+    (2, 'blog'),
+    (3, 'forum'),
+    (4, 'event'),
+    (5, 'article'),
+]
+
+
+def fill_target_keys(apps, schema_editor):
+    for model_name in ('View', 'Like', 'Share', 'Repost'):
+        model = apps.get_model('analytics', model_name)
+        # In the order of TARGET_TYPES, the first foreign key set is the target.
+        for target_type, name in TARGET_TYPES:
+            model.objects.filter(target_type__isnull=True, **{f'{name}__isnull': False}).update(
+                target_type=target_type,
+                target_id=models.F(f'{name}_id'),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_account_bio_text_alter_account_bio'),
+        ('analytics', '0007_partition_event_tables'),
+        ('content', '0009_mediaindex'),
+        ('forums', '0003_forum_description_text_alter_forum_description'),
+        ('research', '0002_alter_searchhistory_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='target_id',
+            field=models.PositiveBigIntegerField(editable=False, help_text='Primary key of the target.', null=True),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], editable=False, help_text='Type of the target (post, blog, forum, event or article).', null=True),
+        ),
+        migrations.AddField(
+            model_name='repost',
+            name='target_id',
+            field=models.PositiveBigIntegerField(editable=False, help_text='Primary key of the target.', null=True),
+        ),
+        migrations.AddField(
+            model_name='repost',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], editable=False, help_text='Type of the target (post, blog, forum, event or article).', null=True),
+        ),
+        migrations.AddField(
+            model_name='share',
+            name='target_id',
+            field=models.PositiveBigIntegerField(editable=False, help_text='Primary key of the target.', null=True),
+        ),
+        migrations.AddField(
+            model_name='share',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], editable=False, help_text='Type of the target (post, blog, forum, event or article).', null=True),
+        ),
+        migrations.AddField(
+            model_name='view',
+            name='target_id',
+            field=models.PositiveBigIntegerField(editable=False, help_text='Primary key of the target.', null=True),
+        ),
+        migrations.AddField(
+            model_name='view',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], editable=False, help_text='Type of the target (post, blog, forum, event or article).', null=True),
+        ),
+        migrations.RunPython(fill_target_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='like',
+            name='article',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated article.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.article'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='blog',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated blog.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.blog'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='event',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated event.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.event'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='forum',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated forum.', null=True, on_delete=django.db.models.deletion.CASCADE, to='forums.forum'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated post.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated user.', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.visitor'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='article',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated article.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.article'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='blog',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated blog.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.blog'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='event',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated event.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.event'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='forum',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated forum.', null=True, on_delete=django.db.models.deletion.CASCADE, to='forums.forum'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated post.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='repost',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated user.', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.visitor'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='article',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated article.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.article'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='blog',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated blog.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.blog'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='event',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated event.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.event'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='forum',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated forum.', null=True, on_delete=django.db.models.deletion.CASCADE, to='forums.forum'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated post.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='share',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated user.', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.visitor'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='article',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated article.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.article'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='blog',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated blog.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.blog'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='event',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated event.', null=True, on_delete=django.db.models.deletion.CASCADE, to='research.event'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='forum',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated forum.', null=True, on_delete=django.db.models.deletion.CASCADE, to='forums.forum'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='post',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated post.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.post'),
+        ),
+        migrations.AlterField(
+            model_name='view',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Associated user.', null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.visitor'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['target_type', 'target_id', 'pub_date'], include=('id',), name='analytics_like_target'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('post__isnull', False)), fields=['post'], name='analytics_like_post'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('blog__isnull', False)), fields=['blog'], name='analytics_like_blog'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('forum__isnull', False)), fields=['forum'], name='analytics_like_forum'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('event__isnull', False)), fields=['event'], name='analytics_like_event'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('article__isnull', False)), fields=['article'], name='analytics_like_article'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['user'], name='analytics_like_user'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(fields=['target_type', 'target_id', 'pub_date'], include=('id',), name='analytics_repost_target'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('post__isnull', False)), fields=['post'], name='analytics_repost_post'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('blog__isnull', False)), fields=['blog'], name='analytics_repost_blog'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('forum__isnull', False)), fields=['forum'], name='analytics_repost_forum'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('event__isnull', False)), fields=['event'], name='analytics_repost_event'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('article__isnull', False)), fields=['article'], name='analytics_repost_article'),
+        ),
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['user'], name='analytics_repost_user'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(fields=['target_type', 'target_id', 'pub_date'], include=('id',), name='analytics_share_target'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('post__isnull', False)), fields=['post'], name='analytics_share_post'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('blog__isnull', False)), fields=['blog'], name='analytics_share_blog'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('forum__isnull', False)), fields=['forum'], name='analytics_share_forum'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('event__isnull', False)), fields=['event'], name='analytics_share_event'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('article__isnull', False)), fields=['article'], name='analytics_share_article'),
+        ),
+        migrations.AddIndex(
+            model_name='share',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['user'], name='analytics_share_user'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(fields=['target_type', 'target_id', 'pub_date'], include=('id',), name='analytics_view_target'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('post__isnull', False)), fields=['post'], name='analytics_view_post'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('blog__isnull', False)), fields=['blog'], name='analytics_view_blog'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('forum__isnull', False)), fields=['forum'], name='analytics_view_forum'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('event__isnull', False)), fields=['event'], name='analytics_view_event'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('article__isnull', False)), fields=['article'], name='analytics_view_article'),
+        ),
+        migrations.AddIndex(
+            model_name='view',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['user'], name='analytics_view_user'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_event_target_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing', models.CharField(help_text="Listing of the entry: 'all', 'type:<type>', 'category:<post category>' or 'tag:<tag slug>'.", max_length=120)),
+                ('rank', models.PositiveIntegerField(help_text='Position in the listing, starting at 1.')),
+                ('target_type', models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], help_text='Type of the target.')),
+                ('target_id', models.PositiveBigIntegerField(help_text='Primary key of the target.')),
+                ('log_score', models.FloatField(help_text='Logarithm of the score at the reference epoch.')),
+            ],
+            options={
+                'ordering': ['listing', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'rank'), name='unique_trending_entry')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.PositiveSmallIntegerField(choices=[(1, 'post'), (2, 'blog'), (3, 'forum'), (4, 'event'), (5, 'article')], help_text='Type of the target.')),
+                ('target_id', models.PositiveBigIntegerField(help_text='Primary key of the target.')),
+                ('log_score', models.FloatField(help_text='Logarithm of the score at the reference epoch.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp of the last event counted.')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('target_type', 'target_id'), name='unique_trending_score')],
+            },
+        ),
+    ]
@@ -6,6 +6,56 @@ from content.models import Post
 from forums.models import Forum
 from research.models import Blog, Event, Article
 
+TARGET_TYPES = [
+    (1, 'post'),
+    (2, 'blog'),
+    (3, 'forum'),
+    (4, 'event'),
+    (5, 'article'),
+]
+
+# Foreign key of BaseAnalyticsModel holding each type of target, `user` is the actor of an event
+TARGET_FIELDS = {target_type: name for target_type, name in TARGET_TYPES}
+
+METRICS = [
+    ('view', 'Views'),
+    ('like', 'Likes'),
+    ('share', 'Shares'),
+    ('repost', 'Reposts'),
+]
+
+class TargetTypeField(models.PositiveSmallIntegerField):
+    """
+    Type of the target of an event, derived from its target foreign keys whenever the
+    row is written (bulk_create included).
+    """
+    def pre_save(self, model_instance, add):
+        target = model_instance.target
+        value = target[0] if target else None
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def deconstruct(self):
+        # Only the value written differs, migrations store a plain integer field.
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.PositiveSmallIntegerField', args, kwargs
+
+
+class TargetIdField(models.PositiveBigIntegerField):
+    """
+    Primary key of the target of an event, derived like TargetTypeField.
+    """
+    def pre_save(self, model_instance, add):
+        target = model_instance.target
+        value = target[1] if target else None
+        setattr(model_instance, self.attname, value)
+        return value
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.PositiveBigIntegerField', args, kwargs
+
+
 class  BaseAnalyticsModel(models.Model):
     """
     Base model for analytics models.
@@ -15,6 +65,7 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_index=False,
         help_text="Associated post."
     )
     
@@ -23,6 +74,7 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,   
         blank=True,
+        db_index=False,
         help_text="Associated blog."
     )
     
@@ -31,6 +83,7 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_index=False,
         help_text="Associated forum."
     )
     
@@ -39,6 +92,7 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_index=False,
         help_text="Associated event."
     )
     
@@ -47,6 +101,7 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_index=False,
         help_text="Associated article."
     )
     
@@ -55,13 +110,49 @@ class  BaseAnalyticsModel(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_index=False,
         help_text="Associated user."
     )
     
-    pub_date = models.DateTimeField(auto_now=True, help_text="Date when the analytics data was published.")
+    pub_date = models.DateTimeField(default=timezone.now, help_text="Date when the analytics data was published.")
+
+    # Compact key of the target, so that the events of any target are found with one index range scan
+    target_type = TargetTypeField(
+        choices=TARGET_TYPES,
+        null=True,
+        editable=False,
+        help_text="Type of the target (post, blog, forum, event or article)."
+    )
+    target_id = TargetIdField(null=True, editable=False, help_text="Primary key of the target.")
     
     class Meta:
         abstract = True
+        indexes = [
+            models.Index(
+                fields=['target_type', 'target_id', 'pub_date'],
+                include=['id'],
+                name='%(app_label)s_%(class)s_target',
+            ),
+        ] + [
+            # Only the rows referencing an object, for the cascades when it is deleted.
+            models.Index(
+                fields=[name],
+                condition=models.Q(**{f'{name}__isnull': False}),
+                name=f'%(app_label)s_%(class)s_{name}',
+            )
+            for name in ['post', 'blog', 'forum', 'event', 'article', 'user']
+        ]
+
+    @property
+    def target(self):
+        """
+        Returns (target_type, target_id) of the event, None when it has no target.
+        """
+        for target_type, name in TARGET_FIELDS.items():
+            target_id = getattr(self, f'{name}_id')
+            if target_id is not None:
+                return target_type, target_id
+        return None
 
 
 class Repost(BaseAnalyticsModel):
@@ -102,4 +193,120 @@ class View(BaseAnalyticsModel):
     ip_address = models.GenericIPAddressField(help_text="IP address of the device.")
     
     def __str__(self):
-        return f"Views: {self.count}"
\ No newline at end of file
+        return f"Views: {self.count}"
+
+
+METRIC_MODELS = {
+    'view': View,
+    'like': Like,
+    'share': Share,
+    'repost': Repost,
+}
+
+
+class EventRollup(models.Model):
+    """
+    Number of analytics events of one metric received by one target during an hour or a day.
+
+    Filled incrementally by the `rollup_analytics` management command (see analytics.rollups).
+    """
+    GRANULARITIES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    metric = models.CharField(max_length=10, choices=METRICS, help_text="Kind of event counted.")
+    target_type = models.PositiveSmallIntegerField(choices=TARGET_TYPES, help_text="Type of the target.")
+    target_id = models.PositiveBigIntegerField(help_text="Primary key of the target.")
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES, help_text="Length of the bucket.")
+    bucket = models.DateTimeField(help_text="Start of the hour/day counted.")
+    count = models.PositiveIntegerField(default=0, help_text="Number of events in the bucket.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'target_type', 'target_id', 'granularity', 'bucket'],
+                name='unique_event_rollup',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} of {self.get_target_type_display()} {self.target_id} at {self.bucket}: {self.count}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Highest event id of a metric already counted in the rollups.
+    """
+    metric = models.CharField(max_length=10, choices=METRICS, unique=True, help_text="Kind of event counted.")
+    last_id = models.PositiveBigIntegerField(default=0, help_text="Id of the last event rolled up.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last rollup run.")
+
+    def __str__(self):
+        return f"{self.metric} rolled up to {self.last_id}"
+
+
+class VisitorSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct visitors (users, or IP addresses of anonymous
+    visitors) who viewed one target during one day (see analytics.visitors).
+    """
+    target_type = models.PositiveSmallIntegerField(choices=TARGET_TYPES, help_text="Type of the target.")
+    target_id = models.PositiveBigIntegerField(help_text="Primary key of the target.")
+    day = models.DateField(help_text="Day of the views.")
+    registers = models.BinaryField(editable=False, help_text="Registers of the HyperLogLog sketch.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last merged view.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target_type', 'target_id', 'day'], name='unique_visitor_sketch'),
+        ]
+
+    def __str__(self):
+        return f"visitors of {self.get_target_type_display()} {self.target_id} on {self.day}"
+
+
+class TrendingScore(models.Model):
+    """
+    Exponentially decayed popularity of a post, blog or article (see analytics.trending).
+
+    The score is kept as its natural logarithm relative to a fixed reference epoch,
+    so that adding an event never needs to decay the stored scores and the rows can
+    be ranked by `log_score` directly.
+    """
+    target_type = models.PositiveSmallIntegerField(choices=TARGET_TYPES, help_text="Type of the target.")
+    target_id = models.PositiveBigIntegerField(help_text="Primary key of the target.")
+    log_score = models.FloatField(help_text="Logarithm of the score at the reference epoch.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last event counted.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target_type', 'target_id'], name='unique_trending_score'),
+        ]
+
+    def __str__(self):
+        return f"trending score of {self.get_target_type_display()} {self.target_id}"
+
+
+class TrendingEntry(models.Model):
+    """
+    Precomputed position of an item in a trending listing, rebuilt by the
+    `compact_trending` management command.
+    """
+    listing = models.CharField(
+        max_length=120,
+        help_text="Listing of the entry: 'all', 'type:<type>', 'category:<post category>' or 'tag:<tag slug>'."
+    )
+    rank = models.PositiveIntegerField(help_text="Position in the listing, starting at 1.")
+    target_type = models.PositiveSmallIntegerField(choices=TARGET_TYPES, help_text="Type of the target.")
+    target_id = models.PositiveBigIntegerField(help_text="Primary key of the target.")
+    log_score = models.FloatField(help_text="Logarithm of the score at the reference epoch.")
+
+    class Meta:
+        ordering = ['listing', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'rank'], name='unique_trending_entry'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} of {self.listing}: {self.get_target_type_display()} {self.target_id}"
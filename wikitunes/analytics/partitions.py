@@ -0,0 +1,158 @@
+"""
+Monthly range partitioning of the analytics event tables on pub_date (PostgreSQL only).
+
+Each event table is a partitioned table with one partition per month named
+`<table>_pYYYYMM`, plus a `<table>_default` partition catching events outside the
+created months. The primary key of a partitioned table must contain the partition
+key, so it is (id, pub_date) in the database while Django keeps using `id`.
+
+Partitions are created ahead of time and old ones are detached/dropped by the
+`manage_partitions` management command, so removing old events is a metadata
+operation instead of a DELETE. Only the expired rows that landed in the default
+partition are deleted row by row.
+"""
+import re
+from datetime import date, datetime, timezone
+
+PARTITIONED_TABLES = ['analytics_view', 'analytics_like', 'analytics_share', 'analytics_repost']
+
+PARTITION_RE = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def is_supported(connection):
+    return connection.vendor == 'postgresql'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month.year:04d}{month.month:02d}'
+
+
+def partitions(cursor, table):
+    """
+    Returns the monthly partitions of `table` as {first day of the month: partition name}.
+    """
+    cursor.execute(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [table],
+    )
+    months = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_RE.search(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def create_partition(cursor, quote_name, table, month):
+    """
+    Creates the partition of `table` for `month`, moving the rows of that month out of
+    the default partition first (PostgreSQL refuses to attach a partition otherwise).
+
+    Returns:
+        bool: False if the partition already existed.
+    """
+    if month in partitions(cursor, table):
+        return False
+    name = partition_name(table, month)
+    bounds = [month_bound(month), month_bound(add_months(month, 1))]
+    cursor.execute(
+        f'CREATE TABLE {quote_name(name)} (LIKE {quote_name(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+    )
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {quote_name(table + "_default")} '
+        f'WHERE pub_date >= %s AND pub_date < %s RETURNING *) '
+        f'INSERT INTO {quote_name(name)} SELECT * FROM moved',
+        bounds,
+    )
+    cursor.execute(
+        f'ALTER TABLE {quote_name(table)} ATTACH PARTITION {quote_name(name)} FOR VALUES FROM (%s) TO (%s)',
+        bounds,
+    )
+    return True
+
+
+def remove_partition(cursor, quote_name, table, name, drop=True):
+    """
+    Detaches a partition from `table`, and drops it unless `drop` is False.
+    """
+    cursor.execute(f'ALTER TABLE {quote_name(table)} DETACH PARTITION {quote_name(name)}')
+    if drop:
+        cursor.execute(f'DROP TABLE {quote_name(name)}')
+
+
+def purge_default(cursor, quote_name, table, cutoff):
+    """
+    Deletes the events older than `cutoff` from the default partition of `table`.
+
+    Returns:
+        int: Number of events deleted.
+    """
+    cursor.execute(
+        f'DELETE FROM {quote_name(table + "_default")} WHERE pub_date < %s',
+        [month_bound(cutoff)],
+    )
+    return cursor.rowcount
+
+
+def partition_table(schema_editor, model, months_ahead):
+    """
+    Converts the plain table of an analytics model into a partitioned table holding
+    the same rows, with monthly partitions from its oldest event to `months_ahead`
+    months from now.
+    """
+    quote_name = schema_editor.quote_name
+    table = model._meta.db_table
+    legacy = f'{table}_unpartitioned'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(pub_date) FROM {quote_name(table)}')
+        oldest = cursor.fetchone()[0]
+        cursor.execute(f'ALTER TABLE {quote_name(table)} RENAME TO {quote_name(legacy)}')
+        cursor.execute(
+            f'CREATE TABLE {quote_name(table)} (LIKE {quote_name(legacy)} '
+            f'INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) PARTITION BY RANGE (pub_date)'
+        )
+        cursor.execute(
+            f'CREATE TABLE {quote_name(table + "_default")} PARTITION OF {quote_name(table)} DEFAULT'
+        )
+        current = month_start(datetime.now(timezone.utc))
+        month = month_start(oldest) if oldest is not None else current
+        while month <= add_months(current, months_ahead):
+            create_partition(cursor, quote_name, table, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(legacy)}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) "
+            f"FROM {quote_name(table)}",
+            [table],
+        )
+        # The indexes and constraints of the old table keep their names until it is dropped.
+        cursor.execute(f'DROP TABLE {quote_name(legacy)}')
+        cursor.execute(
+            f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(table + "_pkey")} '
+            f'PRIMARY KEY (id, pub_date)'
+        )
+
+    for field in model._meta.local_concrete_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+        if field.db_index and not field.primary_key:
+            schema_editor.execute(schema_editor._create_index_sql(model, fields=[field]))
@@ -0,0 +1,170 @@
+"""
+Hourly/daily rollups of the analytics events and time-series queries over them.
+
+roll_up() counts the events newer than the watermark of a metric into EventRollup
+buckets and moves the watermark forward, so every run only reads new events.
+series() answers from the rollups and adds the events not rolled up yet (the
+tail past the watermark), so results are always complete.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import METRIC_MODELS, EventRollup, RollupWatermark
+
+TRUNCATE = {
+    'hour': TruncHour,
+    'day': TruncDay,
+}
+
+
+def count_events(events, granularity):
+    """
+    Counts `events` per target and bucket.
+
+    Returns:
+        dict: Count by ((target_type, target_id), bucket).
+    """
+    rows = (
+        events.filter(target_type__isnull=False)
+        .order_by()
+        .values('target_type', 'target_id', bucket=TRUNCATE[granularity]('pub_date'))
+        .annotate(count=Count('id'))
+    )
+    return {((row['target_type'], row['target_id']), row['bucket']): row['count'] for row in rows}
+
+
+def add_counts(metric, granularity, counts):
+    """
+    Adds counts to the rollup buckets, creating the missing ones.
+    """
+    if not counts:
+        return
+    buckets = [bucket for _, bucket in counts]
+    existing = EventRollup.objects.filter(
+        metric=metric,
+        granularity=granularity,
+        bucket__range=(min(buckets), max(buckets)),
+    )
+    by_key = {((rollup.target_type, rollup.target_id), rollup.bucket): rollup for rollup in existing}
+    updated, created = [], []
+    for key, count in counts.items():
+        rollup = by_key.get(key)
+        if rollup is None:
+            (target_type, target_id), bucket = key
+            created.append(EventRollup(
+                metric=metric,
+                target_type=target_type,
+                target_id=target_id,
+                granularity=granularity,
+                bucket=bucket,
+                count=count,
+            ))
+        else:
+            rollup.count += count
+            updated.append(rollup)
+    EventRollup.objects.bulk_update(updated, ['count'], batch_size=1000)
+    EventRollup.objects.bulk_create(created, batch_size=1000)
+
+
+def roll_up(metric, chunk_size=50000, lag=timedelta(minutes=5)):
+    """
+    Counts the events of `metric` received since the last run into the hourly and daily rollups.
+
+    Parameters:
+        metric (str): 'view', 'like', 'share' or 'repost'.
+        chunk_size (int): Number of event ids processed per transaction.
+        lag (timedelta): Events younger than this are left to the next run, so that
+            transactions still inserting lower ids have committed.
+
+    Returns:
+        int: Number of events rolled up.
+    """
+    model = METRIC_MODELS[metric]
+    settled = model.objects.filter(pub_date__lt=timezone.now() - lag)
+    rolled_up = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(metric=metric)
+            upper = settled.filter(
+                id__gt=watermark.last_id,
+                id__lte=watermark.last_id + chunk_size,
+            ).aggregate(upper=Max('id'))['upper']
+            if upper is None:
+                # No settled event in this id range, jump over the gap if there are later ones.
+                following = settled.filter(id__gt=watermark.last_id).aggregate(following=Min('id'))['following']
+                if following is None:
+                    return rolled_up
+                upper = following
+            events = model.objects.filter(id__gt=watermark.last_id, id__lte=upper)
+            for granularity in TRUNCATE:
+                add_counts(metric, granularity, count_events(events, granularity))
+            rolled_up += events.count()
+            watermark.last_id = upper
+            watermark.save(update_fields=['last_id', 'updated_at'])
+
+
+def truncate(moment, granularity):
+    moment = timezone.localtime(moment)
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def next_bucket(bucket, granularity):
+    if granularity == 'day':
+        # Days are 23 to 25 hours long around DST changes.
+        return truncate(bucket + timedelta(hours=25), 'day')
+    return timezone.localtime(bucket.astimezone(dt_timezone.utc) + timedelta(hours=1))
+
+
+def series(metric, target_type, target_id, start, end, granularity='day'):
+    """
+    Returns the number of events of one target per hour or day.
+
+    The buckets come from the rollups, with the events past the watermark counted from
+    the raw table. `start` and `end` are rounded down to bucket boundaries.
+
+    Parameters:
+        metric (str): 'view', 'like', 'share' or 'repost'.
+        target_type (int): One of TARGET_TYPES (e.g. 1 for posts).
+        target_id (int): Primary key of the target.
+        start (datetime): First bucket of the series.
+        end (datetime): End of the series (excluded).
+        granularity (str): 'hour' or 'day'.
+
+    Returns:
+        list: (bucket start, count) for every bucket of the range, including empty ones.
+    """
+    start, end = truncate(start, granularity), truncate(end, granularity)
+    counts = dict(
+        EventRollup.objects.filter(
+            metric=metric,
+            target_type=target_type,
+            target_id=target_id,
+            granularity=granularity,
+            bucket__gte=start,
+            bucket__lt=end,
+        ).values_list('bucket', 'count')
+    )
+
+    last_id = RollupWatermark.objects.filter(metric=metric).values_list('last_id', flat=True).first() or 0
+    tail = METRIC_MODELS[metric].objects.filter(
+        target_type=target_type,
+        target_id=target_id,
+        pub_date__gte=start,
+        pub_date__lt=end,
+        id__gt=last_id,
+    )
+    for (_, bucket), count in count_events(tail, granularity).items():
+        counts[bucket] = counts.get(bucket, 0) + count
+
+    result = []
+    bucket = start
+    while bucket < end:
+        result.append((bucket, counts.get(bucket, 0)))
+        bucket = next_bucket(bucket, granularity)
+    return result
@@ -1,3 +1,287 @@
-from django.test import TestCase
+import os
+import queue
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account, Visitor
+from content.models import Post, Tag
+from forums.models import Forum
+
+from .hll import HyperLogLog
+from .ingest import EventBuffer, enqueue
+from .models import EventRollup, RollupWatermark, Share, TrendingEntry, TrendingScore, View
+from .rollups import roll_up, series
+from .trending import add_scores, compact, log_weight, trending
+from .visitors import unique_visitors
+
+
+@skipUnless(connection.vendor == 'postgresql', "Event tables are only partitioned on PostgreSQL.")
+class PartitionTests(TestCase):
+    def setUp(self):
+        self.visitor = Visitor.objects.create(username='visitor')
+
+    def rows_by_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT tableoid::regclass::text, count(*) FROM analytics_share GROUP BY 1")
+            return dict(cursor.fetchall())
+
+    def test_events_are_stored_in_their_month(self):
+        now = timezone.now()
+        Share.objects.create(user=self.visitor, where='here', pub_date=now)
+        partition = f'analytics_share_p{now:%Y%m}'
+        self.assertEqual(self.rows_by_partition(), {partition: 1})
+
+    def test_manage_partitions_moves_future_and_purges_expired_default_rows(self):
+        now = timezone.now()
+        Share.objects.create(user=self.visitor, where='future', pub_date=now + timedelta(days=250))
+        Share.objects.create(user=self.visitor, where='expired', pub_date=now - timedelta(days=2000))
+        self.assertEqual(self.rows_by_partition(), {'analytics_share_default': 2})
+
+        call_command('manage_partitions', '--ahead', '9', '--retention', '12', stdout=StringIO())
+
+        self.assertEqual(list(Share.objects.values_list('where', flat=True)), ['future'])
+        self.assertNotIn('analytics_share_default', self.rows_by_partition())
+
+
+class TrendingViewTests(TestCase):
+    def test_rejects_limits_below_one(self):
+        for limit in ('0', '-1'):
+            response = self.client.get(reverse('trending'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_lists_without_limit(self):
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'listing': 'all', 'results': []})
+
+
+class EventBufferTests(TestCase):
+    def setUp(self):
+        self.visitor = Visitor.objects.create(username='visitor')
+        self.buffer = EventBuffer(max_queue=3, batch_size=2, flush_interval=0.1, block_timeout=0)
+        # Queue without a writer thread, the events are only written by flush().
+        self.buffer.pid = os.getpid()
+        self.buffer.queue = queue.Queue(maxsize=self.buffer.max_queue)
+
+    def share(self, where):
+        return Share(user=self.visitor, where=where)
+
+    def test_flush_writes_the_queued_events(self):
+        written = []
+        self.buffer.listen(Share, written.extend)
+        for where in ('a', 'b', 'c'):
+            self.assertTrue(self.buffer.submit(self.share(where)))
+        self.buffer.flush()
+        self.assertEqual(sorted(Share.objects.values_list('where', flat=True)), ['a', 'b', 'c'])
+        self.assertEqual(sorted(share.where for share in written), ['a', 'b', 'c'])
+        self.assertEqual(self.buffer.stats(), {'queued': 0, 'accepted': 3, 'written': 3, 'dropped': 0, 'failed': 0})
+
+    def test_events_are_dropped_when_the_queue_is_full(self):
+        for where in ('a', 'b', 'c'):
+            self.buffer.submit(self.share(where))
+        self.assertFalse(self.buffer.submit(self.share('d')))
+        self.assertEqual(self.buffer.stats()['dropped'], 1)
+
+    def test_failed_batches_are_counted(self):
+        def fail(instances):
+            raise ValueError
+        self.buffer.prepare(Share, fail)
+        self.buffer.submit(self.share('a'))
+        with self.assertLogs('analytics.ingest'):
+            self.buffer.flush()
+        self.assertEqual((self.buffer.stats()['failed'], Share.objects.count()), (1, 0))
+
+
+# The events are written by the writer thread, which must see the committed visitor.
+class EventBufferThreadTests(TransactionTestCase):
+    def test_shutdown_writes_the_pending_events(self):
+        visitor = Visitor.objects.create(username='visitor')
+        buffer = EventBuffer(max_queue=10, batch_size=5, flush_interval=60, block_timeout=1)
+        for where in ('a', 'b'):
+            buffer.submit(Share(user=visitor, where=where))
+        buffer.shutdown()
+        self.assertFalse(buffer.thread.is_alive())
+        self.assertEqual(Share.objects.count(), 2)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.visitor = Visitor.objects.create(username='visitor')
+        self.post = Post.objects.create(title='Post', account=account)
+        self.day = datetime(2024, 3, 10, tzinfo=dt_timezone.utc)
+
+    def share(self, hours):
+        return Share.objects.create(
+            user=self.visitor, post=self.post, where='here', pub_date=self.day + timedelta(hours=hours)
+        )
+
+    def buckets(self, granularity):
+        rollups = EventRollup.objects.filter(metric='share', granularity=granularity).order_by('bucket')
+        return [(rollup.target_id, rollup.bucket.hour, rollup.count) for rollup in rollups]
+
+    def test_events_are_counted_once_per_bucket(self):
+        for hours in (1, 1, 2, 25):
+            self.share(hours)
+        self.assertEqual(roll_up('share', chunk_size=2), 4)
+        self.assertEqual(self.buckets('hour'), [(self.post.pk, 1, 2), (self.post.pk, 2, 1), (self.post.pk, 1, 1)])
+        self.assertEqual(self.buckets('day'), [(self.post.pk, 0, 3), (self.post.pk, 0, 1)])
+
+        # Later runs only count the new events, into the existing buckets.
+        latest = self.share(2)
+        self.assertEqual(roll_up('share'), 1)
+        self.assertEqual(roll_up('share'), 0)
+        self.assertEqual(self.buckets('day'), [(self.post.pk, 0, 4), (self.post.pk, 0, 1)])
+        self.assertEqual(RollupWatermark.objects.get(metric='share').last_id, latest.pk)
+
+    def test_recent_events_are_left_to_the_next_run(self):
+        Share.objects.create(user=self.visitor, post=self.post, where='here')
+        self.assertEqual(roll_up('share'), 0)
+        self.assertFalse(EventRollup.objects.exists())
+
+    def test_series_adds_the_events_past_the_watermark(self):
+        self.share(1)
+        roll_up('share')
+        self.share(2)
+        self.share(26)
+        days = series('share', 1, self.post.pk, self.day - timedelta(days=1), self.day + timedelta(days=3))
+        self.assertEqual([count for _, count in days], [0, 2, 1, 0])
+        self.assertEqual(days[1][0], self.day)
+        hours = series('share', 1, self.post.pk, self.day, self.day + timedelta(hours=3), 'hour')
+        self.assertEqual([count for _, count in hours], [0, 1, 1])
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def sketch(self, values):
+        sketch = HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def test_counts_are_estimated_within_the_standard_error(self):
+        self.assertEqual(HyperLogLog().count(), 0)
+        self.assertEqual(self.sketch(['a', 'b', 'a']).count(), 2)
+        for cardinality in (1000, 50000):
+            estimate = self.sketch(range(cardinality)).count()
+            self.assertLess(abs(estimate - cardinality) / cardinality, 0.05)
+
+    def test_merged_sketches_count_the_union(self):
+        merged = self.sketch(range(0, 3000)).merge(self.sketch(range(2000, 5000)))
+        self.assertEqual(merged.count(), self.sketch(range(5000)).count())
+
+    def test_registers_are_stored_as_bytes(self):
+        sketch = self.sketch(range(100))
+        self.assertEqual(HyperLogLog(bytes(sketch)).count(), sketch.count())
+        with self.assertRaises(ValueError):
+            HyperLogLog(bytes(16))
+        with self.assertRaises(ValueError):
+            sketch.merge(HyperLogLog(precision=10))
+
+
+@override_settings(ANALYTICS_INGEST={**settings.ANALYTICS_INGEST, 'SYNC': True})
+class UniqueVisitorTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.posts = [Post.objects.create(title=title, account=account) for title in ('First', 'Second')]
+        self.visitor = Visitor.objects.create(username='visitor')
+        self.day = datetime(2024, 3, 10, 12, tzinfo=dt_timezone.utc)
+
+    def view(self, post, days=0, ip_address='10.0.0.1', user=None):
+        enqueue(View(
+            post=post, user=user, device_type='phone', os='android', browser='firefox',
+            ip_address=ip_address, pub_date=self.day + timedelta(days=days),
+        ))
+
+    def test_written_views_are_added_to_the_sketches(self):
+        first, second = self.posts
+        self.view(first, ip_address='10.0.0.1')
+        self.view(first, ip_address='10.0.0.2')
+        self.view(first, ip_address='10.0.0.1')
+        self.view(first, days=1, user=self.visitor)
+        self.view(second, ip_address='10.0.0.2')
+
+        day = self.day.date()
+        self.assertEqual(unique_visitors([(1, first.pk)], day, day), 2)
+        self.assertEqual(unique_visitors([(1, first.pk)], day, day + timedelta(days=1)), 3)
+        # The same visitor of several targets is counted once.
+        self.assertEqual(unique_visitors([(1, first.pk), (1, second.pk)], day, day), 2)
+        self.assertEqual(unique_visitors([(1, second.pk)], day + timedelta(days=1), day + timedelta(days=7)), 0)
+
+
+class TargetKeyTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.visitor = Visitor.objects.create(username='visitor')
+        self.post = Post.objects.create(title='Post', account=account)
+        self.forum = Forum.objects.create(title='Forum', account=account)
+
+    def test_target_keys_are_written_with_the_events(self):
+        created = Share.objects.create(user=self.visitor, forum=self.forum, where='here')
+        Share.objects.bulk_create([
+            Share(user=self.visitor, post=self.post, where='bulk'),
+            Share(user=self.visitor, where='nowhere'),
+        ])
+        self.assertEqual((created.target_type, created.target_id), (3, self.forum.pk))
+        self.assertEqual(
+            set(Share.objects.values_list('where', 'target_type', 'target_id')),
+            {('here', 3, self.forum.pk), ('bulk', 1, self.post.pk), ('nowhere', None, None)},
+        )
+
+    def test_target_keys_follow_changed_targets(self):
+        share = Share.objects.create(user=self.visitor, post=self.post, where='here')
+        share.post, share.forum = None, self.forum
+        share.save()
+        share.refresh_from_db()
+        self.assertEqual(share.target, (3, self.forum.pk))
+        self.assertEqual((share.target_type, share.target_id), (3, self.forum.pk))
+
+
+@override_settings(TRENDING={**settings.TRENDING, 'TOP_K': 2})
+class TrendingCompactionTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.now = timezone.now()
+        self.posts = {}
+        for title, category, score in (('A', 'CAT_1', 10), ('B', 'CAT_1', 5), ('C', 'CAT_2', 1)):
+            post = Post.objects.create(title=title, category=category, account=account)
+            add_scores({(1, post.pk): log_weight(score, self.now)})
+            self.posts[title] = post
+        jazz = Tag.objects.create(name='Jazz', slug='jazz')
+        self.posts['A'].tags.add(jazz)
+        self.posts['C'].tags.add(jazz)
+        add_scores({(2, 99): log_weight(7, self.now)})
+        add_scores({(1, 1000): log_weight(0.001, self.now)})
+
+    def listing(self, listing):
+        return [(item['type'], item['id']) for item in trending(listing)]
+
+    def test_listings_are_rebuilt_with_the_top_items(self):
+        TrendingEntry.objects.create(listing='tag:gone', rank=1, target_type=1, target_id=1, log_score=0)
+        self.assertEqual(compact(self.now), (1, 10))
+
+        a, b, c = (self.posts[title].pk for title in 'ABC')
+        self.assertEqual(self.listing('all'), [('post', a), ('blog', 99)])
+        self.assertEqual(self.listing('type:post'), [('post', a), ('post', b)])
+        self.assertEqual(self.listing('type:blog'), [('blog', 99)])
+        self.assertEqual(self.listing('category:CAT_1'), [('post', a), ('post', b)])
+        self.assertEqual(self.listing('category:CAT_2'), [('post', c)])
+        self.assertEqual(self.listing('tag:jazz'), [('post', a), ('post', c)])
+        self.assertEqual(self.listing('tag:gone'), [])
+        self.assertFalse(TrendingScore.objects.filter(target_id=1000).exists())
+        self.assertEqual([item['rank'] for item in trending('all')], [1, 2])
@@ -0,0 +1,205 @@
+"""
+Time-decayed trending ranking of posts, blogs and articles.
+
+Every view, like, share, repost and reaction star adds its weight to the score of
+its target, and scores halve every HALF_LIFE. Decaying every stored score all the
+time is avoided by storing, per item, the logarithm of its score at a fixed
+reference epoch:
+
+    log_score = ln(sum of weight * exp(rate * (event time - REFERENCE_EPOCH)))
+
+Adding an event is a single log-add-exp UPDATE, and ordering by log_score is the
+ordering by current score since all scores decay by the same factor. The listings
+served to clients are precomputed by compact() (the `compact_trending` command).
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from content.models import Post
+from research.models import Article, Blog
+
+from .models import TrendingEntry, TrendingScore
+
+REFERENCE_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+TRENDING_TYPES = {
+    1: 'post',
+    2: 'blog',
+    5: 'article',
+}
+
+
+def decay_rate():
+    return math.log(2) / settings.TRENDING['HALF_LIFE'].total_seconds()
+
+
+def log_weight(weight, moment):
+    """
+    Returns the contribution of an event of `weight` at `moment`, in the log_score scale.
+    """
+    return math.log(weight) + decay_rate() * (moment - REFERENCE_EPOCH).total_seconds()
+
+
+def log_add(first, second):
+    return max(first, second) + math.log1p(math.exp(-abs(first - second)))
+
+
+def current_score(log_score, now=None):
+    """
+    Converts a stored log_score into the decayed score at `now`.
+    """
+    now = now or timezone.now()
+    return math.exp(log_score - decay_rate() * (now - REFERENCE_EPOCH).total_seconds())
+
+
+def add_scores(contributions):
+    """
+    Adds contributions to the stored scores.
+
+    Parameters:
+        contributions (dict): log_score contribution by (target_type, target_id).
+    """
+    for (target_type, target_id), contribution in contributions.items():
+        scores = TrendingScore.objects.filter(target_type=target_type, target_id=target_id)
+        # ln(e^a + e^b) computed in the database, so that concurrent writers never lose an event.
+        added = Greatest(F('log_score'), Value(contribution)) + Ln(
+            Value(1.0) + Exp(-Abs(F('log_score') - Value(contribution)))
+        )
+        if scores.update(log_score=added):
+            continue
+        try:
+            with transaction.atomic():
+                TrendingScore.objects.create(target_type=target_type, target_id=target_id, log_score=contribution)
+        except IntegrityError:
+            scores.update(log_score=added)
+
+
+def record_events(metric):
+    """
+    Returns the ingestion listener adding the written `metric` events to the scores.
+    """
+    def record(instances):
+        weight = settings.TRENDING['WEIGHTS'][metric]
+        contributions = {}
+        for instance in instances:
+            if instance.target_type not in TRENDING_TYPES:
+                continue
+            target = (instance.target_type, instance.target_id)
+            contribution = log_weight(weight, instance.pub_date)
+            contributions[target] = log_add(contributions[target], contribution) if target in contributions else contribution
+        add_scores(contributions)
+    return record
+
+
+def record_reaction(sender, instance, created, raw=False, **kwargs):
+    """
+    Adds the stars of a new reaction to the score of its post.
+    """
+    if raw or not created or instance.num_star <= 0:
+        return
+    weight = settings.TRENDING['WEIGHTS']['star'] * instance.num_star
+    add_scores({(1, instance.post_id): log_weight(weight, timezone.now())})
+
+
+def membership_queries(quote):
+    """
+    Returns the SELECTs giving the (listing, target_type, target_id, log_score) rows of
+    every listing the scored items belong to.
+    """
+    types = ' '.join(f"WHEN {target_type} THEN '{name}'" for target_type, name in TRENDING_TYPES.items())
+    queries = [
+        "SELECT 'all' AS listing, target_type, target_id, log_score FROM scores",
+        f"SELECT 'type:' || CASE target_type {types} END, target_type, target_id, log_score FROM scores",
+        f"""
+        SELECT 'category:' || post.{quote('category')}, target_type, target_id, log_score
+        FROM scores JOIN {quote(Post._meta.db_table)} post ON post.{quote(Post._meta.pk.column)} = target_id
+        WHERE target_type = 1
+        """,
+    ]
+    for target_type, model in ((1, Post), (2, Blog), (5, Article)):
+        through = model.tags.through
+        item = through._meta.get_field(model._meta.model_name).column
+        tag_model = through._meta.get_field('tag').related_model
+        queries.append(f"""
+        SELECT 'tag:' || tag.{quote('slug')}, target_type, target_id, log_score
+        FROM scores
+        JOIN {quote(through._meta.db_table)} tagged ON tagged.{quote(item)} = target_id
+        JOIN {quote(tag_model._meta.db_table)} tag ON tag.{quote(tag_model._meta.pk.column)} = tagged.{quote('tag_id')}
+        WHERE target_type = {target_type}
+        """)
+    return ' UNION ALL '.join(queries)
+
+
+def compact(now=None):
+    """
+    Forgets the items whose score decayed below MIN_SCORE and rebuilds the top-K of every listing.
+
+    Both steps run in the database: the listings are ranked with a window function and
+    written with a single INSERT ... SELECT, whatever the number of scored items.
+
+    Returns:
+        tuple: (number of forgotten items, number of listing entries written)
+    """
+    now = now or timezone.now()
+    config = settings.TRENDING
+    threshold = math.log(config['MIN_SCORE']) + decay_rate() * (now - REFERENCE_EPOCH).total_seconds()
+    quote = connection.ops.quote_name
+    scores = quote(TrendingScore._meta.db_table)
+    entries = quote(TrendingEntry._meta.db_table)
+    kinds = ', '.join(str(target_type) for target_type in TRENDING_TYPES)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {scores} WHERE log_score < %s", [threshold])
+        forgotten = cursor.rowcount
+        cursor.execute(f"DELETE FROM {entries}")
+        cursor.execute(
+            f"""
+            INSERT INTO {entries} (listing, {quote('rank')}, target_type, target_id, log_score)
+            WITH scores AS (
+                SELECT target_type, target_id, log_score FROM {scores} WHERE target_type IN ({kinds})
+            ),
+            memberships AS ({membership_queries(quote)}),
+            ranked AS (
+                SELECT
+                    SUBSTR(listing, 1, 120) AS listing, target_type, target_id, log_score,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY SUBSTR(listing, 1, 120) ORDER BY log_score DESC, target_type, target_id
+                    ) AS position
+                FROM memberships
+                WHERE listing IS NOT NULL
+            )
+            SELECT listing, position, target_type, target_id, log_score FROM ranked WHERE position <= %s
+            """,
+            [config['TOP_K']],
+        )
+        written = cursor.rowcount
+    return forgotten, written
+
+
+def trending(listing='all', limit=None):
+    """
+    Returns the precomputed top items of a listing.
+
+    Parameters:
+        listing (str): 'all', 'type:<post|blog|article>', 'category:<post category>' or 'tag:<tag slug>'.
+        limit (int): Maximum number of items (TOP_K at most).
+
+    Returns:
+        list: Dicts with the type, id, rank and current score of every item.
+    """
+    limit = min(limit or settings.TRENDING['TOP_K'], settings.TRENDING['TOP_K'])
+    now = timezone.now()
+    return [
+        {
+            'type': TRENDING_TYPES[entry.target_type],
+            'id': entry.target_id,
+            'rank': entry.rank,
+            'score': current_score(entry.log_score, now),
+        }
+        for entry in TrendingEntry.objects.filter(listing=listing).order_by('rank')[:limit]
+    ]
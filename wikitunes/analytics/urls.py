@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import trending
+
+urlpatterns = [
+    path('trending', trending, name='trending'),
+]
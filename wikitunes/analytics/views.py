@@ -1,3 +1,29 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
 
-# Create your views here.
+from .trending import trending as trending_items
+
+
+@require_safe
+def trending(request):
+    """
+    Returns the trending posts, blogs and articles, optionally of one type, post category or tag.
+
+    Query parameters: `type` (post, blog or article), `category` (post category), `tag`
+    (tag slug) and `limit`. The listing is read from the precomputed trending entries.
+    """
+    if request.GET.get('tag'):
+        listing = f"tag:{request.GET['tag']}"
+    elif request.GET.get('category'):
+        listing = f"category:{request.GET['category']}"
+    elif request.GET.get('type'):
+        listing = f"type:{request.GET['type']}"
+    else:
+        listing = 'all'
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'detail': "limit must be an integer."}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'detail': "limit must be at least 1."}, status=400)
+    return JsonResponse({'listing': listing, 'results': trending_items(listing, limit)})
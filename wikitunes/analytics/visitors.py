@@ -0,0 +1,68 @@
+"""
+Unique visitor estimates per target, from daily HyperLogLog sketches.
+
+Views are added to the sketch of their target and day when the ingestion buffer
+writes them, so counting unique visitors never scans analytics.View. Sketches of
+several days and/or targets are merged for weekly or monthly figures.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import VisitorSketch
+
+
+def visitor_key(view):
+    if view.user_id is not None:
+        return f'user:{view.user_id}'
+    return f'ip:{view.ip_address}'
+
+
+def record_views(views):
+    """
+    Adds the visitors of freshly written views to the sketches of their target and day.
+    """
+    sketches = {}
+    for view in views:
+        if view.target_type is None:
+            continue
+        day = timezone.localdate(view.pub_date)
+        target = (view.target_type, view.target_id)
+        sketches.setdefault((target, day), HyperLogLog()).add(visitor_key(view))
+
+    for ((target_type, target_id), day), sketch in sketches.items():
+        with transaction.atomic():
+            stored, created = VisitorSketch.objects.select_for_update().get_or_create(
+                target_type=target_type,
+                target_id=target_id,
+                day=day,
+                defaults={'registers': bytes(sketch)},
+            )
+            if not created:
+                stored.registers = bytes(sketch.merge(HyperLogLog(stored.registers)))
+                stored.save(update_fields=['registers', 'updated_at'])
+
+
+def unique_visitors(targets, start, end):
+    """
+    Estimates the number of distinct visitors of some targets over a range of days.
+
+    Parameters:
+        targets (iterable): (target_type, target_id) pairs, e.g. [(1, post.pk)].
+        start (date): First day counted.
+        end (date): Last day counted (included).
+
+    Returns:
+        int: Estimated number of distinct visitors across all the targets and days.
+    """
+    merged = HyperLogLog()
+    targets = list(targets)
+    for target_type in {target_type for target_type, _ in targets}:
+        sketches = VisitorSketch.objects.filter(
+            target_type=target_type,
+            target_id__in=[target_id for kind, target_id in targets if kind == target_type],
+            day__range=(start, end),
+        )
+        for registers in sketches.values_list('registers', flat=True).iterator():
+            merged.merge(HyperLogLog(registers))
+    return merged.count()
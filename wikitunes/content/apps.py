@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'content'
+
+    def ready(self):
+        from . import signals
+        from .derivatives import connect_signals
+
+        connect_signals()
+        signals.connect_tag_counters()
+        signals.connect_related_changes()
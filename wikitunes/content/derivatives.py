@@ -0,0 +1,276 @@
+"""
+Background pipeline generating resized/WebP renditions of uploaded images.
+
+After an image is uploaded (or replaced), its renditions are rendered by a pool of
+worker processes (content.imaging) and recorded as ImageDerivative rows. Pages
+pick the best rendition for a display width with derivative_url().
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .imaging import render_derivatives
+from .models import ImageDerivative
+
+logger = logging.getLogger(__name__)
+
+# Renditions are rewritten in place by the workers, gc_media_blobs --adopt skips them.
+DERIVATIVE_DIR = 'derivatives'
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        # Workers only import content.imaging, spawn keeps them independent of the web process threads.
+        executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_DERIVATIVES['WORKERS'],
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return executor
+
+
+def derivative_fields():
+    """
+    Yields (model, field name) for every image field renditions are generated for.
+    """
+    for label, field_name in settings.IMAGE_DERIVATIVES['FIELDS'].items():
+        yield apps.get_model(label), field_name
+
+
+def derivative_name(instance, field_name, width, image_format):
+    source = os.path.splitext(os.path.basename(getattr(instance, field_name).name))[0]
+    return (
+        f"{DERIVATIVE_DIR}/{instance._meta.label_lower}/{instance.pk}/"
+        f"{field_name}/{source}_{width}.{image_format}"
+    )
+
+
+def schedule_derivatives(instance, field_name):
+    """
+    Submits the rendering of the renditions of `instance.<field_name>` to the worker pool.
+
+    Returns:
+        Future or None: The pending rendering, None when there is nothing to render.
+    """
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        return None
+    config = settings.IMAGE_DERIVATIVES
+    targets = [
+        (width, image_format, default_storage.path(derivative_name(instance, field_name, width, image_format)))
+        for width in config['WIDTHS']
+        for image_format in config['FORMATS']
+    ]
+    future = get_executor().submit(render_derivatives, fieldfile.path, targets, config['QUALITY'])
+    content_type = ContentType.objects.get_for_model(instance, for_concrete_model=False)
+    future.add_done_callback(
+        lambda done: record_derivatives(done, content_type, instance.pk, field_name, fieldfile.name)
+    )
+    return future
+
+
+def record_derivatives(future, content_type, object_id, field_name, source_name):
+    """
+    Done callback of a rendering: stores its renditions, logging failures.
+
+    It runs in the result thread of the executor (or in the submitting thread when
+    the rendering already finished), whose database connection no request closes.
+    """
+    try:
+        rendered = future.result()
+    except Exception:
+        logger.exception("Rendering derivatives of %s %s failed.", content_type, object_id)
+        return
+    try:
+        store_derivatives(rendered, content_type, object_id, field_name, source_name)
+    except Exception:
+        logger.exception("Recording derivatives of %s %s failed.", content_type, object_id)
+    finally:
+        # Within an atomic block, the callback runs in a submitting thread still using it.
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def store_derivatives(rendered, content_type, object_id, field_name, source_name):
+    """
+    Stores the renditions rendered by a worker, replacing those of a previous original.
+
+    Renditions of an original that is no longer current (replaced again or its owner
+    deleted while the worker was rendering) are discarded, so a slow render finishing
+    after a newer one never replaces the newer renditions.
+    """
+    media_root = str(settings.MEDIA_ROOT)
+    for rendition in rendered:
+        rendition['name'] = os.path.relpath(rendition['path'], media_root)
+    owner = content_type.model_class()._base_manager.filter(pk=object_id)
+    owned = ImageDerivative.objects.filter(content_type=content_type, object_id=object_id, field_name=field_name)
+    with transaction.atomic():
+        # Locking the owner orders this against concurrent replacements of the original.
+        current = owner.select_for_update().values_list(field_name, flat=True).first()
+        if current != source_name:
+            names = [rendition['name'] for rendition in rendered]
+            recorded = set(ImageDerivative.objects.filter(file__in=names).values_list('file', flat=True))
+            discarded = [name for name in names if name not in recorded]
+            stale = []
+        else:
+            discarded = []
+            stale = list(owned.exclude(source_name=source_name))
+            owned.filter(pk__in=[derivative.pk for derivative in stale]).delete()
+            for rendition in rendered:
+                ImageDerivative.objects.update_or_create(
+                    content_type=content_type,
+                    object_id=object_id,
+                    field_name=field_name,
+                    width=rendition['width'],
+                    format=rendition['format'],
+                    defaults={
+                        'source_name': source_name,
+                        'height': rendition['height'],
+                        'file': rendition['name'],
+                        'size': rendition['size'],
+                    },
+                )
+    for derivative in stale:
+        derivative.file.delete(save=False)
+    for name in discarded:
+        default_storage.delete(name)
+
+
+def delete_derivatives(content_type, object_id):
+    """
+    Deletes the renditions of every image field of an object, rows and files.
+    """
+    derivatives = list(ImageDerivative.objects.filter(content_type=content_type, object_id=object_id))
+    ImageDerivative.objects.filter(pk__in=[derivative.pk for derivative in derivatives]).delete()
+    for derivative in derivatives:
+        derivative.file.delete(save=False)
+
+
+def best_derivative(derivatives, width, image_format):
+    """
+    Picks the narrowest rendition at least `width` pixels wide, or the widest one available.
+
+    Parameters:
+        derivatives (iterable): ImageDerivative rows of one image field.
+        width (int): Display width in pixels.
+        image_format (str): Preferred encoding ('webp' or 'jpeg').
+
+    Returns:
+        ImageDerivative or None
+    """
+    candidates = sorted((d for d in derivatives if d.format == image_format), key=lambda d: d.width)
+    for derivative in candidates:
+        if derivative.width >= width:
+            return derivative
+    return candidates[-1] if candidates else None
+
+
+def derivative_url(instance, field_name, width, image_format='webp'):
+    """
+    Returns the URL of the best rendition of `instance.<field_name>` for a display width,
+    falling back to the original when no rendition is available (yet).
+
+    Parameters:
+        instance: Object owning the image (e.g. an Image, Account, Article or Blog).
+        field_name (str): Name of the image field.
+        width (int): Display width in pixels.
+        image_format (str): Preferred encoding, 'webp' unless the client does not accept it.
+
+    Returns:
+        str: URL of the rendition or of the original, '' when no image is set.
+    """
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        return ''
+    if getattr(instance, '_prefetched_derivatives', None) is not None:
+        derivatives = instance._prefetched_derivatives
+    else:
+        derivatives = ImageDerivative.objects.filter(
+            content_type=ContentType.objects.get_for_model(instance, for_concrete_model=False),
+            object_id=instance.pk,
+            field_name=field_name,
+            source_name=fieldfile.name,
+        )
+    derivative = best_derivative(derivatives, width, image_format)
+    if derivative is None or derivative.width < width:
+        # Renditions are only made narrower than the original.
+        return fieldfile.url
+    return derivative.file.url
+
+
+def prefetch_derivatives(instances, field_name):
+    """
+    Loads the renditions of a whole page of objects in one query for derivative_url().
+    """
+    instances = list(instances)
+    if not instances:
+        return instances
+    content_type = ContentType.objects.get_for_model(instances[0], for_concrete_model=False)
+    by_object = {}
+    rows = ImageDerivative.objects.filter(
+        content_type=content_type,
+        object_id__in=[instance.pk for instance in instances],
+        field_name=field_name,
+    )
+    for derivative in rows:
+        by_object.setdefault(derivative.object_id, []).append(derivative)
+    for instance in instances:
+        source_name = getattr(instance, field_name).name
+        instance._prefetched_derivatives = [
+            derivative for derivative in by_object.get(instance.pk, []) if derivative.source_name == source_name
+        ]
+    return instances
+
+
+def remember_sources(sender, instance, **kwargs):
+    """
+    Keeps the name of the originals an object was loaded with, None for deferred fields.
+    """
+    instance._derivative_sources = {
+        field_name: str(instance.__dict__[field_name] or '') if field_name in instance.__dict__ else None
+        for model, field_name in derivative_fields()
+        if isinstance(instance, model)
+    }
+
+
+def image_saved(sender, instance, raw=False, **kwargs):
+    """
+    Schedules the renditions of the originals uploaded or replaced by this save.
+    """
+    if raw:
+        return
+    sources = getattr(instance, '_derivative_sources', {})
+    for model, field_name in derivative_fields():
+        if not isinstance(instance, model) or field_name not in instance.__dict__:
+            continue
+        name = getattr(instance, field_name).name or ''
+        if name and sources.get(field_name, '') not in (None, name):
+            transaction.on_commit(lambda field_name=field_name: schedule_derivatives(instance, field_name))
+        sources[field_name] = name
+    instance._derivative_sources = sources
+
+
+def image_deleted(sender, instance, **kwargs):
+    """
+    Deletes the renditions of a deleted object once the deletion is committed.
+    """
+    content_type = ContentType.objects.get_for_model(instance, for_concrete_model=False)
+    object_id = instance.pk
+    transaction.on_commit(lambda: delete_derivatives(content_type, object_id))
+
+
+def connect_signals():
+    for model in {model for model, field_name in derivative_fields()}:
+        post_init.connect(remember_sources, sender=model)
+        post_save.connect(image_saved, sender=model)
+        post_delete.connect(image_deleted, sender=model)
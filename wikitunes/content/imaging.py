@@ -0,0 +1,59 @@
+"""
+Image rendering run in the derivative worker processes.
+
+This module only depends on Pillow so that it can be imported by worker processes
+that never set Django up.
+"""
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'method': 4},
+    'jpeg': {'format': 'JPEG', 'optimize': True, 'progressive': True},
+}
+
+
+def render_derivatives(source_path, targets, quality):
+    """
+    Renders the resized/re-encoded renditions of one image.
+
+    Parameters:
+        source_path (str): Absolute path of the original image.
+        targets (list): (width, format, absolute output path) of every rendition to render.
+            Renditions wider than the original are skipped.
+        quality (int): Encoder quality (1-100).
+
+    Returns:
+        list: One dict per rendered file with width, height, format, path and size.
+    """
+    rendered = []
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        for width, image_format, output_path in sorted(targets, reverse=True):
+            if width >= original.width:
+                continue
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+            if image_format == 'jpeg' and resized.mode not in ('RGB', 'L'):
+                resized = resized.convert('RGB')
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # Written next to the target and renamed over it: a previous rendition may share
+            # its inode with other media names (content addressed storage).
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(output_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    resized.save(output, quality=quality, **SAVE_OPTIONS[image_format])
+                os.replace(temporary, output_path)
+            except BaseException:
+                os.remove(temporary)
+                raise
+            rendered.append({
+                'width': width,
+                'height': height,
+                'format': image_format,
+                'path': output_path,
+                'size': os.path.getsize(output_path),
+            })
+    return rendered
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from content.derivatives import derivative_fields, schedule_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders the resized/WebP renditions of every image configured in settings.IMAGE_DERIVATIVES "
+        "(e.g. after changing the widths or formats, or for images uploaded before the pipeline existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help="Number of images submitted to the workers before waiting for them to finish.",
+        )
+
+    def handle(self, *args, **options):
+        for model, field_name in derivative_fields():
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            rendered = 0
+            futures = []
+            for instance in queryset.order_by('pk').iterator(chunk_size=options['chunk_size']):
+                future = schedule_derivatives(instance, field_name)
+                if future is not None:
+                    futures.append(future)
+                if len(futures) >= options['chunk_size']:
+                    rendered += self.wait(futures)
+                    futures = []
+            rendered += self.wait(futures)
+            self.stdout.write(f"{model._meta.label}.{field_name}: {rendered} images rendered.")
+
+    def wait(self, futures):
+        done = 0
+        for future in futures:
+            try:
+                future.result()
+                done += 1
+            except Exception as error:
+                self.stderr.write(f"Rendering failed: {error}")
+        return done
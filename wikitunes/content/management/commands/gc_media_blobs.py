@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from content.derivatives import DERIVATIVE_DIR
+from wikitunes.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Removes the media blobs no longer referenced by any file name. With --adopt, first turns "
+        "the files saved before the storage was content addressed into references to their blobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help="Seconds during which a new blob is kept even without references (default: 3600).",
+        )
+        parser.add_argument('--adopt', action='store_true', help="Deduplicate the existing media files first.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed.")
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError("The default storage is not a ContentAddressedStorage.")
+        if options['adopt']:
+            self.adopt(options['dry_run'])
+
+        deadline = time.time() - options['grace']
+        removed = freed = 0
+        for directory, _, files in os.walk(default_storage.blob_root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                # Blobs are only referenced by hard links, temporary files by nothing.
+                unreferenced = filename.endswith('.tmp') or stat.st_nlink <= 1
+                if not unreferenced or stat.st_mtime > deadline:
+                    continue
+                if not options['dry_run']:
+                    os.remove(path)
+                removed += 1
+                freed += stat.st_size
+        self.stdout.write(f"{removed} unreferenced blobs removed, {freed} bytes freed.")
+
+    def adopt(self, dry_run):
+        checked = duplicates = 0
+        # Blobs, and the files written in place (partial uploads, renditions) which must
+        # never share their inode.
+        skipped = {
+            os.path.realpath(path)
+            for path in (
+                default_storage.blob_root,
+                settings.CHUNKED_UPLOAD['TEMP_DIR'],
+                os.path.join(default_storage.location, DERIVATIVE_DIR),
+            )
+        }
+        for directory, subdirectories, files in os.walk(default_storage.location):
+            subdirectories[:] = [
+                subdirectory for subdirectory in subdirectories
+                if os.path.realpath(os.path.join(directory, subdirectory)) not in skipped
+            ]
+            for filename in files:
+                checked += 1
+                if dry_run:
+                    continue
+                name = os.path.relpath(os.path.join(directory, filename), default_storage.location)
+                duplicates += default_storage.adopt(name)
+        self.stdout.write(f"{checked} files checked, {duplicates} duplicates turned into references.")
@@ -0,0 +1,83 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from wikitunes.fields import HybridTextField
+
+
+def hybrid_text_fields():
+    """
+    Yields (model, field) for every HybridTextField of the installed concrete models.
+    """
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, HybridTextField) and field.model is model:
+                yield model, field
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves existing file-backed text bodies (comments, posts, forums, bios) inline into their "
+        "database column, in chunks. Bodies larger than INLINE_TEXT_MAX_SIZE stay in their file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows read and updated per chunk.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between chunks.")
+        parser.add_argument(
+            '--delete-files',
+            action='store_true',
+            help="Clear the file reference and delete the file once a body has been moved inline.",
+        )
+
+    def handle(self, *args, **options):
+        for model, field in hybrid_text_fields():
+            moved = self.inline_bodies(model, field, options)
+            self.stdout.write(f"{model._meta.label}.{field.name}: {moved} bodies moved inline.")
+
+    def inline_bodies(self, model, field, options):
+        manager = model._base_manager
+        pending = manager.filter(**{f'{field.attname}__isnull': True}).exclude(**{field.file_field: ''})
+        last_pk = None
+        moved = 0
+        while True:
+            chunk = pending.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            rows = list(chunk.only('pk', field.file_field)[:options['chunk_size']])
+            if not rows:
+                return moved
+            last_pk = rows[-1].pk
+
+            inlined = []
+            for row in rows:
+                fieldfile = getattr(row, field.file_field)
+                try:
+                    with fieldfile.open('rb') as body:
+                        data = body.read(field.threshold + 1)
+                except OSError as error:
+                    self.stderr.write(f"{model._meta.label} {row.pk}: cannot read {fieldfile.name} ({error}).")
+                    continue
+                if len(data) > field.threshold:
+                    continue
+                setattr(row, field.attname, data.decode('utf-8', errors='replace'))
+                inlined.append(row)
+
+            update_fields = [field.attname]
+            if options['delete_files']:
+                update_fields.append(field.file_field)
+                files = [getattr(row, field.file_field) for row in inlined]
+                names = [(fieldfile.storage, fieldfile.name) for fieldfile in files]
+                for row in inlined:
+                    setattr(row, field.file_field, '')
+            with transaction.atomic():
+                manager.bulk_update(inlined, update_fields)
+            if options['delete_files']:
+                for storage, name in names:
+                    storage.delete(name)
+            moved += len(inlined)
+
+            if options['pause']:
+                time.sleep(options['pause'])
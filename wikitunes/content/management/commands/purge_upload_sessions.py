@@ -0,0 +1,22 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from content.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Deletes the chunked uploads that expired before being completed, along with their partial files."
+
+    def handle(self, *args, **options):
+        expired = UploadSession.objects.filter(expires_at__lt=timezone.now()).exclude(status='complete')
+        purged = 0
+        for session in expired.iterator():
+            try:
+                os.remove(session.part_path)
+            except FileNotFoundError:
+                pass
+            session.delete()
+            purged += 1
+        self.stdout.write(f"{purged} expired uploads purged.")
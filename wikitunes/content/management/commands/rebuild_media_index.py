@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from content.models import MEDIA_MODELS, MediaIndex, refresh_media_tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the denormalized media index from the image, video, audio and document tables. "
+        "Run it whenever media were changed with bulk operations that bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Number of media indexed per transaction.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for model in MEDIA_MODELS.values():
+            indexed = 0
+            last_pk = 0
+            while True:
+                chunk = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    for media in chunk:
+                        MediaIndex.index(media)
+                    refresh_media_tags(media.pk for media in chunk)
+                indexed += len(chunk)
+                last_pk = chunk[-1].pk
+            self.stdout.write(f"{model._meta.label}: {indexed} media indexed.")
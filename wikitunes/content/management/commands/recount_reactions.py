@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from content.models import reaction_models, recount_reactions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the stored reaction/comment counters of posts, comments and forums from scratch. "
+        "Run it whenever reactions or comments were changed with bulk operations that bypass "
+        "model signals."
+    )
+
+    def handle(self, *args, **options):
+        for model in reaction_models():
+            with transaction.atomic():
+                updated = recount_reactions(model)
+            self.stdout.write(f"{model._meta.label}: {updated} rows recounted.")
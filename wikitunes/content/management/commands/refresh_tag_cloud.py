@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from content.models import recount_tags, refresh_tag_cloud
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the precomputed tag cloud listings from the tag counters. Run it periodically, "
+        "with --recount whenever tags were changed with bulk operations that bypass model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help="Recompute the tag counters and popularity from the through tables first.",
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            with transaction.atomic():
+                recounted = recount_tags()
+            self.stdout.write(f"{recounted} tags recounted.")
+        written = refresh_tag_cloud()
+        self.stdout.write(f"{written} tag cloud entries written.")
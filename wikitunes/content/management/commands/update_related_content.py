@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from content.related import update_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies the tag changes recorded since the last run to the related content index "
+        "(tag co-occurrence matrices). Meant to be run every few minutes; the index is built "
+        "from scratch on the first run or with --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild the index from the through tables.")
+
+    def handle(self, *args, **options):
+        applied, items = update_index(full=options['full'])
+        self.stdout.write(f"{applied} tag changes applied, {items} items indexed.")
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:16
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+from content.models import reaction_stat
+
+
+def fill_reaction_counters(apps, schema_editor):
+    SiteReaction = apps.get_model('content', 'SiteReaction')
+    Comment = apps.get_model('content', 'Comment')
+    for model_name, reaction_field, comment_field in [('Post', 'post', 'post'), ('Comment', 'comment', 'parent_comment')]:
+        model = apps.get_model('content', model_name)
+        model.objects.update(
+            reaction_count=reaction_stat(model, SiteReaction, reaction_field, Count('pk'), 0),
+            rating_sum=reaction_stat(model, SiteReaction, reaction_field, Sum('num_star'), 0),
+            comment_count=reaction_stat(model, Comment, comment_field, Count('pk'), 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_alter_comment_user_alter_sitebookmark_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of comments received.'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of the stars of all reactions received.'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of reactions received.'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of comments received.'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of the stars of all reactions received.'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of reactions received.'),
+        ),
+        migrations.RunPython(fill_reaction_counters, migrations.RunPython.noop),
+    ]
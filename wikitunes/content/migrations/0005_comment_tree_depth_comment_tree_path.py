@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+from content.models import tree_segment
+
+
+def fill_tree_paths(apps, schema_editor):
+    """
+    Computes the tree path of existing comments one thread level at a time.
+    """
+    Comment = apps.get_model('content', 'Comment')
+    roots = Comment.objects.filter(parent_comment__isnull=True)
+    for comment in roots.only('pk', 'post_id').iterator(chunk_size=1000):
+        roots.filter(pk=comment.pk).update(tree_path=tree_segment(comment.post_id or 0) + tree_segment(comment.pk))
+
+    while True:
+        level = list(
+            Comment.objects.filter(tree_path='', parent_comment__isnull=False)
+            .exclude(parent_comment__tree_path='')
+            .values_list('pk', 'parent_comment__tree_path', 'parent_comment__tree_depth')[:1000]
+        )
+        if not level:
+            break
+        for pk, parent_path, parent_depth in level:
+            Comment.objects.filter(pk=pk).update(tree_path=parent_path + tree_segment(pk), tree_depth=parent_depth + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0004_comment_comment_count_comment_rating_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='tree_depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Reply depth, 0 for top-level comments.'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='tree_path',
+            field=models.CharField(db_index=True, default='', editable=False, help_text='Materialized path of the comment in its thread (post segment followed by one segment per comment).', max_length=512),
+        ),
+        migrations.RunPython(fill_tree_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:20
+
+import content.models
+import wikitunes.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_comment_tree_depth_comment_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='message_text',
+            field=wikitunes.fields.HybridTextField(blank=True, file_field='message', help_text='Content of the comment, stored inline when small enough.', null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='description_text',
+            field=wikitunes.fields.HybridTextField(blank=True, file_field='description', help_text='Post content, stored inline when small enough.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='message',
+            field=models.FileField(blank=True, help_text='Content of the comment.', upload_to=content.models.user_comment_dir_path),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='description',
+            field=models.FileField(blank=True, help_text='File describing the post content.', upload_to=content.models.acc_data_desc_dir_path),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0006_comment_message_text_post_description_text_and_more'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(help_text='Primary key of the object owning the original image.')),
+                ('field_name', models.CharField(help_text='Name of the image field of the original.', max_length=50)),
+                ('source_name', models.CharField(help_text='Storage name of the original the rendition was made from.', max_length=255)),
+                ('width', models.PositiveIntegerField(help_text='Width of the rendition in pixels.')),
+                ('height', models.PositiveIntegerField(help_text='Height of the rendition in pixels.')),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], help_text='Encoding of the rendition.', max_length=10)),
+                ('file', models.FileField(help_text='File containing the rendition.', max_length=255, upload_to='')),
+                ('size', models.PositiveIntegerField(help_text='Size of the rendition in bytes.')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the rendition was generated.')),
+                ('content_type', models.ForeignKey(help_text='Model of the object owning the original image.', on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'ordering': ['width'],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'field_name', 'width', 'format'), name='unique_image_derivative')],
+            },
+        ),
+    ]
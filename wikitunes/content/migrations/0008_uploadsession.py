@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:27
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0007_imagederivative'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Token identifying the upload.', primary_key=True, serialize=False)),
+                ('media_type', models.CharField(choices=[('video', 'Video'), ('audio', 'Audio'), ('document', 'Document')], help_text='Type of media created once complete.', max_length=10)),
+                ('title', models.CharField(help_text='Title of the media.', max_length=50)),
+                ('filename', models.CharField(help_text='Original name of the uploaded file.', max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Declared size of the file in bytes.')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Number of bytes received so far.')),
+                ('checksum', models.CharField(blank=True, help_text='Hex SHA-256 of the file, declared by the client or computed once complete.', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('complete', 'Complete'), ('aborted', 'Aborted')], default='pending', help_text='State of the upload.', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the upload was started.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp of the last received chunk.')),
+                ('expires_at', models.DateTimeField(help_text='Timestamp after which an unfinished upload is discarded.')),
+                ('account', models.ForeignKey(help_text='Account uploading the file.', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('comment', models.ForeignKey(blank=True, help_text='Associated comment for the media.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.comment')),
+                ('media', models.OneToOneField(blank=True, help_text='Media created from the completed upload.', null=True, on_delete=django.db.models.deletion.SET_NULL, to='content.media')),
+                ('post', models.ForeignKey(blank=True, help_text='Associated post for the media.', null=True, on_delete=django.db.models.deletion.CASCADE, to='content.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='content_upl_status_eb088c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_media_index(apps, schema_editor):
+    """
+    Indexes the existing images, videos, audios and documents.
+    """
+    Media = apps.get_model('content', 'Media')
+    MediaIndex = apps.get_model('content', 'MediaIndex')
+    tags = {}
+    for media_id, slug in Media.tags.through.objects.order_by('tag__slug').values_list('media_id', 'tag__slug'):
+        tags.setdefault(media_id, []).append(slug)
+    for model_name in ('image', 'video', 'audio', 'document'):
+        entries = []
+        for media in apps.get_model('content', model_name).objects.iterator(chunk_size=500):
+            try:
+                size = media.upload.size if media.upload else None
+            except OSError:
+                size = None
+            entries.append(MediaIndex(
+                media_id=media.pk,
+                media_type=media.media_type,
+                media_model=model_name,
+                post_id=media.post_id,
+                comment_id=media.comment_id,
+                title=media.title,
+                path=media.upload.name or '',
+                size=size,
+                width=getattr(media, 'width', None),
+                height=getattr(media, 'height', None),
+                tags=tags.get(media.pk, []),
+                is_valid=media.is_valid,
+                uploaded_at=media.uploaded_at,
+            ))
+        MediaIndex.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaIndex',
+            fields=[
+                ('media', models.OneToOneField(help_text='Indexed media.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='index_entry', serialize=False, to='content.media')),
+                ('media_type', models.CharField(choices=[('image', 'Image'), ('video', 'Video'), ('audio', 'Audio'), ('document', 'Document')], help_text='Type of media.', max_length=10)),
+                ('media_model', models.CharField(help_text='Model name of the concrete Image/Video/Audio/Document, the class the row is loaded as.', max_length=20)),
+                ('title', models.CharField(help_text='Title of the media.', max_length=50)),
+                ('path', models.CharField(blank=True, help_text='Storage name of the uploaded file.', max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Size of the uploaded file in bytes.', null=True)),
+                ('width', models.PositiveIntegerField(help_text='Width of an image in pixels.', null=True)),
+                ('height', models.PositiveIntegerField(help_text='Height of an image in pixels.', null=True)),
+                ('tags', models.JSONField(blank=True, default=list, help_text='Slugs of the tags of the media.')),
+                ('is_valid', models.BooleanField(default=True, help_text='Indicates if the media is valid.')),
+                ('uploaded_at', models.DateTimeField(help_text='Upload timestamp.')),
+                ('comment', models.ForeignKey(help_text='Associated comment of the media.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.comment')),
+                ('post', models.ForeignKey(help_text='Associated post of the media.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.post')),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+                'indexes': [models.Index(fields=['post', 'media_type'], name='content_med_post_id_d91683_idx'), models.Index(fields=['comment', 'media_type'], name='content_med_comment_947efb_idx')],
+            },
+        ),
+        migrations.RunPython(fill_media_index, migrations.RunPython.noop),
+    ]
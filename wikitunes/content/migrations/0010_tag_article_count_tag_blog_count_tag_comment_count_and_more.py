@@ -0,0 +1,64 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from content.models import recount_tags, refresh_tag_cloud
+
+
+def fill_tag_counters(apps, schema_editor):
+    Tag = apps.get_model('content', 'Tag')
+    recount_tags(Tag)
+    refresh_tag_cloud(Tag, apps.get_model('content', 'TagCloudEntry'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_mediaindex'),
+        # Articles and blogs are tagged too.
+        ('research', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='article_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of articles with the tag.'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='blog_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of blogs with the tag.'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of comments with the tag.'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='media_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of media with the tag.'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of posts with the tag.'),
+        ),
+        migrations.CreateModel(
+            name='TagCloudEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('listing', models.CharField(help_text="'all' for the overall popularity, or a key of TAG_COUNTERS (e.g. 'posts').", max_length=20)),
+                ('rank', models.PositiveIntegerField(help_text='Position of the tag in the listing, from 1.')),
+                ('count', models.PositiveIntegerField(help_text='Number of uses of the tag counted in the listing.')),
+                ('weight', models.PositiveSmallIntegerField(help_text="Display size of the tag, from 1 to TAG_CLOUD['LEVELS'] on a logarithmic scale.")),
+                ('tag', models.ForeignKey(help_text='Ranked tag.', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.tag')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'rank'), name='content_tagcloudentry_listing_rank')],
+            },
+        ),
+        migrations.RunPython(fill_tag_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0010_tag_article_count_tag_blog_count_tag_comment_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaggedItemChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('posts', 'posts'), ('articles', 'articles'), ('blogs', 'blogs'), ('media', 'media')], help_text="Related name of the tags of the item (e.g. 'posts').", max_length=10)),
+                ('item_id', models.PositiveBigIntegerField(help_text='Primary key of the item.')),
+            ],
+        ),
+    ]
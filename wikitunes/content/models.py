@@ -1,12 +1,21 @@
 from datetime import datetime
+import logging
+import math
+import os
 import uuid
-from django.db import models
-from django.core.exceptions import ValidationError
-from django.db.models import Avg
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.db.models import Avg, Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Concat, Greatest, Substr
 from django.conf import settings
 from django.utils.text import slugify
 
 from accounts.models import Account, Visitor, img_dir_path, text_dir_path
+from wikitunes.fields import HybridTextField
+
+logger = logging.getLogger(__name__)
 
 
 def dynamic_dir_path(instance, filename, folder):
@@ -50,8 +59,9 @@ def count_items(filter_key, filter_value, class_variable):
     try:
         filtered_items = class_variable.objects.filter(**{filter_key: filter_value})
         return filtered_items.count()
-    except Exception as e:
-        # Log the error or return a default value
+    except FieldError:
+        # The model has no such relation (e.g. reactions on a forum).
+        logger.warning("%s has no field %r to count on.", class_variable.__name__, filter_key)
         return 0
     
 def average_items(filter_key, filter_value, class_variable, field_name):
@@ -70,8 +80,9 @@ def average_items(filter_key, filter_value, class_variable, field_name):
     try:
         filtered_items = class_variable.objects.filter(**{filter_key: filter_value})
         return filtered_items.aggregate(Avg(field_name))[f"{field_name}__avg"] or 0
-    except Exception as e:
-        # Log the error or return a default value
+    except FieldError:
+        # The model has no such relation (e.g. reactions on a forum).
+        logger.warning("%s has no field %r to average on.", class_variable.__name__, filter_key)
         return 0
 
 def reactions_dir_path(instance, filename):
@@ -120,31 +131,153 @@ class BaseModel(models.Model):
         abstract = True
         
         
+class ReactionCounters(models.Model):
+    """
+    Stored reaction/comment counters for models that receive reactions.
+
+    The counters are kept up to date by the handlers in content.signals and can be
+    rebuilt from scratch with the `recount_reactions` management command.
+    """
+    reaction_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of reactions received.")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, help_text="Sum of the stars of all reactions received.")
+    comment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of comments received.")
+
+    class Meta:
+        abstract = True
+
+
 class ReactionMixin:
     def num_reactions(self):
-        try:
-            return count_items(self.reaction_field, self, SiteReaction)
-        except Exception as e:
-            # Log the error or return a default value
-            return 0
+        return getattr(self, 'reaction_total', self.reaction_count)
 
     def ave_ratings(self):
-        try:
-            return average_items(self.reaction_field, self, SiteReaction, 'num_star')
-        except Exception as e:
-            # Log the error or return a default value
+        if hasattr(self, 'rating_average'):
+            return self.rating_average
+        if not self.reaction_count:
             return 0
+        return self.rating_sum / self.reaction_count
 
     def num_comments(self):
-        try:
-            return count_items(self.comment_field, self, Comment)
-        except Exception as e:
-            # Log the error or return a default value
-            return 0
+        return getattr(self, 'comment_total', self.comment_count)
+
+
+def reaction_models():
+    """
+    Returns every installed model that carries ReactionMixin counters.
+    """
+    return [model for model in apps.get_models() if issubclass(model, ReactionMixin)]
+
+
+def related_field(source, name, target):
+    """
+    Returns the relation `name` of model `source` if it points to model `target`.
+
+    Parameters:
+        source: Model class holding the relation (e.g. SiteReaction, Comment).
+        name (str): Name of the relation field.
+        target: Model class the relation is expected to point to.
+
+    Returns:
+        Field or None: The relation field, or None if `source` has no such relation.
+    """
+    try:
+        field = source._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+    if not field.is_relation or field.related_model is not target:
+        return None
+    return field
+
+
+def related_aggregate(model, source, name, aggregate):
+    """
+    Builds a correlated subquery aggregating the `source` rows related to each `model` row.
+
+    Parameters:
+        model: Model class the subquery is correlated with.
+        source: Model class holding the relation (e.g. SiteReaction, Comment).
+        name (str): Name of the relation field on `source`.
+        aggregate: Aggregate expression computed per `model` row (e.g. Count('pk')).
+
+    Returns:
+        Subquery or None: The subquery, or None if `source` has no such relation.
+    """
+    field = related_field(source, name, model)
+    if field is None:
+        return None
+    related_rows = source.objects.filter(**{field.name: OuterRef('pk')}).order_by().values(field.name)
+    return Subquery(related_rows.annotate(value=aggregate).values('value'))
+
+
+def reaction_stat(model, source, name, aggregate, default):
+    subquery = related_aggregate(model, source, name, aggregate)
+    if subquery is None:
+        return Value(default)
+    return Coalesce(subquery, Value(default))
+
+
+def recount_reactions(model):
+    """
+    Recomputes the stored reaction/comment counters of every `model` row from scratch.
+
+    Each counter is rebuilt with a single correlated UPDATE, so the cost does not
+    depend on the number of rows in Python.
+
+    Parameters:
+        model: A model class using ReactionMixin.
+
+    Returns:
+        int: The number of rows updated.
+    """
+    return model.objects.update(
+        reaction_count=reaction_stat(model, SiteReaction, model.reaction_field, Count('pk'), 0),
+        rating_sum=reaction_stat(model, SiteReaction, model.reaction_field, Sum('num_star'), 0),
+        comment_count=reaction_stat(model, Comment, model.comment_field, Count('pk'), 0),
+    )
+
+
+class ReactionQuerySet(models.QuerySet):
+    """
+    Queryset-level counterpart of ReactionMixin.
+    """
+    def with_reaction_stats(self):
+        """
+        Annotates every row with its live reaction count, average rating and comment count.
+
+        All three figures are computed by correlated, grouped subqueries of the same SELECT,
+        so a whole page of rows costs one query. ReactionMixin methods prefer these
+        annotations over the stored counters when they are present.
+        """
+        model = self.model
+        return self.annotate(
+            reaction_total=reaction_stat(model, SiteReaction, model.reaction_field, Count('pk'), 0),
+            rating_average=reaction_stat(
+                model, SiteReaction, model.reaction_field, Avg('num_star', output_field=models.FloatField()), 0.0
+            ),
+            comment_total=reaction_stat(model, Comment, model.comment_field, Count('pk'), 0),
+        )
+
+
+TREE_SEGMENT_WIDTH = 8
+TREE_PATH_MAX_LENGTH = 512
+BASE36_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
 
 
+def tree_segment(pk):
+    """
+    Encodes a primary key as a fixed-width base36 segment of a comment tree path.
+
+    Fixed-width segments make the lexical order of tree paths equal to the
+    depth-first order of the thread (siblings ordered by creation).
+    """
+    digits = ''
+    while pk:
+        pk, remainder = divmod(pk, 36)
+        digits = BASE36_DIGITS[remainder] + digits
+    return digits.rjust(TREE_SEGMENT_WIDTH, '0')
+
 
-class Post(BaseModel, ReactionMixin):
+class Post(BaseModel, ReactionCounters, ReactionMixin):
     """
     Represents a post associated with an account, containing categories and ratings.
     """
@@ -152,7 +285,8 @@ class Post(BaseModel, ReactionMixin):
     comment_field = 'post'
     
     title = models.CharField(max_length=50, help_text="Title of the post.")
-    description = models.FileField(upload_to=acc_data_desc_dir_path, help_text="File describing the post content.")
+    description = models.FileField(upload_to=acc_data_desc_dir_path, blank=True, help_text="File describing the post content.")
+    description_text = HybridTextField(file_field='description', help_text="Post content, stored inline when small enough.")
     category = models.CharField(
         max_length=10, 
         choices=CATEGORY_CHOICES,
@@ -167,6 +301,8 @@ class Post(BaseModel, ReactionMixin):
         help_text="Associated account for the post."
     )
     tags = models.ManyToManyField('Tag', related_name='posts')
+
+    objects = ReactionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-pub_date']
@@ -175,14 +311,61 @@ class Post(BaseModel, ReactionMixin):
         return f"Post Title: {self.title}"
 
 
-class Comment(BaseModel, ReactionMixin):
+class CommentQuerySet(ReactionQuerySet):
+    """
+    Thread queries over the materialized comment tree paths.
+    """
+    def thread(self, post=None, root=None, max_depth=None):
+        """
+        Returns a whole discussion in depth-first order with a single index range scan.
+
+        Parameters:
+            post: Post whose discussion is fetched (comments without a post when None).
+            root: Comment whose subtree (itself included) is fetched instead of a whole post.
+            max_depth (int): Maximum reply depth below the top-level comments, or below `root`.
+
+        Returns:
+            QuerySet: The comments ordered by tree path.
+        """
+        if root is not None:
+            comments = self.filter(tree_path__startswith=root.tree_path)
+            base_depth = root.tree_depth
+        else:
+            comments = self.filter(tree_path__startswith=tree_segment(post.pk if post else 0))
+            base_depth = 0
+        if max_depth is not None:
+            comments = comments.filter(tree_depth__lte=base_depth + max_depth)
+        return comments.order_by('tree_path')
+
+    def thread_page(self, limit, cursor=None):
+        """
+        Returns one page of a thread and the cursor of the next page.
+
+        Parameters:
+            limit (int): Maximum number of comments in the page.
+            cursor (str): Cursor returned with the previous page, None for the first page.
+
+        Returns:
+            tuple: (list of comments, cursor of the next page or None when exhausted).
+        """
+        comments = self.order_by('tree_path')
+        if cursor:
+            comments = comments.filter(tree_path__gt=cursor)
+        page = list(comments[:limit + 1])
+        if len(page) <= limit:
+            return page, None
+        return page[:limit], page[limit - 1].tree_path
+
+
+class Comment(BaseModel, ReactionCounters, ReactionMixin):
     """
     Represents a comment on a post, including its rating and validation status.
     """
     reaction_field = 'comment'
     comment_field = 'parent_comment'
     
-    message = models.FileField(upload_to=user_comment_dir_path, help_text="Content of the comment.")
+    message = models.FileField(upload_to=user_comment_dir_path, blank=True, help_text="Content of the comment.")
+    message_text = HybridTextField(file_field='message', help_text="Content of the comment, stored inline when small enough.")
     pub_date = models.DateTimeField(auto_now=True, help_text="Date when the comment was published.")
     user = models.ForeignKey(
         Visitor,
@@ -205,6 +388,16 @@ class Comment(BaseModel, ReactionMixin):
         help_text="The parent comment, if this comment is a reply."
     )
     tags = models.ManyToManyField('Tag', related_name='comments')
+    tree_path = models.CharField(
+        max_length=TREE_PATH_MAX_LENGTH,
+        default='',
+        db_index=True,
+        editable=False,
+        help_text="Materialized path of the comment in its thread (post segment followed by one segment per comment)."
+    )
+    tree_depth = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Reply depth, 0 for top-level comments.")
+
+    objects = CommentQuerySet.as_manager()
     
     def __str__(self):
         return f"Comment on {self.post.title if self.post else self.parent_comment.user.username} by {self.user.username}"
@@ -212,7 +405,54 @@ class Comment(BaseModel, ReactionMixin):
     def save(self, *args, **kwargs):
         if self.parent_comment == self:
             raise ValueError("A comment cannot reply to itself.")
+        # Read the paths from the database, in-memory instances may predate a move.
+        stored_paths = self.stored_tree_paths()
+        own_path = stored_paths.get(self.pk, ('', 0))[0]
+        parent_path = stored_paths.get(self.parent_comment_id, ('', 0))[0]
+        if own_path and self.parent_comment_id is not None and parent_path.startswith(own_path):
+            raise ValueError("A comment cannot reply to one of its own replies.")
         super().save(*args, **kwargs)
+        self.update_tree_path(stored_paths)
+
+    def stored_tree_paths(self):
+        """
+        Returns the stored (tree_path, tree_depth) of the comment and of its parent, by pk.
+        """
+        pks = [pk for pk in (self.pk, self.parent_comment_id) if pk is not None]
+        if not pks:
+            return {}
+        rows = Comment.objects.filter(pk__in=pks).values_list('pk', 'tree_path', 'tree_depth')
+        return {pk: (path, depth) for pk, path, depth in rows}
+
+    def update_tree_path(self, stored_paths=None):
+        """
+        Stores the materialized path of the comment, moving its replies along when it changed.
+
+        Parameters:
+            stored_paths (dict): Stored (tree_path, tree_depth) of the comment and its parent, by pk,
+                as read before the comment was saved.
+        """
+        if stored_paths is None:
+            stored_paths = self.stored_tree_paths()
+        if self.parent_comment_id is not None:
+            parent_path, parent_depth = stored_paths[self.parent_comment_id]
+            path = parent_path + tree_segment(self.pk)
+            depth = parent_depth + 1
+        else:
+            path = tree_segment(self.post_id or 0) + tree_segment(self.pk)
+            depth = 0
+        if len(path) > TREE_PATH_MAX_LENGTH:
+            raise ValueError("The reply is nested too deeply.")
+
+        old_path, old_depth = stored_paths.get(self.pk, ('', 0))
+        if path != old_path:
+            Comment.objects.filter(pk=self.pk).update(tree_path=path, tree_depth=depth)
+            if old_path:
+                Comment.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+                    tree_path=Concat(Value(path), Substr('tree_path', len(old_path) + 1)),
+                    tree_depth=F('tree_depth') + (depth - old_depth),
+                )
+        self.tree_path, self.tree_depth = path, depth
 
 
 class Media(BaseModel):
@@ -231,7 +471,7 @@ class Media(BaseModel):
     tags = models.ManyToManyField('Tag', related_name='media')
 
     def __str__(self):
-        return f"{self.media_type} - {self.file.name}"
+        return f"{self.media_type} - {self.pk}"
 
         
         
@@ -344,7 +584,286 @@ class Document(Media):
     
     def __str__(self):
         return f"text/document for {self.post.title if self.post else self.comment.user.username}"
-    
+
+
+MEDIA_MODELS = {
+    'image': Image,
+    'video': Video,
+    'audio': Audio,
+    'document': Document,
+}
+
+# Media models by model name, the concrete model of a MediaIndex row.
+MEDIA_CLASSES = {model._meta.model_name: model for model in MEDIA_MODELS.values()}
+
+
+class MediaIndexQuerySet(models.QuerySet):
+    def for_owners(self, posts=(), comments=()):
+        """
+        Filters the media of the given posts and/or comments (instances or primary keys).
+        """
+        return self.filter(models.Q(post__in=posts) | models.Q(comment__in=comments))
+
+    def load(self):
+        """
+        Returns the indexed media as Image/Video/Audio/Document instances, built from the
+        index rows only (one query, no join to the media tables).
+        """
+        return [entry.as_media() for entry in self]
+
+
+class MediaIndex(models.Model):
+    """
+    Denormalized index of all images, videos, audios and documents.
+
+    One row per Media, kept up to date by the handlers in content.signals (and rebuilt
+    with the `rebuild_media_index` management command), so that listing the media of
+    posts or comments reads a single table instead of joining each media table to
+    content_media.
+    """
+    media = models.OneToOneField(
+        Media,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='index_entry',
+        help_text="Indexed media."
+    )
+    media_type = models.CharField(max_length=10, choices=Media.MEDIA_TYPES, help_text="Type of media.")
+    media_model = models.CharField(
+        max_length=20,
+        help_text="Model name of the concrete Image/Video/Audio/Document, the class the row is loaded as."
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        help_text="Associated post of the media."
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='+',
+        help_text="Associated comment of the media."
+    )
+    title = models.CharField(max_length=50, help_text="Title of the media.")
+    path = models.CharField(max_length=255, blank=True, help_text="Storage name of the uploaded file.")
+    size = models.PositiveBigIntegerField(null=True, help_text="Size of the uploaded file in bytes.")
+    width = models.PositiveIntegerField(null=True, help_text="Width of an image in pixels.")
+    height = models.PositiveIntegerField(null=True, help_text="Height of an image in pixels.")
+    tags = models.JSONField(default=list, blank=True, help_text="Slugs of the tags of the media.")
+    is_valid = models.BooleanField(default=True, help_text="Indicates if the media is valid.")
+    uploaded_at = models.DateTimeField(help_text="Upload timestamp.")
+
+    objects = MediaIndexQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['uploaded_at']
+        indexes = [
+            models.Index(fields=['post', 'media_type']),
+            models.Index(fields=['comment', 'media_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.media_type} - {self.path}"
+
+    @classmethod
+    def index(cls, media):
+        """
+        Creates or updates the index row of an Image/Video/Audio/Document.
+        """
+        upload = media.upload
+        try:
+            size = upload.size if upload else None
+        except OSError:
+            size = None
+        return cls.objects.update_or_create(
+            media_id=media.pk,
+            defaults={
+                'media_type': media.media_type,
+                'media_model': media._meta.model_name,
+                'post_id': media.post_id,
+                'comment_id': media.comment_id,
+                'title': media.title,
+                'path': upload.name or '',
+                'size': size,
+                'width': getattr(media, 'width', None),
+                'height': getattr(media, 'height', None),
+                'is_valid': media.is_valid,
+                'uploaded_at': media.uploaded_at,
+            },
+        )[0]
+
+    def as_media(self):
+        """
+        Builds the typed media instance described by this row, as if loaded from the database.
+        """
+        model = MEDIA_CLASSES[self.media_model]
+        values = {
+            'id': self.media_id,
+            'media_ptr_id': self.media_id,
+            'is_valid': self.is_valid,
+            'media_type': self.media_type,
+            'uploaded_at': self.uploaded_at,
+            'title': self.title,
+            'post_id': self.post_id,
+            'comment_id': self.comment_id,
+            'upload': self.path,
+            'width': self.width,
+            'height': self.height,
+        }
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        media = model.from_db(self._state.db, attnames, [values[attname] for attname in attnames])
+        media.tag_names = self.tags
+        return media
+
+
+def refresh_media_tags(media_ids):
+    """
+    Copies the current tags of the given media into their index rows.
+    """
+    media_ids = list(media_ids)
+    tags = {media_id: [] for media_id in media_ids}
+    rows = Media.tags.through.objects.filter(media_id__in=media_ids).order_by('tag__slug')
+    for media_id, slug in rows.values_list('media_id', 'tag__slug'):
+        tags[media_id].append(slug)
+    # One UPDATE ... CASE per batch, media without an index row are left alone.
+    entries = [MediaIndex(media_id=media_id, tags=slugs) for media_id, slugs in tags.items()]
+    MediaIndex.objects.bulk_update(entries, ['tags'], batch_size=1000)
+
+
+def load_media(posts=(), comments=(), media_type=None):
+    """
+    Fetches every media item of a set of posts/comments in one query.
+
+    Parameters:
+        posts (iterable): Posts (or primary keys) whose media are loaded.
+        comments (iterable): Comments (or primary keys) whose media are loaded.
+        media_type (str): Only load this type of media ('image', 'video', 'audio' or 'document').
+
+    Returns:
+        list: Image, Video, Audio and Document instances ordered by upload time, each
+        with a `tag_names` list of tag slugs.
+    """
+    entries = MediaIndex.objects.for_owners(posts, comments).filter(is_valid=True)
+    if media_type is not None:
+        entries = entries.filter(media_type=media_type)
+    return entries.load()
+
+
+class ImageDerivative(models.Model):
+    """
+    Represents a resized/re-encoded rendition of an uploaded image (see content.derivatives).
+    """
+    FORMATS = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        help_text="Model of the object owning the original image."
+    )
+    object_id = models.PositiveBigIntegerField(help_text="Primary key of the object owning the original image.")
+    field_name = models.CharField(max_length=50, help_text="Name of the image field of the original.")
+    source_name = models.CharField(max_length=255, help_text="Storage name of the original the rendition was made from.")
+    width = models.PositiveIntegerField(help_text="Width of the rendition in pixels.")
+    height = models.PositiveIntegerField(help_text="Height of the rendition in pixels.")
+    format = models.CharField(max_length=10, choices=FORMATS, help_text="Encoding of the rendition.")
+    file = models.FileField(max_length=255, help_text="File containing the rendition.")
+    size = models.PositiveIntegerField(help_text="Size of the rendition in bytes.")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the rendition was generated.")
+
+    class Meta:
+        ordering = ['width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'field_name', 'width', 'format'],
+                name='unique_image_derivative',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.width}px {self.format} rendition of {self.source_name}"
+
+
+class UploadSession(models.Model):
+    """
+    Represents a resumable chunked upload of a video/audio/document (see content.uploads).
+
+    Chunks are appended to a partial file at the current offset until the declared size
+    is reached, the file is then moved into a new Video/Audio/Document.
+    """
+    MEDIA_TYPES = [
+        ('video', 'Video'),
+        ('audio', 'Audio'),
+        ('document', 'Document'),
+    ]
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, help_text="Token identifying the upload.")
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        help_text="Account uploading the file."
+    )
+    media_type = models.CharField(max_length=10, choices=MEDIA_TYPES, help_text="Type of media created once complete.")
+    title = models.CharField(max_length=50, help_text="Title of the media.")
+    filename = models.CharField(max_length=255, help_text="Original name of the uploaded file.")
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Associated post for the media."
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Associated comment for the media."
+    )
+    size = models.PositiveBigIntegerField(help_text="Declared size of the file in bytes.")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Number of bytes received so far.")
+    checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Hex SHA-256 of the file, declared by the client or computed once complete."
+    )
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending', help_text="State of the upload.")
+    media = models.OneToOneField(
+        Media,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        help_text="Media created from the completed upload."
+    )
+    created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the upload was started.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last received chunk.")
+    expires_at = models.DateTimeField(help_text="Timestamp after which an unfinished upload is discarded.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"upload of {self.filename} ({self.offset}/{self.size} bytes)"
+
+    @property
+    def part_path(self):
+        """
+        Absolute path of the partial file the chunks are appended to.
+        """
+        return os.path.join(settings.CHUNKED_UPLOAD['TEMP_DIR'], f"{self.id.hex}.part")
+
 class Tag(models.Model):
     """
     Represents a versatile feature that enhances the functionality of your project by allowing 
@@ -374,6 +893,11 @@ class Tag(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the tag was created.")
     updated_at = models.DateTimeField(auto_now=True, help_text="Timestamp of the last update to the tag.")
     popularity = models.IntegerField(default=0, help_text="How many times this tag has been used.")
+    post_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of posts with the tag.")
+    comment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of comments with the tag.")
+    media_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of media with the tag.")
+    article_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of articles with the tag.")
+    blog_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of blogs with the tag.")
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -382,6 +906,172 @@ class Tag(models.Model):
 
     def __str__(self):
         return self.name
+
+
+# Counter column of Tag for each tagged model, by the related name of its `tags` field.
+TAG_COUNTERS = {
+    'posts': 'post_count',
+    'comments': 'comment_count',
+    'media': 'media_count',
+    'articles': 'article_count',
+    'blogs': 'blog_count',
+}
+
+
+def tag_relations(tag_model=None):
+    """
+    Returns the many-to-many relations of the tagged models to Tag, by related name.
+
+    Parameters:
+        tag_model: The Tag model, default to the current one (migrations pass the historical one).
+    """
+    return {
+        rel.related_name: rel
+        for rel in (tag_model or Tag)._meta.related_objects
+        if rel.many_to_many and rel.related_name in TAG_COUNTERS
+    }
+
+
+def adjust_tag_counts(related_name, tag_ids, sign):
+    """
+    Adds (sign=1) or removes (sign=-1) uses of tags from their counters and popularity.
+
+    Tags changing by the same amount are updated together, so tagging or untagging an
+    item costs one UPDATE whatever its number of tags.
+
+    Parameters:
+        related_name (str): Key of TAG_COUNTERS, the kind of item (un)tagged.
+        tag_ids (iterable): Primary key of the tag of every (un)tagged item, repeated
+            once per item.
+        sign (int): 1 or -1.
+    """
+    counter = TAG_COUNTERS[related_name]
+    uses = {}
+    for tag_id in tag_ids:
+        uses[tag_id] = uses.get(tag_id, 0) + 1
+    by_delta = {}
+    for tag_id, count in uses.items():
+        by_delta.setdefault(sign * count, []).append(tag_id)
+    for delta, pks in by_delta.items():
+        Tag.objects.filter(pk__in=pks).update(**{
+            counter: Greatest(F(counter) + delta, Value(0)),
+            'popularity': Greatest(F('popularity') + delta, Value(0)),
+        })
+
+
+def recount_tags(tag_model=None):
+    """
+    Recomputes the counters and popularity of every tag from the through tables.
+
+    Parameters:
+        tag_model: The Tag model, default to the current one (migrations pass the historical one).
+
+    Returns:
+        int: The number of tags updated.
+    """
+    tag_model = tag_model or Tag
+    counts = {}
+    for related_name, rel in tag_relations(tag_model).items():
+        tag_column = rel.field.m2m_reverse_field_name()
+        uses = (
+            rel.through.objects.filter(**{tag_column: OuterRef('pk')})
+            .order_by()
+            .values(tag_column)
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        counts[TAG_COUNTERS[related_name]] = Coalesce(Subquery(uses), 0)
+    tag_model.objects.update(**counts)
+    total = Value(0)
+    for counter in counts:
+        total = total + F(counter)
+    return tag_model.objects.update(popularity=total)
+
+
+class TagCloudEntry(models.Model):
+    """
+    Precomputed top tags, overall and per kind of tagged item.
+
+    Rebuilt from the tag counters by the `refresh_tag_cloud` management command, so
+    that serving the tag cloud reads at most TAG_CLOUD['TOP_K'] rows.
+    """
+    listing = models.CharField(
+        max_length=20,
+        help_text="'all' for the overall popularity, or a key of TAG_COUNTERS (e.g. 'posts')."
+    )
+    rank = models.PositiveIntegerField(help_text="Position of the tag in the listing, from 1.")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+', help_text="Ranked tag.")
+    count = models.PositiveIntegerField(help_text="Number of uses of the tag counted in the listing.")
+    weight = models.PositiveSmallIntegerField(
+        help_text="Display size of the tag, from 1 to TAG_CLOUD['LEVELS'] on a logarithmic scale."
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'rank'], name='content_tagcloudentry_listing_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing} #{self.rank}: {self.tag_id}"
+
+
+def refresh_tag_cloud(tag_model=None, entry_model=None):
+    """
+    Rebuilds the TagCloudEntry listings from the tag counters, without reading any through table.
+
+    Parameters:
+        tag_model, entry_model: The Tag and TagCloudEntry models, default to the current ones
+            (migrations pass the historical ones).
+
+    Returns:
+        int: The number of entries written.
+    """
+    tag_model = tag_model or Tag
+    entry_model = entry_model or TagCloudEntry
+    size = settings.TAG_CLOUD['TOP_K']
+    levels = settings.TAG_CLOUD['LEVELS']
+    entries = []
+    for listing, counter in [('all', 'popularity')] + list(TAG_COUNTERS.items()):
+        top = list(
+            tag_model.objects.filter(**{f'{counter}__gt': 0})
+            .order_by(f'-{counter}', 'name')
+            .values_list('pk', counter)[:size]
+        )
+        if not top:
+            continue
+        low, high = math.log(top[-1][1]), math.log(top[0][1])
+        for rank, (pk, count) in enumerate(top, 1):
+            scaled = (math.log(count) - low) / (high - low) if high > low else 1
+            entries.append(entry_model(
+                listing=listing,
+                rank=rank,
+                tag_id=pk,
+                count=count,
+                weight=1 + round(scaled * (levels - 1)),
+            ))
+    with transaction.atomic():
+        entry_model.objects.all().delete()
+        entry_model.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+# Tagged models taking part in related content recommendations, by related name of their `tags` field.
+RELATED_KINDS = ['posts', 'articles', 'blogs', 'media']
+
+
+class TaggedItemChange(models.Model):
+    """
+    Item whose tags changed since the tag co-occurrence index was last updated.
+
+    Rows are written by the handlers in content.signals and consumed by the
+    `update_related_content` management command (see content.related).
+    """
+    kind = models.CharField(
+        max_length=10,
+        choices=[(kind, kind) for kind in RELATED_KINDS],
+        help_text="Related name of the tags of the item (e.g. 'posts')."
+    )
+    item_id = models.PositiveBigIntegerField(help_text="Primary key of the item.")
     
     
 class SiteReaction(models.Model):
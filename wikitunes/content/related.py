@@ -0,0 +1,317 @@
+"""
+Related content recommendations from a sparse tag co-occurrence matrix.
+
+The index holds the incidence matrix A of the tagged posts, articles, blogs and
+media (one row per item, one column per tag) and the co-occurrence matrix C = AᵀA
+of the tags. It is stored as a single .npz file (settings.RELATED_CONTENT['PATH'])
+and kept up to date by the `update_related_content` management command, which
+only applies the items recorded in TaggedItemChange since its last run:
+
+    C += newᵀ·new - oldᵀ·old
+
+for the changed rows. Items related to X are scored with two sparse products,
+A · (S · a_X), where S is C normalised to the cosine similarity of the tags, so a
+query never touches the database.
+"""
+import fcntl
+import os
+import threading
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+
+from .models import RELATED_KINDS, TaggedItemChange, tag_relations
+
+KIND_BITS = 48
+
+
+def item_keys(kinds, ids):
+    """
+    Packs kind codes (positions in RELATED_KINDS) and primary keys into int64 keys.
+    """
+    return (np.asarray(kinds, dtype=np.int64) << KIND_BITS) | np.asarray(ids, dtype=np.int64)
+
+
+def current_tags(kind, ids=None):
+    """
+    Reads the tags of items of one kind from its through table.
+
+    Returns:
+        tuple: (item ids, tag ids) arrays, one entry per through row.
+    """
+    rel = tag_relations()[kind]
+    item_column = f'{rel.field.m2m_field_name()}_id'
+    tag_column = f'{rel.field.m2m_reverse_field_name()}_id'
+    rows = rel.through.objects.all()
+    if ids is not None:
+        rows = rows.filter(**{f'{item_column}__in': list(ids)})
+    pairs = np.array(list(rows.values_list(item_column, tag_column).iterator(chunk_size=10000)), dtype=np.int64)
+    if not len(pairs):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return pairs[:, 0], pairs[:, 1]
+
+
+class CooccurrenceIndex:
+    """
+    Tag incidence and co-occurrence matrices of the tagged items.
+    """
+    def __init__(self, keys, tag_ids, incidence, cooccurrence):
+        """
+        Parameters:
+            keys (ndarray): item_keys() of every row of `incidence`.
+            tag_ids (ndarray): Tag primary key of every column.
+            incidence (csr_matrix): Items × tags, 1 where the item has the tag.
+            cooccurrence (csr_matrix): Tags × tags, number of items having both tags.
+        """
+        self.keys = keys
+        self.tag_ids = tag_ids
+        self.incidence = incidence
+        self.cooccurrence = cooccurrence
+        self.reset()
+
+    def reset(self):
+        self._order = None
+        self._similarity = None
+        self._norms = None
+
+    @classmethod
+    def build(cls):
+        """
+        Builds the index from scratch by reading every through table.
+        """
+        keys, tags = [], []
+        for code, kind in enumerate(RELATED_KINDS):
+            ids, tag_ids = current_tags(kind)
+            keys.append(item_keys(np.full(len(ids), code), ids))
+            tags.append(tag_ids)
+        keys, tags = np.concatenate(keys), np.concatenate(tags)
+        unique_keys, rows = np.unique(keys, return_inverse=True)
+        tag_ids, columns = np.unique(tags, return_inverse=True)
+        incidence = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+            shape=(len(unique_keys), len(tag_ids)),
+        )
+        return cls(unique_keys, tag_ids, incidence, (incidence.T @ incidence).astype(np.float64).tocsr())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            incidence = sparse.csr_matrix(
+                (data['incidence_data'], data['incidence_indices'], data['incidence_indptr']),
+                shape=tuple(data['incidence_shape']),
+            )
+            cooccurrence = sparse.csr_matrix(
+                (data['cooccurrence_data'], data['cooccurrence_indices'], data['cooccurrence_indptr']),
+                shape=tuple(data['cooccurrence_shape']),
+            )
+            return cls(data['keys'], data['tag_ids'], incidence, cooccurrence)
+
+    def save(self, path):
+        """
+        Writes the index to `path`, replacing the previous file atomically.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as target:
+            np.savez(
+                target,
+                keys=self.keys,
+                tag_ids=self.tag_ids,
+                incidence_data=self.incidence.data,
+                incidence_indices=self.incidence.indices,
+                incidence_indptr=self.incidence.indptr,
+                incidence_shape=np.array(self.incidence.shape),
+                cooccurrence_data=self.cooccurrence.data,
+                cooccurrence_indices=self.cooccurrence.indices,
+                cooccurrence_indptr=self.cooccurrence.indptr,
+                cooccurrence_shape=np.array(self.cooccurrence.shape),
+            )
+        os.replace(temporary, path)
+
+    def rows(self, keys):
+        """
+        Returns the row of every key, -1 for the keys not in the index.
+        """
+        if self._order is None:
+            self._order = np.argsort(self.keys, kind='stable')
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(self.keys):
+            return np.full(len(keys), -1)
+        ordered = self.keys[self._order]
+        positions = np.minimum(np.searchsorted(ordered, keys), len(ordered) - 1)
+        return np.where(ordered[positions] == keys, self._order[positions], -1)
+
+    def apply(self, changes):
+        """
+        Replaces the tags of the changed items by their current tags.
+
+        Parameters:
+            changes (iterable): (kind, item id) pairs, duplicates allowed.
+        """
+        ids_by_kind = {}
+        for kind, item_id in changes:
+            ids_by_kind.setdefault(kind, set()).add(item_id)
+        if not ids_by_kind:
+            return
+
+        changed_keys, tagged_keys, tags = [], [], []
+        for kind, ids in ids_by_kind.items():
+            code = RELATED_KINDS.index(kind)
+            changed_keys.append(item_keys(np.full(len(ids), code), sorted(ids)))
+            item_ids, tag_ids = current_tags(kind, ids)
+            tagged_keys.append(item_keys(np.full(len(item_ids), code), item_ids))
+            tags.append(tag_ids)
+        changed_keys = np.concatenate(changed_keys)
+        tagged_keys, tags = np.concatenate(tagged_keys), np.concatenate(tags)
+
+        rows = self.rows(changed_keys)
+        added = changed_keys[rows < 0]
+        rows[rows < 0] = np.arange(len(self.keys), len(self.keys) + len(added))
+        self.keys = np.concatenate([self.keys, added])
+        new_tags = np.setdiff1d(tags, self.tag_ids)
+        self.tag_ids = np.concatenate([self.tag_ids, new_tags])
+        shape = (len(self.keys), len(self.tag_ids))
+        self.incidence.resize(shape)
+        self.cooccurrence.resize((shape[1], shape[1]))
+        self.reset()
+
+        tag_order = np.argsort(self.tag_ids, kind='stable')
+        columns = tag_order[np.searchsorted(self.tag_ids[tag_order], tags)]
+        # Position of each tagged item among the changed rows.
+        changed_order = np.argsort(changed_keys)
+        positions = changed_order[np.searchsorted(changed_keys, tagged_keys, sorter=changed_order)]
+        old = self.incidence[rows]
+        new = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float32), (positions, columns)),
+            shape=(len(rows), shape[1]),
+        )
+        scatter = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, np.arange(len(rows)))),
+            shape=(shape[0], len(rows)),
+        )
+        self.incidence = (self.incidence - scatter @ old + scatter @ new).tocsr()
+        self.incidence.eliminate_zeros()
+        self.cooccurrence = (self.cooccurrence - old.T @ old + new.T @ new).astype(np.float64).tocsr()
+        self.cooccurrence.eliminate_zeros()
+
+    @property
+    def similarity(self):
+        """
+        Cosine similarity of the tags: C[i, j] / sqrt(C[i, i] * C[j, j]).
+        """
+        if self._similarity is None:
+            counts = self.cooccurrence.diagonal()
+            scale = sparse.diags(np.divide(1.0, np.sqrt(counts), out=np.zeros_like(counts), where=counts > 0))
+            self._similarity = (scale @ self.cooccurrence @ scale).tocsr()
+        return self._similarity
+
+    @property
+    def norms(self):
+        if self._norms is None:
+            self._norms = np.sqrt(np.diff(self.incidence.indptr)).astype(np.float64)
+        return self._norms
+
+    def related(self, kind, pk, limit, kinds=None):
+        """
+        Returns the items sharing the most (and the most similar) tags with an item.
+
+        Parameters:
+            kind (str): One of RELATED_KINDS.
+            pk (int): Primary key of the item.
+            limit (int): Maximum number of items.
+            kinds (iterable): Only return items of these kinds.
+
+        Returns:
+            list: Dicts with the type, id and score of every related item, best first.
+        """
+        row = self.rows([item_keys([RELATED_KINDS.index(kind)], [pk])[0]])[0]
+        if row < 0:
+            return []
+        tags = self.incidence[row].toarray().ravel()
+        scores = self.incidence @ (self.similarity @ tags)
+        scores = np.divide(scores, self.norms, out=np.zeros_like(scores), where=self.norms > 0)
+        scores[row] = 0
+        if kinds is not None:
+            codes = [RELATED_KINDS.index(name) for name in kinds]
+            scores[~np.isin(self.keys >> KIND_BITS, codes)] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [
+            {
+                'type': RELATED_KINDS[self.keys[index] >> KIND_BITS],
+                'id': int(self.keys[index] & ((1 << KIND_BITS) - 1)),
+                'score': float(scores[index]),
+            }
+            for index in candidates
+        ]
+
+
+def update_index(full=False):
+    """
+    Applies the recorded tag changes to the stored index, or rebuilds it when `full` is set
+    or no index was stored yet. Concurrent runs wait for each other.
+
+    Returns:
+        tuple: (number of changes applied, number of indexed items)
+    """
+    path = str(settings.RELATED_CONTENT['PATH'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        changes = list(TaggedItemChange.objects.order_by('id').values_list('id', 'kind', 'item_id'))
+        if full or not os.path.exists(path):
+            index = CooccurrenceIndex.build()
+        else:
+            index = CooccurrenceIndex.load(path)
+            index.apply((kind, item_id) for _, kind, item_id in changes)
+        index.save(path)
+        # Changes recorded meanwhile are applied by the next run.
+        ids = [pk for pk, _, _ in changes]
+        for start in range(0, len(ids), 1000):
+            TaggedItemChange.objects.filter(pk__in=ids[start:start + 1000]).delete()
+        return len(changes), len(index.keys)
+
+
+_loaded = {'index': None, 'version': None}
+_loaded_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the stored index, reloaded whenever the background job replaced the file.
+    """
+    path = str(settings.RELATED_CONTENT['PATH'])
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = (stat.st_ino, stat.st_mtime_ns)
+    with _loaded_lock:
+        if _loaded['version'] != version:
+            _loaded['index'] = CooccurrenceIndex.load(path)
+            _loaded['version'] = version
+        return _loaded['index']
+
+
+def related_items(kind, pk, limit=None, kinds=None):
+    """
+    Returns the top related posts, articles, blogs and media of an item.
+
+    Parameters:
+        kind (str): One of RELATED_KINDS ('posts', 'articles', 'blogs' or 'media').
+        pk (int): Primary key of the item.
+        limit (int): Maximum number of items (settings.RELATED_CONTENT['MAX_LIMIT'] at most).
+        kinds (iterable): Only return items of these kinds.
+
+    Returns:
+        list: Dicts with the type, id and score of every related item, best first.
+    """
+    config = settings.RELATED_CONTENT
+    limit = min(limit or config['LIMIT'], config['MAX_LIMIT'])
+    index = get_index()
+    if index is None:
+        return []
+    return index.related(kind, pk, limit, kinds)
@@ -0,0 +1,42 @@
+import re
+
+from django.conf import settings
+from rest_framework import serializers
+
+from .models import UploadSession
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'media_type', 'title', 'filename', 'post', 'comment', 'size',
+            'offset', 'checksum', 'status', 'media', 'expires_at',
+        ]
+        read_only_fields = ['offset', 'status', 'media', 'expires_at']
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("The file is empty.")
+        if value > settings.CHUNKED_UPLOAD['MAX_SIZE']:
+            raise serializers.ValidationError(
+                f"The file size exceeds the maximum limit of {settings.CHUNKED_UPLOAD['MAX_SIZE'] / (1024 * 1024)} MB."
+            )
+        return value
+
+    def validate_checksum(self, value):
+        if value and not re.fullmatch(r'[0-9a-f]{64}', value.lower()):
+            raise serializers.ValidationError("The checksum must be a hex SHA-256 digest.")
+        return value.lower()
+
+    def validate_post(self, value):
+        if value is not None and value.account_id != self.context['request'].user.pk:
+            raise serializers.ValidationError("Media can only be attached to your own posts.")
+        return value
+
+    def validate_comment(self, value):
+        # Comments are written by visitors, which are not linked to accounts: nothing tells
+        # whether the uploader wrote the comment, so media cannot be attached to one.
+        if value is not None:
+            raise serializers.ValidationError("Media cannot be attached to comments.")
+        return value
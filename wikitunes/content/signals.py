@@ -0,0 +1,279 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    MEDIA_MODELS,
+    Comment,
+    RELATED_KINDS,
+    Media,
+    MediaIndex,
+    SiteReaction,
+    Tag,
+    TaggedItemChange,
+    adjust_tag_counts,
+    reaction_models,
+    refresh_media_tags,
+    related_field,
+    tag_relations,
+)
+
+
+def counter_targets(instance, source, attr):
+    """
+    Finds the counted rows a reaction/comment contributes to.
+
+    Parameters:
+        instance: SiteReaction or Comment instance.
+        source: SiteReaction or Comment, the model class holding the relations.
+        attr (str): 'reaction_field' or 'comment_field'.
+
+    Returns:
+        dict: Mapping of counted model class to the primary key of the target row.
+    """
+    targets = {}
+    for model in reaction_models():
+        field = related_field(source, getattr(model, attr), model)
+        if field is None:
+            continue
+        pk = getattr(instance, field.attname)
+        if pk is not None:
+            targets[model] = pk
+    return targets
+
+
+def reaction_snapshot(instance):
+    return counter_targets(instance, SiteReaction, 'reaction_field'), instance.num_star
+
+
+def comment_snapshot(instance):
+    return counter_targets(instance, Comment, 'comment_field'), None
+
+
+def apply_delta(snapshot, sign):
+    """
+    Adds (sign=1) or removes (sign=-1) one reaction/comment from the stored counters.
+    """
+    targets, stars = snapshot
+    for model, pk in targets.items():
+        if stars is None:
+            changes = {'comment_count': Greatest(F('comment_count') + sign, Value(0))}
+        else:
+            changes = {
+                'reaction_count': Greatest(F('reaction_count') + sign, Value(0)),
+                'rating_sum': Greatest(F('rating_sum') + sign * stars, Value(0)),
+            }
+        model.objects.filter(pk=pk).update(**changes)
+
+
+def snapshot_for(instance):
+    # Event, Article and Blog inherit SiteReaction, so their rows are counted too.
+    if isinstance(instance, SiteReaction):
+        return reaction_snapshot(instance)
+    if isinstance(instance, Comment):
+        return comment_snapshot(instance)
+    return None
+
+
+@receiver(pre_save)
+def remember_counted_relations(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the stored relations of an updated reaction/comment so that save can move its counts.
+    """
+    if raw or instance._state.adding or snapshot_for(instance) is None:
+        return
+    try:
+        previous = type(instance)._base_manager.get(pk=instance.pk)
+    except type(instance).DoesNotExist:
+        return
+    instance._counter_snapshot = snapshot_for(previous)
+
+
+@receiver(post_save)
+def count_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = snapshot_for(instance)
+    if current is None:
+        return
+    previous = instance.__dict__.pop('_counter_snapshot', None)
+    if created:
+        apply_delta(current, 1)
+        return
+    if previous is None or previous == current:
+        return
+    apply_delta(previous, -1)
+    apply_delta(current, 1)
+
+
+@receiver(post_delete)
+def count_deleted(sender, instance, **kwargs):
+    # Deleting an Event, Article or Blog also deletes its parent SiteReaction row and sends
+    # post_delete for both, while saving it sends a single post_save: only the parent counts.
+    if isinstance(instance, SiteReaction) and sender is not SiteReaction:
+        return
+    snapshot = snapshot_for(instance)
+    if snapshot is not None:
+        apply_delta(snapshot, -1)
+
+
+@receiver(post_save)
+def index_media(sender, instance, raw=False, **kwargs):
+    if raw or not isinstance(instance, tuple(MEDIA_MODELS.values())):
+        return
+    MediaIndex.index(instance)
+
+
+@receiver(m2m_changed, sender=Media.tags.through)
+def index_media_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps the tags of the media index in sync, whichever side of the relation was changed.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_media_tags([instance.pk])
+    elif action == 'pre_clear':
+        instance._indexed_media = list(instance.media.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        refresh_media_tags(pk_set)
+    elif action == 'post_clear':
+        refresh_media_tags(instance.__dict__.pop('_indexed_media', []))
+
+
+@receiver(pre_save, sender=Tag)
+def remember_tag_slug(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Notes whether a saved tag is renamed, only then are the tags of its media copied again.
+    """
+    if raw or instance._state.adding or (update_fields is not None and 'slug' not in update_fields):
+        instance._slug_changed = False
+        return
+    previous = Tag._base_manager.filter(pk=instance.pk).values_list('slug', flat=True).first()
+    instance._slug_changed = previous != instance.slug
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_media(sender, instance, **kwargs):
+    instance._indexed_media = list(instance.media.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reindex_tagged_media(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # A new tag has no media yet, and the index only holds the slugs.
+    if not instance.__dict__.pop('_slug_changed', True):
+        return
+    if '_indexed_media' in instance.__dict__:
+        media_ids = instance.__dict__.pop('_indexed_media')
+    else:
+        media_ids = instance.media.values_list('pk', flat=True)
+    refresh_media_tags(media_ids)
+
+
+def tagged_rows(rel, instance, reverse, pk_set=None):
+    """
+    Returns the tag id of every through row of `instance`, restricted to the other side's `pk_set`.
+    """
+    item_column, tag_column = rel.field.m2m_field_name(), rel.field.m2m_reverse_field_name()
+    own, other = (tag_column, item_column) if reverse else (item_column, tag_column)
+    rows = rel.through.objects.filter(**{f'{own}_id': instance.pk})
+    if pk_set is not None:
+        rows = rows.filter(**{f'{other}_id__in': pk_set})
+    return list(rows.values_list(f'{tag_column}_id', flat=True))
+
+
+def count_tags_changed(rel):
+    """
+    Returns the m2m_changed handler keeping the tag counters of one tagged model up to date.
+
+    Additions only report the rows actually created, while removals report the requested
+    ids, so the rows about to be removed are read before the removal.
+    """
+    related_name = rel.related_name
+    pending = f'_removed_{related_name}_tags'
+
+    def count(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add' and pk_set:
+            adjust_tag_counts(related_name, [instance.pk] * len(pk_set) if reverse else pk_set, 1)
+        elif action in ('pre_remove', 'pre_clear'):
+            instance.__dict__[pending] = tagged_rows(rel, instance, reverse, pk_set if action == 'pre_remove' else None)
+        elif action in ('post_remove', 'post_clear'):
+            adjust_tag_counts(related_name, instance.__dict__.pop(pending, []), -1)
+    return count
+
+
+def remember_tags(rel):
+    # Deleting a tagged item removes its through rows without m2m_changed.
+    def remember(sender, instance, **kwargs):
+        instance.__dict__[f'_deleted_{rel.related_name}_tags'] = tagged_rows(rel, instance, False)
+    return remember
+
+
+def uncount_tags(rel):
+    def uncount(sender, instance, **kwargs):
+        adjust_tag_counts(rel.related_name, instance.__dict__.pop(f'_deleted_{rel.related_name}_tags', []), -1)
+    return uncount
+
+
+def connect_tag_counters():
+    """
+    Connects the handlers maintaining the tag counters of posts, comments, media, articles and blogs.
+    """
+    for related_name, rel in tag_relations().items():
+        uid = f'content.tag_counters.{related_name}'
+        m2m_changed.connect(count_tags_changed(rel), sender=rel.through, weak=False, dispatch_uid=uid)
+        pre_delete.connect(remember_tags(rel), sender=rel.related_model, weak=False, dispatch_uid=uid)
+        post_delete.connect(uncount_tags(rel), sender=rel.related_model, weak=False, dispatch_uid=uid)
+
+
+def record_tag_changes(kind, item_ids):
+    TaggedItemChange.objects.bulk_create([TaggedItemChange(kind=kind, item_id=pk) for pk in item_ids])
+
+
+def track_related_changes(rel):
+    """
+    Returns the m2m_changed handler recording the items of one tagged model whose tags changed.
+    """
+    kind = rel.related_name
+
+    def track(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            if action in ('post_add', 'post_remove', 'post_clear') and (pk_set or action == 'post_clear'):
+                record_tag_changes(kind, [instance.pk])
+        elif action in ('post_add', 'post_remove') and pk_set:
+            record_tag_changes(kind, pk_set)
+        elif action == 'pre_clear':
+            item_column = rel.field.m2m_field_name()
+            tag_column = rel.field.m2m_reverse_field_name()
+            items = rel.through.objects.filter(**{f'{tag_column}_id': instance.pk})
+            record_tag_changes(kind, items.values_list(f'{item_column}_id', flat=True))
+    return track
+
+
+def track_deleted_item(rel):
+    def track(sender, instance, **kwargs):
+        record_tag_changes(rel.related_name, [instance.pk])
+    return track
+
+
+def track_deleted_tag(sender, instance, **kwargs):
+    # Deleting a tag removes its through rows without m2m_changed.
+    for kind, rel in tag_relations().items():
+        if kind in RELATED_KINDS:
+            track_related_changes(rel)(rel.through, instance, 'pre_clear', True, None)
+
+
+def connect_related_changes():
+    """
+    Connects the handlers recording tag changes for the related content index.
+    """
+    for kind, rel in tag_relations().items():
+        if kind not in RELATED_KINDS:
+            continue
+        uid = f'content.related_changes.{kind}'
+        m2m_changed.connect(track_related_changes(rel), sender=rel.through, weak=False, dispatch_uid=uid)
+        post_delete.connect(track_deleted_item(rel), sender=rel.related_model, weak=False, dispatch_uid=uid)
+    pre_delete.connect(track_deleted_tag, sender=Tag, dispatch_uid='content.related_changes.tag')
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import os
+import tempfile
+from concurrent.futures import Future
+from datetime import date
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image as PillowImage
+
+from accounts.models import Account, Visitor
+from research.models import Event
+from wikitunes.filecache import FileBodyCache
+
+from .derivatives import derivative_name, derivative_url, record_derivatives
+from .imaging import render_derivatives
+from .models import (
+    Comment,
+    Image,
+    ImageDerivative,
+    MediaIndex,
+    Post,
+    SiteReaction,
+    Tag,
+    UploadSession,
+    Video,
+    load_media,
+    refresh_media_tags,
+)
+
+
+class TemporaryMediaMixin:
+    """
+    Stores the files written by the tests in a temporary MEDIA_ROOT.
+    """
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        media = override_settings(
+            MEDIA_ROOT=root.name,
+            CHUNKED_UPLOAD={**settings.CHUNKED_UPLOAD, 'TEMP_DIR': os.path.join(root.name, 'partial')},
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        super().setUp()
+
+
+class TagCloudViewTests(TestCase):
+    def test_rejects_limits_below_one(self):
+        for limit in ('0', '-1'):
+            response = self.client.get(reverse('tag_cloud'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_rejects_unknown_types(self):
+        response = self.client.get(reverse('tag_cloud'), {'type': 'unknown'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RelatedContentViewTests(TestCase):
+    def test_rejects_limits_below_one(self):
+        for limit in ('0', '-1'):
+            response = self.client.get(reverse('related_content', args=['posts', 1]), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+
+class ReactionTestCase(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.visitor = Visitor.objects.create(username='visitor')
+        self.post = Post.objects.create(title='Post', account=account)
+        self.comments = [Comment.objects.create(user=self.visitor, post=self.post) for _ in range(2)]
+
+    def react(self, comment, stars):
+        return SiteReaction.objects.create(user=self.visitor, post=self.post, comment=comment, num_star=stars)
+
+
+class ReactionCounterTests(ReactionTestCase):
+    def test_reactions_are_counted(self):
+        reaction = self.react(self.comments[0], 4)
+        self.react(self.comments[1], 2)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_count, self.post.rating_sum, self.post.comment_count), (2, 6, 2))
+
+        reaction.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_count, self.post.rating_sum), (1, 2))
+
+    def test_deleting_an_inherited_reaction_counts_it_once(self):
+        self.react(self.comments[0], 4)
+        now = timezone.now()
+        event = Event.objects.create(
+            user=self.visitor, post=self.post, comment=self.comments[1], num_star=2,
+            title='Event', start_time=now, end_time=now,
+        )
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_count, self.post.rating_sum), (2, 6))
+
+        event.delete()
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_count, self.post.rating_sum), (1, 4))
+
+    def test_recount_restores_the_counters(self):
+        self.react(self.comments[0], 3)
+        Post.objects.update(reaction_count=9, rating_sum=0, comment_count=0)
+
+        call_command('recount_reactions', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_count, self.post.rating_sum, self.post.comment_count), (1, 3, 2))
+
+
+class ReactionStatsTests(ReactionTestCase):
+    def test_annotations_are_live_and_preferred(self):
+        self.react(self.comments[0], 5)
+        self.react(self.comments[1], 2)
+        # Stored counters out of date: the annotations are computed from the rows.
+        Post.objects.update(reaction_count=0, rating_sum=0, comment_count=0)
+
+        with self.assertNumQueries(1):
+            post = Post.objects.with_reaction_stats().get(pk=self.post.pk)
+        self.assertEqual((post.num_reactions(), post.ave_ratings(), post.num_comments()), (2, 3.5, 2))
+
+    def test_a_page_costs_one_query(self):
+        reply = Comment.objects.create(user=self.visitor, parent_comment=self.comments[0])
+        self.react(self.comments[0], 4)
+        with self.assertNumQueries(1):
+            stats = {
+                comment.pk: (comment.num_reactions(), comment.ave_ratings(), comment.num_comments())
+                for comment in Comment.objects.with_reaction_stats()
+            }
+        self.assertEqual(stats, {self.comments[0].pk: (1, 4.0, 1), self.comments[1].pk: (0, 0.0, 0), reply.pk: (0, 0.0, 0)})
+
+
+class CommentThreadTests(ReactionTestCase):
+    def reply(self, parent):
+        return Comment.objects.create(user=self.visitor, parent_comment=parent)
+
+    def test_threads_are_depth_first(self):
+        first, second = self.comments
+        reply = self.reply(first)
+        nested = self.reply(reply)
+        other = self.reply(second)
+
+        thread = list(Comment.objects.thread(self.post))
+        self.assertEqual(thread, [first, reply, nested, second, other])
+        self.assertEqual([comment.tree_depth for comment in thread], [0, 1, 2, 0, 1])
+        self.assertEqual(list(Comment.objects.thread(root=reply)), [reply, nested])
+        self.assertEqual(list(Comment.objects.thread(self.post, max_depth=1)), [first, reply, second, other])
+
+    def test_moving_a_comment_moves_its_replies(self):
+        first, second = self.comments
+        reply = self.reply(first)
+        nested = self.reply(reply)
+
+        reply.parent_comment = second
+        reply.save()
+
+        self.assertEqual(list(Comment.objects.thread(self.post)), [first, second, reply, nested])
+        nested.refresh_from_db()
+        self.assertEqual(nested.tree_depth, 2)
+        self.assertTrue(nested.tree_path.startswith(second.tree_path))
+
+    def test_replies_cannot_form_cycles(self):
+        reply = self.reply(self.comments[0])
+        self.comments[0].parent_comment = reply
+        with self.assertRaises(ValueError):
+            self.comments[0].save()
+
+    def test_pages_follow_the_cursor(self):
+        first, second = self.comments
+        reply = self.reply(first)
+        comments = Comment.objects.thread(self.post)
+
+        page, cursor = comments.thread_page(2)
+        self.assertEqual(page, [first, reply])
+        page, cursor = comments.thread_page(2, cursor)
+        self.assertEqual((page, cursor), ([second], None))
+
+
+@override_settings(INLINE_TEXT_MAX_SIZE=16)
+class HybridTextFieldTests(TemporaryMediaMixin, ReactionTestCase):
+    def test_short_bodies_are_stored_inline(self):
+        self.post.description_text = 'Short body'
+        self.post.save()
+        self.assertFalse(self.post.description)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).description_text, 'Short body')
+
+    def test_long_bodies_are_spilled_to_the_file(self):
+        body = 'A body longer than the threshold'
+        self.post.description_text = body
+        self.post.save()
+
+        self.assertTrue(Post.objects.filter(pk=self.post.pk, description_text__isnull=True).exists())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(default_storage.exists(post.description.name))
+        self.assertEqual(post.description_text, body)
+
+    def test_edits_remove_the_previous_spilled_body(self):
+        self.post.description_text = 'A body longer than the threshold'
+        self.post.save()
+        previous = self.post.description.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.description_text = 'Another body longer than the threshold'
+            self.post.save()
+
+        self.assertNotEqual(self.post.description.name, previous)
+        self.assertFalse(default_storage.exists(previous))
+        self.assertEqual(Post.objects.get(pk=self.post.pk).description_text, 'Another body longer than the threshold')
+
+
+class FileBodyCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = FileBodyCache(max_bytes=1000, max_entry_bytes=400, mmap_threshold=64)
+
+    def write(self, name, text, mtime_ns=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as body:
+            body.write(text)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_reads_are_cached_until_the_file_changes(self):
+        path = self.write('body.txt', 'first', mtime_ns=10 ** 18)
+        self.assertEqual(self.cache.read(path), 'first')
+        self.assertEqual(self.cache.read(path), 'first')
+        self.write('body.txt', 'second', mtime_ns=10 ** 18 + 1)
+        self.assertEqual(self.cache.read(path), 'second')
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 2))
+
+    def test_large_files_are_decoded_from_a_memory_map(self):
+        text = 'é' * 100
+        self.assertEqual(self.cache.read(self.write('large.txt', text)), text)
+
+    def test_least_recently_used_bodies_are_evicted(self):
+        paths = [self.write(f'{index}.txt', str(index) * 200) for index in range(5)]
+        for path in paths:
+            self.cache.read(path)
+        stats = self.cache.stats()
+        self.assertLessEqual(stats['bytes'], 1000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertNotIn(paths[0], self.cache.entries)
+        self.assertIn(paths[-1], self.cache.entries)
+
+    def test_bodies_above_the_entry_limit_are_not_cached(self):
+        path = self.write('huge.txt', 'x' * 500)
+        self.assertEqual(self.cache.read(path), 'x' * 500)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+
+class MediaStreamTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.video = Video(media_type='video', title='Video')
+        self.video.upload.save('clip.mp4', ContentFile(b'0123456789'))
+        self.url = reverse('video_stream', args=[self.video.pk])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, b'0123456789'))
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_ranges(self):
+        response, body = self.get(Range='bytes=2-5')
+        self.assertEqual((response.status_code, body, response['Content-Range']), (206, b'2345', 'bytes 2-5/10'))
+        response, body = self.get(Range='bytes=-3')
+        self.assertEqual((response.status_code, body), (206, b'789'))
+        response, body = self.get(Range='bytes=20-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10'))
+
+    def test_validators(self):
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(**{'If-None-Match': etag})[0].status_code, 304)
+        # A range of another version of the file is ignored.
+        response, body = self.get(Range='bytes=2-5', **{'If-Range': '"other"'})
+        self.assertEqual((response.status_code, body), (200, b'0123456789'))
+        self.assertEqual(self.get(Range='bytes=2-5', **{'If-Range': etag})[0].status_code, 206)
+
+    def test_head_has_no_body(self):
+        response = self.client.head(self.url, headers={'Range': 'bytes=0-3'})
+        self.assertEqual((response.status_code, response['Content-Length'], response.content), (206, '4', b''))
+
+
+class MediaIndexTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.post = Post.objects.create(title='Post', account=account)
+        self.videos = []
+        for title in ('First', 'Second'):
+            video = Video(media_type='video', title=title, post=self.post)
+            video.upload.save('clip.mp4', ContentFile(b'0123456789'))
+            self.videos.append(video)
+        self.jazz = Tag.objects.create(name='Jazz', slug='jazz')
+        self.blues = Tag.objects.create(name='Blues', slug='blues')
+
+    def indexed_tags(self, video):
+        return MediaIndex.objects.get(media_id=video.pk).tags
+
+    def test_media_are_loaded_from_the_index(self):
+        self.videos[0].tags.add(self.jazz)
+        media = {video.title: video for video in load_media(posts=[self.post])}
+        self.assertEqual(set(media), {'First', 'Second'})
+        self.assertIsInstance(media['First'], Video)
+        self.assertEqual(media['First'].upload.name, self.videos[0].upload.name)
+        self.assertEqual(media['First'].tag_names, ['jazz'])
+
+    def test_tag_changes_are_copied_to_the_index(self):
+        self.videos[0].tags.add(self.jazz, self.blues)
+        self.jazz.media.add(self.videos[1])
+        self.assertEqual(self.indexed_tags(self.videos[0]), ['blues', 'jazz'])
+        self.assertEqual(self.indexed_tags(self.videos[1]), ['jazz'])
+
+        self.jazz.slug = 'cool-jazz'
+        self.jazz.save()
+        self.assertEqual(self.indexed_tags(self.videos[0]), ['blues', 'cool-jazz'])
+        self.blues.delete()
+        self.assertEqual(self.indexed_tags(self.videos[0]), ['cool-jazz'])
+
+    def test_only_renamed_tags_reindex_their_media(self):
+        self.jazz.media.add(*self.videos)
+        with mock.patch('content.signals.refresh_media_tags') as refresh:
+            self.jazz.description = "Swing and bebop."
+            self.jazz.save()
+            Tag.objects.create(name='Folk', slug='folk')
+        refresh.assert_not_called()
+
+    def test_tags_are_written_in_one_statement(self):
+        self.jazz.media.add(*self.videos)
+        MediaIndex.objects.update(tags=[])
+        with self.assertNumQueries(2):
+            refresh_media_tags(video.pk for video in self.videos)
+        self.assertEqual([self.indexed_tags(video) for video in self.videos], [['jazz'], ['jazz']])
+
+
+class UploadSessionTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.account = Account.objects.create(
+            username='uploader', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.client.force_login(self.account)
+
+    def start(self, size=10, **fields):
+        return self.client.post(
+            reverse('upload_sessions'),
+            {'media_type': 'video', 'title': 'Video', 'filename': 'clip.mp4', 'size': size, **fields},
+            content_type='application/json',
+        )
+
+    def send(self, url, data, offset):
+        return self.client.patch(
+            url, data, content_type='application/offset+octet-stream', headers={'Upload-Offset': str(offset)}
+        )
+
+    def test_chunks_are_assembled_into_a_media(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        url = response['Location']
+
+        response = self.send(url, b'01234', 0)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (204, '5'))
+        # A client that lost the acknowledgement asks where to resume from.
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '5')
+        response = self.send(url, b'56789', 5)
+        self.assertEqual(response.status_code, 201)
+
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, 'complete')
+        with session.media.video.upload.open('rb') as upload:
+            self.assertEqual(upload.read(), b'0123456789')
+        self.assertFalse(os.path.exists(session.part_path))
+
+    def test_chunks_must_start_at_the_received_offset(self):
+        url = self.start()['Location']
+        self.send(url, b'01234', 0)
+        response = self.send(url, b'01234', 0)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '5'))
+        self.assertEqual(self.send(url, b'5678901', 5).status_code, 413)
+
+    def test_mismatching_checksums_abort_the_upload(self):
+        url = self.start(checksum='0' * 64)['Location']
+        self.assertEqual(self.send(url, b'0123456789', 0).status_code, 422)
+        self.assertEqual(UploadSession.objects.get().status, 'aborted')
+
+    def test_media_is_only_attached_to_own_posts(self):
+        other = Account.objects.create(
+            username='other', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        own = Post.objects.create(title='Own', account=self.account)
+        foreign = Post.objects.create(title='Foreign', account=other)
+        self.assertEqual(self.start(post=own.pk).status_code, 201)
+        self.assertEqual(self.start(post=foreign.pk).status_code, 400)
+
+    def test_media_is_not_attached_to_comments(self):
+        # A visitor sharing the username of the account does not make the comment its own.
+        visitor = Visitor.objects.create(username='uploader')
+        post = Post.objects.create(title='Own', account=self.account)
+        comment = Comment.objects.create(user=visitor, post=post)
+        response = self.start(comment=comment.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('comment', response.json())
+
+    def test_sessions_of_other_accounts_are_hidden(self):
+        url = self.start()['Location']
+        self.client.logout()
+        other = Account.objects.create(
+            username='other', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.send(url, b'01234', 0).status_code, 404)
+
+
+
+def png(width, height):
+    data = BytesIO()
+    PillowImage.new('RGB', (width, height), 'red').save(data, 'PNG')
+    return ContentFile(data.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVES={**settings.IMAGE_DERIVATIVES, 'WIDTHS': [160, 320, 1280], 'FORMATS': ['webp']})
+class ImageDerivativeTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = Image(media_type='image', title='Image')
+        self.image.upload.save('photo.png', png(640, 320))
+        self.content_type = ContentType.objects.get_for_model(Image)
+
+    def render(self):
+        """
+        Renders the renditions of the current upload in this process, as a worker would.
+        """
+        targets = [
+            (width, 'webp', default_storage.path(derivative_name(self.image, 'upload', width, 'webp')))
+            for width in settings.IMAGE_DERIVATIVES['WIDTHS']
+        ]
+        future = Future()
+        future.set_result(render_derivatives(self.image.upload.path, targets, 80))
+        return future, self.image.upload.name
+
+    def test_renditions_are_recorded_and_served(self):
+        future, source_name = self.render()
+        record_derivatives(future, self.content_type, self.image.pk, 'upload', source_name)
+
+        derivatives = ImageDerivative.objects.filter(object_id=self.image.pk).order_by('width')
+        # No rendition wider than the original.
+        self.assertEqual([(d.width, d.height) for d in derivatives], [(160, 80), (320, 160)])
+        self.assertEqual(derivative_url(self.image, 'upload', 200), derivatives[1].file.url)
+        self.assertEqual(derivative_url(self.image, 'upload', 1000), self.image.upload.url)
+
+    def test_renditions_of_a_replaced_original_are_discarded(self):
+        future, source_name = self.render()
+        self.image.upload.save('other.png', png(640, 320))
+        record_derivatives(future, self.content_type, self.image.pk, 'upload', source_name)
+
+        self.assertFalse(ImageDerivative.objects.exists())
+        for rendition in future.result():
+            self.assertFalse(os.path.exists(rendition['path']))
+
+    def test_failures_are_logged_and_the_connection_released(self):
+        future = Future()
+        future.set_exception(OSError("broken image"))
+        with self.assertLogs('content.derivatives'):
+            record_derivatives(future, self.content_type, self.image.pk, 'upload', self.image.upload.name)
+
+        future, source_name = self.render()
+        with mock.patch('content.derivatives.store_derivatives', side_effect=RuntimeError):
+            with mock.patch('content.derivatives.connection') as connection, self.assertLogs('content.derivatives'):
+                connection.in_atomic_block = False
+                record_derivatives(future, self.content_type, self.image.pk, 'upload', source_name)
+        connection.close.assert_called_once_with()
+
+
+class ContentAddressedStorageTests(TemporaryMediaMixin, TestCase):
+    def write(self, name, data):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            target.write(data)
+        return path
+
+    def test_identical_uploads_share_a_blob(self):
+        first = default_storage.save('a/first.txt', ContentFile(b'same'))
+        second = default_storage.save('b/second.txt', ContentFile(b'same'))
+        other = default_storage.save('a/other.txt', ContentFile(b'other'))
+        self.assertTrue(os.path.samefile(default_storage.path(first), default_storage.path(second)))
+        self.assertEqual(default_storage.references(first), 2)
+        self.assertEqual(default_storage.references(other), 1)
+
+        default_storage.delete(first)
+        self.assertEqual(default_storage.references(second), 1)
+
+    def test_adopt_links_duplicates_but_not_partial_uploads(self):
+        stored = default_storage.save('a/stored.txt', ContentFile(b'same'))
+        old = self.write('old/copy.txt', b'same')
+        partial = self.write('partial/upload.part', b'same')
+
+        call_command('gc_media_blobs', '--adopt', '--grace', '0', stdout=StringIO())
+
+        self.assertTrue(os.path.samefile(default_storage.path(stored), old))
+        self.assertEqual(os.stat(partial).st_nlink, 1)
+
+    def test_dry_run_adopt_only_counts_files(self):
+        default_storage.save('a/stored.txt', ContentFile(b'same'))
+        old = self.write('old/copy.txt', b'same')
+        out = StringIO()
+
+        call_command('gc_media_blobs', '--adopt', '--dry-run', stdout=out)
+
+        self.assertIn("2 files checked, 0 duplicates", out.getvalue())
+        self.assertEqual(os.stat(old).st_nlink, 1)
+
+    def test_unreferenced_blobs_are_removed(self):
+        name = default_storage.save('a/file.txt', ContentFile(b'data'))
+        blob = default_storage.blob_path(default_storage.file_digest(default_storage.path(name)))
+        default_storage.delete(name)
+
+        call_command('gc_media_blobs', '--grace', '0', stdout=StringIO())
+
+        self.assertFalse(os.path.exists(blob))
@@ -0,0 +1,206 @@
+"""
+Resumable chunked uploads of large Video/Audio/Document media.
+
+An UploadSession is created with the declared size of the file, the chunks are then
+appended at the current offset of the session with PATCH requests (see
+content.views.UploadSessionView). Each chunk is streamed from the request straight
+to a partial file on disk while the SHA-256 of the file is updated, so that no
+worker ever buffers a whole file and a dropped connection only loses the bytes
+that were not written yet. Once the declared size is reached, the partial file is
+moved (not copied) into the upload field of a new Video, Audio or Document.
+"""
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+
+from wikitunes.storage import unshare
+
+from .models import Audio, Document, UploadSession, Video
+
+UPLOAD_MODELS = {
+    'video': Video,
+    'audio': Audio,
+    'document': Document,
+}
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk cannot be accepted, `status` is the HTTP status to answer with.
+    """
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class HasherCache:
+    """
+    Keeps the running SHA-256 of the sessions recently written by this process.
+
+    A hasher is only reused when it covers exactly the bytes received so far, otherwise
+    (the previous chunk was written by another worker, or the process restarted) it is
+    rebuilt by reading the partial file back.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, session):
+        with self.lock:
+            entry = self.entries.pop(session.pk, None)
+        if entry is not None and entry[0] == session.offset:
+            return entry[1]
+        hasher = hashlib.sha256()
+        with open(session.part_path, 'rb') as part:
+            remaining = session.offset
+            while remaining:
+                data = part.read(min(settings.CHUNKED_UPLOAD['BUFFER_SIZE'], remaining))
+                if not data:
+                    break
+                hasher.update(data)
+                remaining -= len(data)
+        return hasher
+
+    def put(self, session, hasher):
+        with self.lock:
+            self.entries[session.pk] = (session.offset, hasher)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, session):
+        with self.lock:
+            self.entries.pop(session.pk, None)
+
+
+hashers = HasherCache(max_entries=256)
+
+
+class PartialFile(File):
+    """
+    Partial file of a completed session, storages move it into place instead of copying it.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def start_session(session):
+    """
+    Creates the empty partial file of a new session.
+    """
+    os.makedirs(settings.CHUNKED_UPLOAD['TEMP_DIR'], exist_ok=True)
+    open(session.part_path, 'xb').close()
+
+
+def append_chunk(session, stream, offset, length):
+    """
+    Streams a chunk from `stream` to the end of the partial file of `session`.
+
+    Parameters:
+        session (UploadSession): Pending session the chunk belongs to.
+        stream: File-like object the chunk is read from (the request body).
+        offset (int): Offset of the chunk announced by the client (Upload-Offset).
+        length (int): Length of the chunk (Content-Length).
+
+    Returns:
+        UploadSession: The session, with its offset moved past the bytes written
+        (even if the client disconnected in the middle of the chunk).
+
+    Raises:
+        UploadError: If the session is not pending, the offset does not match the bytes
+            received so far, the chunk goes past the declared size or another request
+            is writing to the same session.
+    """
+    if session.status != 'pending':
+        raise UploadError("The upload is not pending anymore.", 409)
+
+    # Never written through a name shared with other files (see wikitunes.storage).
+    unshare(session.part_path)
+    with open(session.part_path, 'r+b') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk of this upload is being received.", 423)
+        # The previous chunk may have been received by another worker meanwhile.
+        session.refresh_from_db(fields=['offset', 'status'])
+        if session.status != 'pending':
+            raise UploadError("The upload is not pending anymore.", 409)
+        if offset != session.offset:
+            raise UploadError(f"The upload is at offset {session.offset}.", 409)
+        if session.offset + length > session.size:
+            raise UploadError("The chunk goes past the declared size of the file.", 413)
+        # Bytes past the offset come from a write that was never acknowledged.
+        part.truncate(session.offset)
+        part.seek(session.offset)
+        hasher = hashers.take(session)
+        received = 0
+        try:
+            while received < length:
+                data = stream.read(min(settings.CHUNKED_UPLOAD['BUFFER_SIZE'], length - received))
+                if not data:
+                    break
+                part.write(data)
+                hasher.update(data)
+                received += len(data)
+        except (OSError, UnreadablePostError):
+            # The client went away, keep what was received so that it can resume from there.
+            pass
+        finally:
+            part.flush()
+            session.offset += received
+            UploadSession.objects.filter(pk=session.pk).update(offset=session.offset)
+            hashers.put(session, hasher)
+
+        if session.offset == session.size:
+            complete_session(session, hasher.hexdigest())
+    return session
+
+
+def complete_session(session, checksum):
+    """
+    Moves the partial file of a fully received session into a new Video/Audio/Document.
+
+    Raises:
+        UploadError: If the file does not match the checksum declared by the client.
+    """
+    hashers.discard(session)
+    if session.checksum and session.checksum != checksum:
+        abort_session(session)
+        raise UploadError("The checksum of the received file does not match.", 422)
+
+    model = UPLOAD_MODELS[session.media_type]
+    media = model(
+        media_type=session.media_type,
+        title=session.title,
+        post=session.post,
+        comment=session.comment,
+    )
+    with transaction.atomic():
+        with open(session.part_path, 'rb') as part:
+            media.upload.save(session.filename, PartialFile(part, name=session.filename), save=False)
+        media.save()
+        session.media = media
+        session.checksum = checksum
+        session.status = 'complete'
+        session.save(update_fields=['media', 'checksum', 'status', 'updated_at'])
+    return media
+
+
+def abort_session(session):
+    """
+    Discards a session and its partial file.
+    """
+    hashers.discard(session)
+    try:
+        os.remove(session.part_path)
+    except FileNotFoundError:
+        pass
+    session.status = 'aborted'
+    session.save(update_fields=['status', 'updated_at'])
@@ -0,0 +1,11 @@
+from django.urls import path
+from .views import UploadSessionCreateView, UploadSessionView, media_stream, related_content, tag_cloud
+
+urlpatterns = [
+    path('video/<int:pk>/stream', media_stream, {'kind': 'video'}, name='video_stream'),
+    path('audio/<int:pk>/stream', media_stream, {'kind': 'audio'}, name='audio_stream'),
+    path('uploads', UploadSessionCreateView.as_view(), name='upload_sessions'),
+    path('uploads/<uuid:pk>', UploadSessionView.as_view(), name='upload_session'),
+    path('tags/cloud', tag_cloud, name='tag_cloud'),
+    path('related/<str:kind>/<int:pk>', related_content, name='related_content'),
+]
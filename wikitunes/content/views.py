@@ -1,3 +1,309 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework import generics
+from rest_framework.response import Response
+
+from .models import RELATED_KINDS, TAG_COUNTERS, Audio, TagCloudEntry, UploadSession, Video
+from .related import related_items
+from .serializers import UploadSessionSerializer
+from .uploads import UploadError, abort_session, append_chunk, start_session
+
+STREAMED_MEDIA = {
+    'video': Video,
+    'audio': Audio,
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    Read-only view of a byte range of an open file.
+
+    read() never goes past the end of the range, while fileno() still exposes the
+    file descriptor, positioned at the start of the range, so that WSGI servers
+    implementing wsgi.file_wrapper with os.sendfile (e.g. gunicorn) send the range
+    without copying it through Python.
+    """
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range` header.
+
+    Parameters:
+        header (str): Value of the Range header.
+        size (int): Size of the file in bytes.
+
+    Returns:
+        tuple or None: (start, end) inclusive byte positions, or None when the header
+        is malformed or asks for several ranges (the whole file is then served).
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Empty suffix range.")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable.")
+    return start, min(end, size - 1)
+
+
+def range_applies(request, etag, last_modified):
+    """
+    Evaluates If-Range: a range is only honoured when the validator still matches.
+    """
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    return parse_http_date_safe(validator) == last_modified
+
+
+def offload_response(fieldfile, content_type):
+    """
+    Hands the transfer of the file over to the front web server.
+    """
+    offload = settings.MEDIA_STREAMING['OFFLOAD']
+    response = HttpResponse(content_type=content_type)
+    if offload == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_STREAMING['ACCEL_PREFIX'] + fieldfile.name
+    else:
+        response['X-Sendfile'] = fieldfile.path
+    return response
+
+
+@require_safe
+def media_stream(request, kind, pk):
+    """
+    Streams the upload of a Video or Audio with HTTP Range/If-Range support and strong ETags.
+
+    Depending on settings.MEDIA_STREAMING, the bytes are sent by the front server
+    (X-Accel-Redirect / X-Sendfile) or through wsgi.file_wrapper, which lets the WSGI
+    server use os.sendfile.
+    """
+    model = STREAMED_MEDIA.get(kind)
+    if model is None:
+        raise Http404("Unknown media kind.")
+    media = get_object_or_404(model, pk=pk, is_valid=True)
+    fieldfile = media.upload
+    if not fieldfile:
+        raise Http404("No file uploaded.")
+
+    try:
+        stat = os.stat(fieldfile.path)
+    except FileNotFoundError:
+        raise Http404("File not found.")
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    content_type = mimetypes.guess_type(fieldfile.name)[0] or 'application/octet-stream'
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    if settings.MEDIA_STREAMING['OFFLOAD']:
+        response = offload_response(fieldfile, content_type)
+    else:
+        byte_range = None
+        range_header = request.headers.get('Range')
+        if range_header and range_applies(request, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        status = 206 if byte_range else 200
+        if request.method == 'HEAD':
+            response = HttpResponse(status=status, content_type=content_type)
+        else:
+            file = open(fieldfile.path, 'rb')
+            response = FileResponse(RangeFile(file, start, length), status=status, content_type=content_type)
+        response['Content-Length'] = length
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@require_safe
+def tag_cloud(request):
+    """
+    Returns the most used tags with their display weight, overall or for one kind of item.
+
+    Query parameters: `type` (posts, comments, media, articles or blogs) and `limit`.
+    The tags are read from the precomputed tag cloud entries.
+    """
+    listing = request.GET.get('type') or 'all'
+    if listing != 'all' and listing not in TAG_COUNTERS:
+        return JsonResponse({'detail': f"type must be one of {', '.join(TAG_COUNTERS)}."}, status=400)
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else settings.TAG_CLOUD['TOP_K']
+    except ValueError:
+        return JsonResponse({'detail': "limit must be an integer."}, status=400)
+    if limit < 1:
+        return JsonResponse({'detail': "limit must be at least 1."}, status=400)
+    entries = (
+        TagCloudEntry.objects.filter(listing=listing)
+        .select_related('tag')
+        .order_by('rank')[:min(limit, settings.TAG_CLOUD['TOP_K'])]
+    )
+    return JsonResponse({
+        'listing': listing,
+        'results': [
+            {
+                'name': entry.tag.name,
+                'slug': entry.tag.slug,
+                'rank': entry.rank,
+                'count': entry.count,
+                'weight': entry.weight,
+            }
+            for entry in entries
+        ],
+    })
+
+
+@require_safe
+def related_content(request, kind, pk):
+    """
+    Returns the posts, articles, blogs and media related to an item by their tags.
+
+    Query parameters: `type` (comma separated kinds to return) and `limit`. The items
+    are scored from the tag co-occurrence index, without querying the database.
+    """
+    if kind not in RELATED_KINDS:
+        raise Http404("Unknown content kind.")
+    kinds = request.GET['type'].split(',') if request.GET.get('type') else None
+    if kinds is not None and not set(kinds) <= set(RELATED_KINDS):
+        return JsonResponse({'detail': f"type must be among {', '.join(RELATED_KINDS)}."}, status=400)
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'detail': "limit must be an integer."}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'detail': "limit must be at least 1."}, status=400)
+    return JsonResponse({'type': kind, 'id': pk, 'results': related_items(kind, pk, limit, kinds)})
+
+
+def upload_headers(session):
+    return {
+        'Upload-Offset': str(session.offset),
+        'Upload-Length': str(session.size),
+        'Cache-Control': 'no-store',
+    }
+
+
+class UploadSessionCreateView(generics.CreateAPIView):
+    """
+    Starts a resumable chunked upload of a video, audio or document.
+
+    The response gives the URL of the session in its Location header, the file is then
+    sent to it in one or more chunks (see UploadSessionView).
+    """
+    serializer_class = UploadSessionSerializer
+
+    def perform_create(self, serializer):
+        session = serializer.save(
+            account=self.request.user,
+            expires_at=timezone.now() + settings.CHUNKED_UPLOAD['EXPIRY'],
+        )
+        start_session(session)
+
+    def get_success_headers(self, data):
+        session = UploadSession(id=data['id'], offset=0, size=data['size'])
+        headers = upload_headers(session)
+        headers['Location'] = reverse('upload_session', args=[session.id])
+        return headers
+
+
+class UploadSessionView(generics.RetrieveDestroyAPIView):
+    """
+    Receives the chunks of a resumable upload.
+
+    HEAD (or GET) returns the number of bytes received so far in Upload-Offset.
+    PATCH appends the `application/offset+octet-stream` body at the offset given in
+    Upload-Offset, which must be the current offset of the session; after a dropped
+    connection the client asks for the offset and resumes from there. The media is
+    created by the PATCH completing the file. DELETE aborts the upload.
+    """
+    serializer_class = UploadSessionSerializer
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(account=self.request.user)
+
+    def head(self, request, *args, **kwargs):
+        return Response(headers=upload_headers(self.get_object()))
+
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        return Response(self.get_serializer(session).data, headers=upload_headers(session))
+
+    def patch(self, request, *args, **kwargs):
+        session = self.get_object()
+        if request.content_type != 'application/offset+octet-stream':
+            return Response({'detail': "Chunks must be sent as application/offset+octet-stream."}, status=415)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({'detail': "Upload-Offset and Content-Length are required."}, status=400)
+
+        try:
+            append_chunk(session, request.stream, offset, length)
+        except UploadError as error:
+            return Response({'detail': str(error)}, status=error.status, headers=upload_headers(session))
+        if session.status == 'complete':
+            return Response(self.get_serializer(session).data, status=201, headers=upload_headers(session))
+        return Response(status=204, headers=upload_headers(session))
+
+    def perform_destroy(self, instance):
+        abort_session(instance)
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:16
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+from content.models import reaction_stat
+
+
+def fill_reaction_counters(apps, schema_editor):
+    SiteReaction = apps.get_model('content', 'SiteReaction')
+    Comment = apps.get_model('content', 'Comment')
+    Forum = apps.get_model('forums', 'Forum')
+    Forum.objects.update(
+        reaction_count=reaction_stat(Forum, SiteReaction, 'forum', Count('pk'), 0),
+        rating_sum=reaction_stat(Forum, SiteReaction, 'forum', Sum('num_star'), 0),
+        comment_count=reaction_stat(Forum, Comment, 'forum', Count('pk'), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0001_initial'),
+        ('forums', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forum',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of comments received.'),
+        ),
+        migrations.AddField(
+            model_name='forum',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of the stars of all reactions received.'),
+        ),
+        migrations.AddField(
+            model_name='forum',
+            name='reaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of reactions received.'),
+        ),
+        migrations.RunPython(fill_reaction_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:20
+
+import forums.models
+import wikitunes.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0002_forum_comment_count_forum_rating_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forum',
+            name='description_text',
+            field=wikitunes.fields.HybridTextField(blank=True, file_field='description', help_text='Forum content, stored inline when small enough.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='forum',
+            name='description',
+            field=models.FileField(blank=True, help_text='File describing the forum content.', upload_to=forums.models.forum_data_desc_dir_path),
+        ),
+    ]
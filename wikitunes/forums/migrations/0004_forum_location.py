@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0003_forum_description_text_alter_forum_description'),
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forum',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text='Location the forum is about.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='forums', to='locations.location'),
+        ),
+    ]
@@ -5,7 +5,8 @@ from django.db.models import Avg
 
 from tunes.models import BaseModel
 from accounts.models import Account
-from content.models import CATEGORY_CHOICES, ReactionMixin
+from content.models import CATEGORY_CHOICES, ReactionCounters, ReactionMixin, ReactionQuerySet
+from wikitunes.fields import HybridTextField
 
 def dynamic_dir_path(instance, filename, folder):
     """
@@ -47,7 +48,7 @@ class BaseModel(models.Model):
 
 
 
-class Forum(BaseModel, ReactionMixin):
+class Forum(BaseModel, ReactionCounters, ReactionMixin):
     """
     Represents a forum associated with an account, containing categories and ratings.
     """
@@ -55,7 +56,8 @@ class Forum(BaseModel, ReactionMixin):
     comment_field = 'forum'
     
     title = models.CharField(max_length=50, help_text="Title of the forum.")
-    description = models.FileField(upload_to=forum_data_desc_dir_path, help_text="File describing the forum content.")
+    description = models.FileField(upload_to=forum_data_desc_dir_path, blank=True, help_text="File describing the forum content.")
+    description_text = HybridTextField(file_field='description', help_text="Forum content, stored inline when small enough.")
     category = models.CharField(
         max_length=10, 
         choices=CATEGORY_CHOICES,
@@ -69,6 +71,16 @@ class Forum(BaseModel, ReactionMixin):
         on_delete = models.CASCADE,
         help_text="Associated account for the forum."
     )
+    location = models.ForeignKey(
+        'locations.Location',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='forums',
+        help_text="Location the forum is about."
+    )
+
+    objects = ReactionQuerySet.as_manager()
     
     class Meta:
         ordering = ['-pub_date']
@@ -0,0 +1,172 @@
+"""
+Precomputed clusters of the locations, one grid per zoom level.
+
+Every zoom level from 0 to CLUSTERS['MAX_ZOOM'] has a grid of CELLS_PER_TILE cells
+per Web Mercator tile side, and a LocationCluster row per non-empty cell holding
+the number of locations in it and the sums of their coordinates, the centroid
+being sum / count. Saving, moving or deleting a location only changes the cell of
+its old and new positions at every zoom: counts and sums are adjusted in the
+database (UPDATE ... SET count = count + delta), without reading the rows, and
+emptied cells are removed.
+
+A map viewport is served by reading the cells of its bbox at one zoom level with
+the (zoom, x, y) index.
+"""
+import math
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Location, LocationCluster
+from .tiles import pixel_position
+
+
+def grid_cell(longitude, latitude, zoom):
+    """
+    Returns the (x, y) cell of a point in the grid of a zoom level.
+    """
+    cells = settings.CLUSTERS['CELLS_PER_TILE']
+    last = 2 ** zoom * cells - 1
+    x, y = pixel_position(longitude, latitude, zoom)
+    return min(max(math.floor(x * cells), 0), last), min(max(math.floor(y * cells), 0), last)
+
+
+def cell_deltas(added=(), removed=()):
+    """
+    Returns the changes of count, latitude sum and longitude sum of every cell, keyed by (zoom, x, y).
+
+    Parameters:
+        added, removed: (longitude, latitude) pairs of the points entering and leaving the grids.
+    """
+    deltas = {}
+    for sign, points in ((1, added), (-1, removed)):
+        for longitude, latitude in points:
+            for zoom in range(settings.CLUSTERS['MAX_ZOOM'] + 1):
+                delta = deltas.setdefault((zoom, *grid_cell(longitude, latitude, zoom)), [0, 0.0, 0.0])
+                delta[0] += sign
+                delta[1] += sign * latitude
+                delta[2] += sign * longitude
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Adds cell deltas to the LocationCluster rows, creating the cells that gain locations
+    and removing the cells left empty.
+    """
+    quote = connection.ops.quote_name
+    table = quote(LocationCluster._meta.db_table)
+    # Rows are always locked in (zoom, x, y) order, concurrent updates cannot deadlock.
+    rows = sorted((cell, delta) for cell, delta in deltas.items() if delta[0] or delta[1] or delta[2])
+    growing = [(*cell, *delta) for cell, delta in rows if delta[0] >= 0]
+    shrinking = [(*cell, *delta) for cell, delta in rows if delta[0] < 0]
+    with connection.cursor() as cursor:
+        if growing:
+            values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(growing))
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (zoom, x, y, count, latitude_sum, longitude_sum) VALUES {values}
+                ON CONFLICT (zoom, x, y) DO UPDATE SET
+                    count = {table}.count + EXCLUDED.count,
+                    latitude_sum = {table}.latitude_sum + EXCLUDED.latitude_sum,
+                    longitude_sum = {table}.longitude_sum + EXCLUDED.longitude_sum
+                """,
+                [value for row in growing for value in row],
+            )
+        if shrinking:
+            # Decrements never insert: a negative count would break the CHECK constraint.
+            values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(shrinking))
+            params = [value for row in shrinking for value in row]
+            cursor.execute(
+                f"""
+                WITH delta (zoom, x, y, count, latitude_sum, longitude_sum) AS (VALUES {values})
+                UPDATE {table} SET
+                    count = {table}.count + delta.count,
+                    latitude_sum = {table}.latitude_sum + delta.latitude_sum,
+                    longitude_sum = {table}.longitude_sum + delta.longitude_sum
+                FROM delta
+                WHERE {table}.zoom = delta.zoom AND {table}.x = delta.x AND {table}.y = delta.y
+                """,
+                params,
+            )
+            cells = ', '.join(['(%s, %s, %s)'] * len(shrinking))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE count = 0 AND (zoom, x, y) IN (VALUES {cells})",
+                [value for row in shrinking for value in row[:3]],
+            )
+
+
+def update_clusters(added=(), removed=()):
+    """
+    Moves points in and out of the cluster grids of every zoom level.
+
+    Parameters:
+        added, removed: (longitude, latitude) pairs of the points entering and leaving the grids.
+    """
+    deltas = cell_deltas(added, removed)
+    if deltas:
+        with transaction.atomic():
+            apply_deltas(deltas)
+
+
+def rebuild_clusters(location_model=None, cluster_model=None):
+    """
+    Recomputes every cluster from the locations.
+
+    Parameters:
+        location_model, cluster_model: The Location and LocationCluster models, default to
+            the current ones (migrations pass the historical ones).
+
+    Returns:
+        int: The number of clusters written.
+    """
+    location_model = location_model or Location
+    cluster_model = cluster_model or LocationCluster
+    cells = {}
+    for point in location_model.objects.values_list('coordinates', flat=True).iterator(chunk_size=10000):
+        if point is None:
+            continue
+        for cell, (count, latitude_sum, longitude_sum) in cell_deltas(added=[(point.x, point.y)]).items():
+            total = cells.setdefault(cell, [0, 0.0, 0.0])
+            total[0] += count
+            total[1] += latitude_sum
+            total[2] += longitude_sum
+    clusters = [
+        cluster_model(zoom=zoom, x=x, y=y, count=count, latitude_sum=latitude_sum, longitude_sum=longitude_sum)
+        for (zoom, x, y), (count, latitude_sum, longitude_sum) in cells.items()
+    ]
+    with transaction.atomic():
+        cluster_model.objects.all().delete()
+        cluster_model.objects.bulk_create(clusters, batch_size=5000)
+    return len(clusters)
+
+
+def clusters_in_bbox(bbox, zoom):
+    """
+    Returns the clusters of a map viewport.
+
+    Parameters:
+        bbox (tuple): (west, south, east, north) in degrees, west > east when crossing the antimeridian.
+        zoom (int): Zoom level of the map, CLUSTERS['MAX_ZOOM'] at most.
+
+    Returns:
+        list: Dicts with the centroid and number of locations of every cluster, largest first.
+    """
+    config = settings.CLUSTERS
+    zoom = min(max(zoom, 0), config['MAX_ZOOM'])
+    west, south, east, north = bbox
+    west_x, north_y = grid_cell(west, north, zoom)
+    east_x, south_y = grid_cell(east, south, zoom)
+    clusters = LocationCluster.objects.filter(zoom=zoom, y__range=(north_y, south_y))
+    if west <= east:
+        clusters = clusters.filter(x__range=(west_x, east_x))
+    else:
+        clusters = clusters.filter(x__gte=west_x) | clusters.filter(x__lte=east_x)
+    return [
+        {
+            'latitude': cluster.latitude,
+            'longitude': cluster.longitude,
+            'count': cluster.count,
+        }
+        for cluster in clusters.order_by('-count')[:config['MAX_CLUSTERS']]
+    ]
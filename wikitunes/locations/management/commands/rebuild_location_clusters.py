@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from locations.clusters import rebuild_clusters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the location clusters of every zoom level from the locations. Run it "
+        "after changing the CLUSTERS settings, and whenever locations were changed with bulk "
+        "operations that bypass model signals."
+    )
+
+    def handle(self, *args, **options):
+        written = rebuild_clusters()
+        self.stdout.write(f"{written} location clusters written.")
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:53
+
+from django.db import migrations, models
+
+from locations.clusters import rebuild_clusters
+
+
+def fill_clusters(apps, schema_editor):
+    rebuild_clusters(apps.get_model('locations', 'Location'), apps.get_model('locations', 'LocationCluster'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField(help_text='Zoom level of the grid.')),
+                ('x', models.IntegerField(help_text='Column of the cell, from the antimeridian eastwards.')),
+                ('y', models.IntegerField(help_text='Row of the cell, from the north edge of Web Mercator southwards.')),
+                ('count', models.PositiveIntegerField(default=0, help_text='Number of locations in the cell.')),
+                ('latitude_sum', models.FloatField(default=0, help_text='Sum of the latitudes of the locations, for the centroid.')),
+                ('longitude_sum', models.FloatField(default=0, help_text='Sum of the longitudes of the locations, for the centroid.')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('zoom', 'x', 'y'), name='locations_locationcluster_cell')],
+            },
+        ),
+        migrations.RunPython(fill_clusters, migrations.RunPython.noop),
+    ]
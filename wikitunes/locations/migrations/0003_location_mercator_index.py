@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# locations.tiles.MERCATOR_SQL, the position tiles are searched by.
+MERCATOR = (
+    "ST_Transform(ST_SetSRID(ST_MakePoint(ST_X(coordinates::geometry), "
+    "LEAST(GREATEST(ST_Y(coordinates::geometry), -85.0511287798066), 85.0511287798066)), 4326), 3857)"
+)
+
+
+def create_index(apps, schema_editor):
+    if getattr(schema_editor.connection.ops, 'postgis', False):
+        schema_editor.execute(
+            f'CREATE INDEX locations_location_mercator ON locations_location USING GIST (({MERCATOR}))'
+        )
+
+
+def drop_index(apps, schema_editor):
+    if getattr(schema_editor.connection.ops, 'postgis', False):
+        schema_editor.execute('DROP INDEX IF EXISTS locations_location_mercator')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0002_locationcluster'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
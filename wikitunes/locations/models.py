@@ -17,3 +17,35 @@ class Location(gis_models.Model):
 
     def __str__(self):
         return self.address
+
+
+class LocationCluster(models.Model):
+    """
+    Cell of the clustering grid of one zoom level, counting the locations it contains.
+
+    The grid has CLUSTERS['CELLS_PER_TILE'] cells per side of a Web Mercator tile, so
+    the cells keep the same size on screen at every zoom. Maintained incrementally by
+    locations.clusters when locations are saved or deleted.
+    """
+    zoom = models.PositiveSmallIntegerField(help_text="Zoom level of the grid.")
+    x = models.IntegerField(help_text="Column of the cell, from the antimeridian eastwards.")
+    y = models.IntegerField(help_text="Row of the cell, from the north edge of Web Mercator southwards.")
+    count = models.PositiveIntegerField(default=0, help_text="Number of locations in the cell.")
+    latitude_sum = models.FloatField(default=0, help_text="Sum of the latitudes of the locations, for the centroid.")
+    longitude_sum = models.FloatField(default=0, help_text="Sum of the longitudes of the locations, for the centroid.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['zoom', 'x', 'y'], name='locations_locationcluster_cell'),
+        ]
+
+    @property
+    def latitude(self):
+        return self.latitude_sum / self.count
+
+    @property
+    def longitude(self):
+        return self.longitude_sum / self.count
+
+    def __str__(self):
+        return f"{self.zoom}/{self.x}/{self.y}: {self.count}"
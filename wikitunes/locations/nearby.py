@@ -0,0 +1,150 @@
+"""
+Proximity queries over Location.coordinates.
+
+Locations are ordered with the PostGIS KNN operator (`coordinates <-> point`, the
+GeometryDistance function), which PostgreSQL answers by walking the GiST index of
+the geography column nearest first, so only the returned rows are read. The
+radius filter (ST_DWithin) uses the same index. The map viewport is a rectangle in
+longitude/latitude degrees, it is tested on the planar geometry of the points
+(`coordinates::geometry && ST_MakeEnvelope(...)`): on the geography, edges are
+great circles and a whole-world or very wide bbox no longer bounds the viewport.
+
+The events, forums and searches linked to the returned locations are read with
+one query each, keeping the first LINKED_LIMIT items of every location.
+"""
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField, PointField
+from django.contrib.gis.db.models.functions import GeometryDistance
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.db.models import Count, F, Func, Q, Value, Window
+from django.db.models.functions import Cast, RowNumber
+
+from forums.models import Forum
+from research.models import Event, SearchHistory
+
+from .models import Location
+
+
+class MakeEnvelope(Func):
+    function = 'ST_MakeEnvelope'
+    output_field = GeometryField(srid=4326)
+
+
+def bbox_filter(west, south, east, north):
+    """
+    Returns the filter of the points of a map viewport, split in two envelopes when it
+    crosses the antimeridian. Applies to the `geometry` annotation of the coordinates.
+    """
+    ranges = [(west, east)] if west <= east else [(west, 180), (-180, east)]
+    condition = Q()
+    for low, high in ranges:
+        envelope = MakeEnvelope(Value(low), Value(south), Value(high), Value(north), Value(4326))
+        condition |= Q(geometry__bboverlaps=envelope)
+    return condition
+
+
+def nearest_locations(latitude, longitude, k, radius=None, bbox=None):
+    """
+    Returns the `k` locations nearest to a point, closest first.
+
+    Parameters:
+        latitude (float), longitude (float): The point, in degrees.
+        k (int): Maximum number of locations.
+        radius (float): Only locations within this many meters.
+        bbox (tuple): Only locations within (west, south, east, north), in degrees.
+
+    Returns:
+        list: Location instances, with their `distance` to the point in meters.
+    """
+    point = Point(longitude, latitude, srid=4326)
+    locations = Location.objects.all()
+    if radius is not None:
+        locations = locations.filter(coordinates__dwithin=(point, D(m=radius)))
+    if bbox is not None:
+        locations = locations.annotate(geometry=Cast('coordinates', PointField(srid=4326))).filter(bbox_filter(*bbox))
+    return list(
+        locations.defer('description')
+        .annotate(distance=GeometryDistance('coordinates', point))
+        .order_by('distance')[:k]
+    )
+
+
+def first_per_location(queryset, fields, order_by, limit):
+    """
+    Returns the first `limit` rows of `queryset` for every location, as value dicts grouped by location id.
+    """
+    rows = (
+        queryset.annotate(position=Window(RowNumber(), partition_by=F('location_id'), order_by=order_by))
+        .filter(position__lte=limit)
+        .values('location_id', *fields)
+    )
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop('location_id'), []).append(row)
+    return grouped
+
+
+def linked_items(location_ids):
+    """
+    Returns the events, forums and search statistics of the given locations.
+
+    Returns:
+        dict: {'events': ..., 'forums': ..., 'search_count': ...} grouped by location id.
+    """
+    limit = settings.NEARBY['LINKED_LIMIT']
+    events = first_per_location(
+        Event.objects.filter(location_id__in=location_ids, is_valid=True),
+        ['id', 'title', 'start_time', 'end_time'],
+        [F('start_time').desc()],
+        limit,
+    )
+    forums = first_per_location(
+        Forum.objects.filter(location_id__in=location_ids, is_valid=True),
+        ['id', 'title'],
+        [F('pub_date').desc()],
+        limit,
+    )
+    search_counts = dict(
+        SearchHistory.objects.filter(location_id__in=location_ids)
+        .values('location_id')
+        .annotate(count=Count('id'))
+        .order_by()
+        .values_list('location_id', 'count')
+    )
+    return {'events': events, 'forums': forums, 'search_count': search_counts}
+
+
+def nearby(latitude, longitude, k=None, radius=None, bbox=None):
+    """
+    Returns the nearest locations of a point with the events, forums and searches linked to them.
+
+    Parameters:
+        latitude (float), longitude (float): The point, in degrees.
+        k (int): Maximum number of locations (settings.NEARBY['MAX_K'] at most).
+        radius (float): Only locations within this many meters (settings.NEARBY['MAX_RADIUS'] at most).
+        bbox (tuple): Only locations within (west, south, east, north), in degrees.
+
+    Returns:
+        list: Dicts describing every location, closest first.
+    """
+    config = settings.NEARBY
+    k = min(k or config['K'], config['MAX_K'])
+    if radius is not None:
+        radius = min(radius, config['MAX_RADIUS'])
+    locations = nearest_locations(latitude, longitude, k, radius, bbox)
+    linked = linked_items([location.pk for location in locations])
+    return [
+        {
+            'id': location.pk,
+            'name': location.name,
+            'address': location.address,
+            'latitude': location.coordinates.y,
+            'longitude': location.coordinates.x,
+            'distance': location.distance,
+            'events': linked['events'].get(location.pk, []),
+            'forums': linked['forums'].get(location.pk, []),
+            'search_count': linked['search_count'].get(location.pk, 0),
+        }
+        for location in locations
+    ]
@@ -0,0 +1,61 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .clusters import update_clusters
+from .models import Location
+from .tiles import invalidate_point
+
+
+def positions(*points):
+    return {(point.x, point.y) for point in points if point is not None}
+
+
+def invalidate_after_commit(points):
+    def invalidate():
+        for longitude, latitude in points:
+            invalidate_point(longitude, latitude)
+    transaction.on_commit(invalidate)
+
+
+def remember_position(sender, instance, raw=False, **kwargs):
+    instance._previous_coordinates = None
+    if not raw and instance.pk is not None:
+        instance._previous_coordinates = (
+            Location.objects.filter(pk=instance.pk).values_list('coordinates', flat=True).first()
+        )
+
+
+def invalidate_saved(sender, instance, raw=False, **kwargs):
+    # The tiles of the previous position lose the point, the tiles of the new one gain it
+    # (or show its new name), both sets are the same when the location did not move.
+    if not raw:
+        invalidate_after_commit(positions(getattr(instance, '_previous_coordinates', None), instance.coordinates))
+
+
+def invalidate_deleted(sender, instance, **kwargs):
+    invalidate_after_commit(positions(instance.coordinates))
+
+
+def cluster_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = positions(getattr(instance, '_previous_coordinates', None))
+    current = positions(instance.coordinates)
+    if previous != current:
+        update_clusters(added=current, removed=previous)
+
+
+def cluster_deleted(sender, instance, **kwargs):
+    update_clusters(removed=positions(instance.coordinates))
+
+
+def connect_signals():
+    """
+    Connects the handlers removing the cached map tiles and updating the clusters of
+    saved and deleted locations.
+    """
+    pre_save.connect(remember_position, sender=Location, dispatch_uid='locations.tiles')
+    post_save.connect(invalidate_saved, sender=Location, dispatch_uid='locations.tiles')
+    post_delete.connect(invalidate_deleted, sender=Location, dispatch_uid='locations.tiles')
+    post_save.connect(cluster_saved, sender=Location, dispatch_uid='locations.clusters')
+    post_delete.connect(cluster_deleted, sender=Location, dispatch_uid='locations.clusters')
@@ -1,3 +1,139 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import tiles
+from .clusters import cell_deltas, grid_cell, update_clusters
+from .models import Location, LocationCluster
+
+PARIS = (2.3522, 48.8566)
+LYON = (4.8357, 45.7640)
+
+
+class NearbyViewTests(TestCase):
+    def test_rejects_k_below_one(self):
+        for k in ('0', '-5'):
+            response = self.client.get(reverse('nearby'), {'lat': PARIS[1], 'lng': PARIS[0], 'k': k})
+            self.assertEqual(response.status_code, 400)
+
+    def test_rejects_radius_not_positive(self):
+        for radius in ('0', '-10', 'nan'):
+            response = self.client.get(reverse('nearby'), {'lat': PARIS[1], 'lng': PARIS[0], 'radius': radius})
+            self.assertEqual(response.status_code, 400)
+
+    def test_rejects_invalid_viewports(self):
+        for bbox in ('1,2,3', '2,50,3,40', '2,48,3,95'):
+            response = self.client.get(reverse('nearby'), {'lat': PARIS[1], 'lng': PARIS[0], 'bbox': bbox})
+            self.assertEqual(response.status_code, 400)
+
+
+class TileCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(TILES={**settings.TILES, 'CACHE_DIR': directory.name})
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.z = settings.TILES['CACHE_MAX_ZOOM']
+        self.x, self.y = (int(position) for position in tiles.pixel_position(*PARIS, self.z))
+
+    def get_tile(self, data):
+        with mock.patch.object(tiles, 'render_tile', return_value=data) as render:
+            tile = tiles.get_tile(self.z, self.x, self.y)
+        return tile, render.called
+
+    def test_tiles_are_cached_until_invalidated(self):
+        self.assertEqual(self.get_tile(b'first'), (b'first', True))
+        self.assertEqual(self.get_tile(b'second'), (b'first', False))
+
+        self.assertGreaterEqual(tiles.invalidate_point(*PARIS), 1)
+        self.assertEqual(self.get_tile(b'second'), (b'second', True))
+
+    def test_other_tiles_are_kept(self):
+        self.get_tile(b'first')
+        self.assertEqual(tiles.invalidate_point(*LYON), 0)
+        self.assertTrue(os.path.exists(tiles.tile_path(self.z, self.x, self.y)))
+
+    def test_tiles_invalidated_while_rendering_are_not_cached(self):
+        def render(z, x, y):
+            tiles.invalidate_point(*PARIS)
+            return b'stale'
+
+        with mock.patch.object(tiles, 'render_tile', side_effect=render):
+            self.assertEqual(tiles.get_tile(self.z, self.x, self.y), b'stale')
+        self.assertFalse(os.path.exists(tiles.tile_path(self.z, self.x, self.y)))
+        self.assertEqual(self.get_tile(b'fresh'), (b'fresh', True))
+
+    def test_the_whole_world_is_one_tile_at_zoom_zero(self):
+        self.assertTrue(tiles.is_valid_tile(0, 0, 0))
+        self.assertFalse(tiles.is_valid_tile(0, 1, 0))
+        for point in (PARIS, (-179.9, -60), (179.9, 89)):
+            self.assertEqual(tiles.covering_tiles(*point, 0), {(0, 0, 0)})
+        with mock.patch.object(tiles, 'render_tile', return_value=b'world'):
+            tiles.get_tile(0, 0, 0)
+        tiles.invalidate_point(179.9, 89)
+        self.assertFalse(os.path.exists(tiles.tile_path(0, 0, 0)))
+
+
+@override_settings(CLUSTERS={**settings.CLUSTERS, 'MAX_ZOOM': 6})
+class ClusterTests(TestCase):
+    def cells(self):
+        return {
+            (cluster.zoom, cluster.x, cluster.y): (cluster.count, cluster.latitude, cluster.longitude)
+            for cluster in LocationCluster.objects.all()
+        }
+
+    def test_moves_cancel_out_in_shared_cells(self):
+        deltas = cell_deltas(added=[LYON], removed=[PARIS])
+        # Both cities are in the same cell at zoom 0.
+        self.assertEqual(deltas[(0, *grid_cell(*PARIS, 0))], [0, LYON[1] - PARIS[1], LYON[0] - PARIS[0]])
+        self.assertEqual(deltas[(6, *grid_cell(*PARIS, 6))][0], -1)
+        self.assertEqual(deltas[(6, *grid_cell(*LYON, 6))][0], 1)
+
+    def test_clusters_follow_added_moved_and_removed_points(self):
+        update_clusters(added=[PARIS, PARIS])
+        self.assertEqual(len(self.cells()), 7)
+        self.assertEqual(self.cells()[(6, *grid_cell(*PARIS, 6))], (2, PARIS[1], PARIS[0]))
+
+        update_clusters(added=[LYON], removed=[PARIS])
+        cells = self.cells()
+        self.assertEqual(cells[(6, *grid_cell(*PARIS, 6))][0], 1)
+        self.assertEqual(cells[(6, *grid_cell(*LYON, 6))], (1, LYON[1], LYON[0]))
+
+        update_clusters(removed=[PARIS, LYON])
+        self.assertEqual(self.cells(), {})
+
+
+@skipUnless(getattr(connection.ops, 'postgis', False), "Tiles are rendered by PostGIS.")
+class TileRenderingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(TILES={**settings.TILES, 'CACHE_DIR': directory.name})
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+
+    def add_location(self, name, longitude, latitude):
+        return Location.objects.create(
+            name=name, added_by='test', address=name, latitude=latitude, longitude=longitude,
+            coordinates=Point(longitude, latitude, srid=4326),
+        )
+
+    def test_the_zoom_zero_tile_shows_the_whole_world(self):
+        # Its rendering buffer reaches past the antimeridian and the poles.
+        self.add_location('Fiji', 179.9, -17.7)
+        self.assertNotEqual(tiles.render_tile(0, 0, 0), b'')
+        self.add_location('North pole', 0, 89.9)
+        self.assertNotEqual(tiles.render_tile(0, 0, 0), b'')
+
+    def test_tiles_only_show_their_locations(self):
+        self.add_location('Paris', *PARIS)
+        x, y = (int(position) for position in tiles.pixel_position(*PARIS, 10))
+        self.assertNotEqual(tiles.render_tile(10, x, y), b'')
+        self.assertEqual(tiles.render_tile(10, x + 2, y), b'')
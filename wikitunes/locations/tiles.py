@@ -0,0 +1,176 @@
+"""
+Mapbox vector tiles (MVT) of the locations, rendered by PostGIS and cached on disk.
+
+A tile is rendered with ST_AsMVT over the locations whose coordinates fall in its
+envelope (ST_TileEnvelope, Web Mercator) plus the rendering buffer, found with the
+GiST index of the Web Mercator position of the locations. Rendered tiles up to CACHE_MAX_ZOOM are
+stored as `<CACHE_DIR>/<z>/<x>/<y>.mvt`. Saving or deleting a location removes,
+at every cached zoom level, only the tiles its old and new positions are drawn in.
+
+A removed tile is stamped with the time of its invalidation (`<y>.invalidated`).
+A tile whose rendering started before that time may miss the change: it is
+returned but not kept in the cache.
+"""
+import math
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import connection
+
+# Web Mercator position of a location, its latitude clamped to the projection limit
+# (as in pixel_position()). Same expression as the GiST index of migration 0003.
+MERCATOR_SQL = (
+    "ST_Transform(ST_SetSRID(ST_MakePoint(ST_X(location.coordinates::geometry), "
+    "LEAST(GREATEST(ST_Y(location.coordinates::geometry), -85.0511287798066), 85.0511287798066)), 4326), 3857)"
+)
+
+TILE_SQL = f"""
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope
+    ),
+    search AS (
+        -- Planar: transformed to degrees, the buffer of low zoom tiles leaves the world.
+        SELECT
+            envelope,
+            ST_Expand(envelope, (ST_XMax(envelope) - ST_XMin(envelope)) * %(buffer)s / %(extent)s) AS area
+        FROM bounds
+    ),
+    points AS (
+        SELECT
+            ST_AsMVTGeom({MERCATOR_SQL}, search.envelope, %(extent)s, %(buffer)s) AS geom,
+            location.id,
+            location.name
+        FROM locations_location AS location, search
+        WHERE {MERCATOR_SQL} && search.area
+    )
+    SELECT ST_AsMVT(points.*, 'locations', %(extent)s, 'geom') FROM points
+"""
+
+# Latitude limit of the Web Mercator projection.
+MAX_LATITUDE = 85.0511287798066
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= settings.TILES['MAX_ZOOM'] and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_path(z, x, y):
+    return os.path.join(str(settings.TILES['CACHE_DIR']), str(z), str(x), f'{y}.mvt')
+
+
+def stamp_path(z, x, y):
+    return os.path.join(str(settings.TILES['CACHE_DIR']), str(z), str(x), f'{y}.invalidated')
+
+
+def invalidated_at(z, x, y):
+    """
+    Returns the time of the last invalidation of a tile in nanoseconds, 0 if never invalidated.
+    """
+    try:
+        return os.stat(stamp_path(z, x, y)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def stamp_invalidated(z, x, y):
+    path = stamp_path(z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb'):
+        pass
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def render_tile(z, x, y):
+    """
+    Renders a tile with PostGIS.
+
+    Returns:
+        bytes: The MVT encoded tile, empty when no location is drawn in it.
+    """
+    config = settings.TILES
+    with connection.cursor() as cursor:
+        cursor.execute(TILE_SQL, {'z': z, 'x': x, 'y': y, 'extent': config['EXTENT'], 'buffer': config['BUFFER']})
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b''
+
+
+def write_tile(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as target:
+        target.write(data)
+    os.replace(temporary, path)
+
+
+def get_tile(z, x, y):
+    """
+    Returns a tile from the disk cache, rendering and caching it when missing.
+    """
+    if z > settings.TILES['CACHE_MAX_ZOOM']:
+        return render_tile(z, x, y)
+    path = tile_path(z, x, y)
+    try:
+        with open(path, 'rb') as cached:
+            return cached.read()
+    except FileNotFoundError:
+        pass
+    started = time.time_ns()
+    data = render_tile(z, x, y)
+    write_tile(path, data)
+    # Checked after the write: an invalidation running meanwhile either removes the new
+    # file itself or is seen here.
+    if invalidated_at(z, x, y) >= started:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return data
+
+
+def pixel_position(longitude, latitude, z):
+    """
+    Returns the position of a point in Web Mercator tile units at zoom `z` (tile x, tile y as floats).
+    """
+    latitude = max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE)
+    scale = 2 ** z
+    x = (longitude + 180) / 360 * scale
+    sin = math.sin(math.radians(latitude))
+    y = (0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * scale
+    return x, y
+
+
+def covering_tiles(longitude, latitude, z):
+    """
+    Returns the tiles of zoom `z` a point is drawn in, its own tile and the neighbours
+    whose rendering buffer reaches it.
+    """
+    margin = settings.TILES['BUFFER'] / settings.TILES['EXTENT']
+    x, y = pixel_position(longitude, latitude, z)
+    last = 2 ** z - 1
+    columns = {min(max(math.floor(x + offset), 0), last) for offset in (-margin, 0, margin)}
+    rows = {min(max(math.floor(y + offset), 0), last) for offset in (-margin, 0, margin)}
+    return {(z, column, row) for column in columns for row in rows}
+
+
+def invalidate_point(longitude, latitude):
+    """
+    Removes the cached tiles a point is drawn in, at every cached zoom level, and stamps
+    them so that renderings in progress are not cached.
+
+    Returns:
+        int: Number of tiles removed.
+    """
+    removed = 0
+    for z in range(settings.TILES['CACHE_MAX_ZOOM'] + 1):
+        for tile in covering_tiles(longitude, latitude, z):
+            stamp_invalidated(*tile)
+            try:
+                os.remove(tile_path(*tile))
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import clusters, nearby
+
+urlpatterns = [
+    path('nearby', nearby, name='nearby'),
+    path('clusters', clusters, name='clusters'),
+]
@@ -1,3 +1,76 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_safe
 
-# Create your views here.
+from .clusters import clusters_in_bbox
+from .nearby import nearby as nearby_locations
+from .tiles import get_tile, is_valid_tile
+
+
+def parse_bbox(value):
+    """
+    Parses a `west,south,east,north` viewport in degrees.
+    """
+    west, south, east, north = (float(part) for part in value.split(','))
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError("bbox out of range")
+    return west, south, east, north
+
+
+@require_safe
+def nearby(request):
+    """
+    Returns the locations nearest to a point, with their events, forums and number of searches.
+
+    Query parameters: `lat` and `lng` (degrees, required), `k` (number of locations),
+    `radius` (meters) and `bbox` (`west,south,east,north` of the map viewport).
+    """
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return JsonResponse({'detail': "lat and lng are required numbers."}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return JsonResponse({'detail': "lat or lng out of range."}, status=400)
+    try:
+        k = int(request.GET['k']) if request.GET.get('k') else None
+        radius = float(request.GET['radius']) if request.GET.get('radius') else None
+        bbox = parse_bbox(request.GET['bbox']) if request.GET.get('bbox') else None
+    except ValueError:
+        return JsonResponse({'detail': "k, radius and bbox must be numbers (bbox: west,south,east,north)."}, status=400)
+    if k is not None and k < 1:
+        return JsonResponse({'detail': "k must be at least 1."}, status=400)
+    if radius is not None and not radius > 0:
+        return JsonResponse({'detail': "radius must be positive."}, status=400)
+    return JsonResponse({'results': nearby_locations(latitude, longitude, k, radius, bbox)})
+
+
+@require_safe
+def tile(request, z, x, y):
+    """
+    Returns the Mapbox vector tile z/x/y (Web Mercator, XYZ scheme) of the locations,
+    in a `locations` layer holding their id and name.
+    """
+    if not is_valid_tile(z, x, y):
+        raise Http404("No such tile.")
+    response = HttpResponse(get_tile(z, x, y), content_type='application/vnd.mapbox-vector-tile')
+    response['Cache-Control'] = f"public, max-age={settings.TILES['MAX_AGE']}"
+    return response
+
+
+@require_safe
+def clusters(request):
+    """
+    Returns the location clusters of a map viewport.
+
+    Query parameters: `bbox` (`west,south,east,north` in degrees, required) and `zoom`
+    (zoom level of the map, required).
+    """
+    try:
+        bbox = parse_bbox(request.GET['bbox'])
+        zoom = int(request.GET['zoom'])
+    except (KeyError, ValueError):
+        return JsonResponse({'detail': "bbox (west,south,east,north) and zoom are required numbers."}, status=400)
+    if zoom < 0:
+        return JsonResponse({'detail': "zoom must not be negative."}, status=400)
+    return JsonResponse({'zoom': min(zoom, settings.CLUSTERS['MAX_ZOOM']), 'results': clusters_in_bbox(bbox, zoom)})
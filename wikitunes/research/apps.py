@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ResearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'research'
+
+    def ready(self):
+        from analytics.ingest import event_buffer
+
+        from .models import SearchHistory
+        from .searchlog import prepare_searches
+        from .signals import connect_signals
+
+        connect_signals()
+        event_buffer.prepare(SearchHistory, prepare_searches)
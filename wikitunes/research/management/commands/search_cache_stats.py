@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from research.searchcache import reset_stats, stats
+
+
+class Command(BaseCommand):
+    help = "Shows the hit ratio and rebuild times of the search result cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after showing them.")
+
+    def handle(self, *args, **options):
+        counters = stats()
+        ratio = counters['hit_ratio']
+        average = counters['average_rebuild_ms']
+        self.stdout.write(
+            f"{counters['hits']} hits, {counters['stale_hits']} stale hits, {counters['misses']} misses "
+            f"(hit ratio: {'-' if ratio is None else f'{ratio:.1%}'})."
+        )
+        self.stdout.write(
+            f"{counters['rebuilds']} rebuilds "
+            f"(average: {'-' if average is None else f'{average:.1f} ms'})."
+        )
+        if options['reset']:
+            reset_stats()
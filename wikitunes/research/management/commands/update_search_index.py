@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from research.search import update_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes the full-text search vectors of the items changed since the last run. Meant to "
+        "be run every minute or so; run it once with --full after migrating to index existing content."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Number of entries indexed per transaction.")
+        parser.add_argument('--full', action='store_true', help="Queue every post, forum, event, article, blog and media first.")
+
+    def handle(self, *args, **options):
+        processed = update_index(batch_size=options['batch_size'], full=options['full'])
+        self.stdout.write(f"{processed} search entries indexed.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:45
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('research', '0002_alter_searchhistory_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchhistory',
+            name='category',
+            field=models.CharField(choices=[('general', 'General'), ('forum', 'Forum'), ('post', 'Post'), ('event', 'Event'), ('article', 'Article'), ('video', 'Video'), ('image', 'Image'), ('document', 'Document'), ('blog', 'Blog'), ('audio', 'Audio')], default='general', help_text='Category of the search.', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('forum', 'Forum'), ('post', 'Post'), ('event', 'Event'), ('article', 'Article'), ('video', 'Video'), ('image', 'Image'), ('document', 'Document'), ('blog', 'Blog'), ('audio', 'Audio')], help_text='Search category of the item.', max_length=20)),
+                ('object_id', models.PositiveBigIntegerField(help_text='Primary key of the item (of Media for media categories).')),
+                ('title', models.CharField(blank=True, help_text='Title of the item, returned with the results.', max_length=255)),
+                ('vector', django.contrib.postgres.search.SearchVectorField(help_text='Weighted lexemes of the title (A), summary and tags (B) and body (C).', null=True)),
+                ('is_stale', models.BooleanField(default=True, help_text='Whether the item changed since its vector was computed.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Last time the entry was written.')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['vector'], name='research_searchdoc_vector'), models.Index(condition=models.Q(('is_stale', True)), fields=['id'], name='research_searchdoc_stale')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'object_id'), name='research_searchdocument_item')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0001_initial'),
+        ('research', '0003_alter_searchhistory_category_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text='Location where the event takes place.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='locations.location'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from locations.models import Location
 from accounts.models import Account, Visitor, validate_file_size
@@ -7,6 +9,8 @@ from content.models import SiteReaction
 from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from wikitunes.filecache import read_text
+
 
 def validate_file_size(file):
     if file.size > settings.MAX_UPLOAD_SIZE:
@@ -31,6 +35,14 @@ class Event(BaseModel, SiteReaction):
         blank=True,
         help_text="Media associated with the event."
     )
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events',
+        help_text="Location where the event takes place."
+    )
 
     def __str__(self):
         return self.title
@@ -46,6 +58,8 @@ class SearchHistory(models.Model):
         ('video', 'Video'),
         ('image', 'Image'),
         ('document', 'Document'),
+        ('blog', 'Blog'),
+        ('audio', 'Audio'),
     ]
 
     user = models.ForeignKey(
@@ -167,6 +181,12 @@ class Article(BaseModel, SiteReaction):
     def __str__(self):
         return self.title
 
+    def get_content(self):
+        """
+        Returns the text of the article, served from the process-wide file body cache.
+        """
+        return read_text(self.content_path)
+
 
 class Blog(BaseModel, SiteReaction):
     """
@@ -204,3 +224,42 @@ class Blog(BaseModel, SiteReaction):
 
     def __str__(self):
         return self.title
+
+    def get_content(self):
+        """
+        Returns the text of the blog, served from the process-wide file body cache.
+        """
+        return read_text(self.content_path)
+
+
+class SearchDocument(models.Model):
+    """
+    Full-text search entry of a post, forum, event, article, blog or media.
+
+    One row per searchable item, holding the weighted tsvector of its title, summary,
+    tags and body. Rows are marked stale by the handlers in research.signals and
+    their vectors are computed in the background by the `update_search_index`
+    management command (see research.search).
+    """
+    category = models.CharField(
+        max_length=20,
+        choices=[choice for choice in SearchHistory.SEARCH_CATEGORIES if choice[0] != 'general'],
+        help_text="Search category of the item."
+    )
+    object_id = models.PositiveBigIntegerField(help_text="Primary key of the item (of Media for media categories).")
+    title = models.CharField(max_length=255, blank=True, help_text="Title of the item, returned with the results.")
+    vector = SearchVectorField(null=True, help_text="Weighted lexemes of the title (A), summary and tags (B) and body (C).")
+    is_stale = models.BooleanField(default=True, help_text="Whether the item changed since its vector was computed.")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last time the entry was written.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'object_id'], name='research_searchdocument_item'),
+        ]
+        indexes = [
+            GinIndex(fields=['vector'], name='research_searchdoc_vector'),
+            models.Index(fields=['id'], name='research_searchdoc_stale', condition=models.Q(is_stale=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.object_id}: {self.title}"
@@ -0,0 +1,235 @@
+"""
+Full-text search over posts, forums, events, articles, blogs and media.
+
+Every searchable item has a SearchDocument row holding the tsvector of its title
+(weight A), summary and tag names (B) and body (C), with a GIN index on it. Saving
+an item only marks its row stale (research.signals), the text of file-backed bodies
+is read and the vectors are computed by update_index(), run in the background by
+the `update_search_index` management command.
+
+search() ranks the matching rows once and pages every category (and the overall
+'general' listing) with window functions, so all SEARCH_CATEGORIES are answered by
+a single query.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import transaction
+from django.db.models import Count, F, Q, Value, Window
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Now, RowNumber
+
+from content.models import MediaIndex
+from wikitunes.filecache import read_text
+
+from .models import SearchDocument, SearchHistory
+from .searchcache import bump_generations
+
+logger = logging.getLogger(__name__)
+
+# Indexed model of each category, with its summary and body attributes.
+SEARCH_SOURCES = {
+    'post': ('content.Post', None, 'description_text'),
+    'forum': ('forums.Forum', None, 'description_text'),
+    'event': ('research.Event', None, 'description'),
+    'article': ('research.Article', 'excerpt', 'content_path'),
+    'blog': ('research.Blog', None, 'content_path'),
+}
+
+MEDIA_CATEGORIES = ['image', 'video', 'audio', 'document']
+
+CATEGORIES = [category for category, _ in SearchHistory.SEARCH_CATEGORIES]
+
+
+def source_model(category):
+    return apps.get_model(SEARCH_SOURCES[category][0])
+
+
+def mark_stale(category, ids):
+    """
+    Queues items for (re)indexing, creating their search entries when missing.
+    """
+    ids = set(ids)
+    if not ids:
+        return
+    stale = SearchDocument.objects.filter(category=category, object_id__in=ids)
+    # update() skips auto_now, updated_at is the watermark of the suggestion index refreshes.
+    if stale.update(is_stale=True, updated_at=Now()) < len(ids):
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(category=category, object_id=pk) for pk in ids],
+            ignore_conflicts=True,
+        )
+    # Cached results are outdated by index_batch() once the new vectors are written.
+
+
+def forget(category, ids):
+    SearchDocument.objects.filter(category=category, object_id__in=list(ids)).delete()
+    transaction.on_commit(lambda: bump_generations([category]))
+
+
+def body_text(value):
+    if isinstance(value, FieldFile):
+        return read_text(value)
+    return value or ''
+
+
+def item_texts(category, ids):
+    """
+    Reads the text of items of one category.
+
+    Returns:
+        dict: (title, summary, tags, body) by primary key, for the items that still exist.
+    """
+    if category in MEDIA_CATEGORIES:
+        entries = MediaIndex.objects.filter(media_id__in=ids, media_type=category)
+        return {entry.media_id: (entry.title, '', ' '.join(entry.tags), '') for entry in entries}
+
+    _, summary_attr, body_attr = SEARCH_SOURCES[category]
+    model = source_model(category)
+    tag_names = {}
+    if any(field.name == 'tags' for field in model._meta.many_to_many):
+        column = f'{model.tags.field.m2m_field_name()}_id'
+        rows = model.tags.through.objects.filter(**{f'{column}__in': ids}).values_list(column, 'tag__name')
+        for pk, name in rows:
+            tag_names.setdefault(pk, []).append(name)
+
+    texts = {}
+    for item in model.objects.filter(pk__in=ids):
+        try:
+            body = body_text(getattr(item, body_attr))
+        except OSError:
+            logger.warning("Could not read the body of %s %s.", category, item.pk)
+            body = ''
+        texts[item.pk] = (
+            item.title,
+            (getattr(item, summary_attr) or '') if summary_attr else '',
+            ' '.join(tag_names.get(item.pk, [])),
+            body[:settings.SEARCH['MAX_BODY_CHARS']],
+        )
+    return texts
+
+
+def index_batch(batch_size):
+    """
+    Computes the vectors of a batch of stale entries.
+
+    The entries stay locked until their vectors are written, so an item saved
+    meanwhile is marked stale again once the batch is committed.
+
+    Returns:
+        int: Number of entries processed.
+    """
+    search_config = settings.SEARCH['CONFIG']
+    with transaction.atomic():
+        documents = list(
+            SearchDocument.objects.filter(is_stale=True)
+            .select_for_update(skip_locked=True)
+            .order_by('id')[:batch_size]
+        )
+        by_category = {}
+        for document in documents:
+            by_category.setdefault(document.category, []).append(document)
+        for category, batch in by_category.items():
+            texts = item_texts(category, [document.object_id for document in batch])
+            for document in batch:
+                if document.object_id not in texts:
+                    document.delete()
+                    continue
+                title, summary, tags, body = texts[document.object_id]
+                vector = (
+                    SearchVector(Value(title), weight='A', config=search_config)
+                    + SearchVector(Value(f'{summary} {tags}'), weight='B', config=search_config)
+                    + SearchVector(Value(body), weight='C', config=search_config)
+                )
+                SearchDocument.objects.filter(pk=document.pk).update(
+                    title=title[:255],
+                    vector=vector,
+                    is_stale=False,
+                    updated_at=Now(),
+                )
+    # The cached results of these categories are outdated by the new vectors.
+    transaction.on_commit(lambda: bump_generations(by_category))
+    return len(documents)
+
+
+def update_index(batch_size=200, full=False):
+    """
+    Indexes the stale entries, after queueing every item when `full` is set.
+
+    Returns:
+        int: Number of entries processed.
+    """
+    if full:
+        for category in SEARCH_SOURCES:
+            model = source_model(category)
+            ids = model.objects.values_list('pk', flat=True).iterator(chunk_size=batch_size)
+            chunk = []
+            for pk in ids:
+                chunk.append(pk)
+                if len(chunk) == batch_size:
+                    mark_stale(category, chunk)
+                    chunk = []
+            mark_stale(category, chunk)
+        for category in MEDIA_CATEGORIES:
+            mark_stale(category, MediaIndex.objects.filter(media_type=category).values_list('media_id', flat=True))
+    processed = 0
+    while count := index_batch(batch_size):
+        processed += count
+    return processed
+
+
+def search(term, page=1, category=None):
+    """
+    Returns one page of ranked results for every search category.
+
+    Parameters:
+        term (str): Search terms, in web search syntax ("quoted phrases", or, -excluded).
+        page (int): Page number, from 1, of every listing.
+        category (str): Only search this category (one of SEARCH_CATEGORIES, 'general'
+            searching all of them).
+
+    Returns:
+        dict: For 'general' and every category, the total number of matches and the
+        results of the page as dicts with the type, id, title and rank of the item.
+    """
+    size = settings.SEARCH['PAGE_SIZE']
+    start = (page - 1) * size
+    query = SearchQuery(term, search_type='websearch', config=settings.SEARCH['CONFIG'])
+    documents = SearchDocument.objects.filter(vector=query)
+    listings = CATEGORIES
+    if category and category != 'general':
+        documents = documents.filter(category=category)
+        listings = ['general', category]
+
+    order = [F('rank').desc(), F('id')]
+    rows = (
+        documents.annotate(rank=SearchRank(F('vector'), query))
+        .annotate(
+            position=Window(RowNumber(), order_by=order),
+            total=Window(Count('id')),
+            category_position=Window(RowNumber(), partition_by=F('category'), order_by=order),
+            category_total=Window(Count('id'), partition_by=F('category')),
+        )
+        .filter(
+            Q(position__gt=start, position__lte=start + size)
+            | Q(category_position__gt=start, category_position__lte=start + size)
+            # The first match of every category carries its total when the page is past it.
+            | Q(category_position=1)
+        )
+        .order_by('position')
+        .values('category', 'object_id', 'title', 'rank', 'position', 'total', 'category_position', 'category_total')
+    )
+
+    results = {listing: {'count': 0, 'results': []} for listing in listings}
+    for row in rows:
+        item = {'type': row['category'], 'id': row['object_id'], 'title': row['title'], 'rank': row['rank']}
+        results['general']['count'] = row['total']
+        if start < row['position'] <= start + size:
+            results['general']['results'].append(item)
+        listing = results[row['category']]
+        listing['count'] = row['category_total']
+        if start < row['category_position'] <= start + size:
+            listing['results'].append(item)
+    return results
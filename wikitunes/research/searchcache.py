@@ -0,0 +1,193 @@
+"""
+Cache of search results keyed by normalized term, category and page.
+
+Every search category has a generation counter in the cache, bumped whenever the
+searchable rows of that category change (research.search). A cached page stores
+the generations it was computed at: it is fresh while they are unchanged and
+younger than TTL. A page that is outdated but younger than STALE_TTL is still
+served while a single background thread recomputes it (stale-while-revalidate);
+older pages are recomputed in the request.
+
+Hits, stale hits, misses and rebuild times are counted in the cache, see stats().
+The counters are shared by the web workers and the `update_search_index` command,
+the cache must be a shared backend (database, Redis, memcached), never a
+process-local one. When the cache is unavailable, searches are answered uncached.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+STATS = ['hits', 'stale_hits', 'misses', 'rebuilds', 'rebuild_ms']
+
+
+def get_cache():
+    alias = settings.SEARCH_CACHE['ALIAS']
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        # Generations bumped by the indexer would never reach the other processes.
+        raise ImproperlyConfigured(
+            f"The search cache {alias!r} must be shared by all processes, not a {type(cache).__name__}."
+        )
+    return cache
+
+
+def normalize_term(term):
+    return ' '.join(term.casefold().split())
+
+
+def increment(key, delta=1, initial=None):
+    """
+    Increments a cache counter, creating it with `initial` (or `delta`) when missing.
+    """
+    cache = get_cache()
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        value = delta if initial is None else initial
+        if cache.add(key, value, timeout=None):
+            return value
+        return cache.incr(key, delta)
+
+
+def generation_key(category):
+    return f'search:generation:{category}'
+
+
+def bump_generations(categories):
+    """
+    Outdates the cached results of the given search categories (and of 'general').
+
+    Cache failures are logged, not raised: the writes outdating the results must not
+    fail with the cache, whose pages expire after TTL anyway.
+    """
+    get_cache()
+    try:
+        for category in set(categories):
+            # A counter evicted from the cache restarts from the clock, never from a value already used.
+            increment(generation_key(category), initial=time.time_ns())
+    except Exception:
+        logger.exception("Outdating the cached search results failed.")
+
+
+def generations(categories):
+    """
+    Returns the current generations of the given search categories, None when the cache is unavailable.
+    """
+    cache = get_cache()
+    keys = [generation_key(category) for category in categories]
+    try:
+        current = cache.get_many(keys)
+        for key in keys:
+            if key not in current:
+                cache.add(key, time.time_ns(), timeout=None)
+                current[key] = cache.get(key)
+    except Exception:
+        logger.exception("Reading the search cache generations failed.")
+        return None
+    return tuple(current[key] for key in keys)
+
+
+def record(stat, delta=1):
+    increment(f'search:stats:{stat}', delta)
+
+
+def stats():
+    """
+    Returns the cache counters with the hit ratio (stale hits included) and the average rebuild time.
+    """
+    values = get_cache().get_many([f'search:stats:{stat}' for stat in STATS])
+    counters = {stat: values.get(f'search:stats:{stat}', 0) for stat in STATS}
+    lookups = counters['hits'] + counters['stale_hits'] + counters['misses']
+    counters['hit_ratio'] = (counters['hits'] + counters['stale_hits']) / lookups if lookups else None
+    counters['average_rebuild_ms'] = counters['rebuild_ms'] / counters['rebuilds'] if counters['rebuilds'] else None
+    return counters
+
+
+def reset_stats():
+    get_cache().delete_many([f'search:stats:{stat}' for stat in STATS])
+
+
+def rebuild(key, compute, versions):
+    started = time.perf_counter()
+    results = compute()
+    elapsed_ms = round((time.perf_counter() - started) * 1000)
+    get_cache().set(
+        key,
+        {'results': results, 'generations': versions, 'created': time.time()},
+        timeout=settings.SEARCH_CACHE['STALE_TTL'],
+    )
+    record('rebuilds')
+    record('rebuild_ms', elapsed_ms)
+    return results
+
+
+def revalidate(key, compute, versions):
+    """
+    Recomputes a stale page in a background thread, unless another process already does.
+    """
+    cache = get_cache()
+    lock = f'{key}:lock'
+    if not cache.add(lock, 1, timeout=settings.SEARCH_CACHE['REBUILD_TIMEOUT']):
+        return
+
+    def run():
+        try:
+            close_old_connections()
+            rebuild(key, compute, versions)
+        except Exception:
+            logger.exception("Revalidating cached search results failed.")
+        finally:
+            close_old_connections()
+            cache.delete(lock)
+
+    threading.Thread(target=run, name='search-cache', daemon=True).start()
+
+
+def cached_search(term, category, page, depends_on, compute):
+    """
+    Returns the results of a search page from the cache, computing them when needed.
+
+    Parameters:
+        term (str): Search terms, normalized for the key.
+        category (str): Searched category ('general' for all of them).
+        page (int): Page number.
+        depends_on (list): Categories whose changes outdate the results.
+        compute (callable): Function computing the results of the normalized term.
+
+    Returns:
+        The cached or computed results.
+    """
+    config = settings.SEARCH_CACHE
+    term = normalize_term(term)
+    digest = hashlib.sha1(f'{category}\0{page}\0{term}'.encode('utf-8')).hexdigest()
+    key = f'search:results:{digest}'
+    versions = generations(depends_on)
+
+    def compute_term():
+        return compute(term)
+
+    if versions is None:
+        # The cache is unavailable: search without it.
+        return compute_term()
+
+    entry = get_cache().get(key)
+    if entry is not None:
+        fresh = entry['generations'] == versions and time.time() - entry['created'] < config['TTL']
+        if fresh:
+            record('hits')
+            return entry['results']
+        record('stale_hits')
+        revalidate(key, compute_term, versions)
+        return entry['results']
+    record('misses')
+    return rebuild(key, compute_term, versions)
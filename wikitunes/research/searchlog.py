@@ -0,0 +1,181 @@
+"""
+Search logging off the request path.
+
+log_search() times the search it wraps and queues an unsaved SearchHistory in the
+analytics ingestion buffer (analytics.ingest), holding only what was read from the
+request. The lookups a row needs (the Visitor of the session, the device, OS and
+browser from the User-Agent, the nearest Location of the client IP) are resolved
+by prepare_searches() in the writer thread, once per batch, right before the rows
+are bulk inserted.
+"""
+import re
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+
+from accounts.models import Visitor
+from analytics.ingest import enqueue
+from locations.models import Location
+
+from .models import SearchHistory
+
+# First match wins, so more specific patterns come first.
+BROWSERS = [
+    ('Edge', re.compile(r'Edg(?:e|A|iOS)?/')),
+    ('Opera', re.compile(r'OPR/|Opera')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/')),
+    ('Firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('Chrome', re.compile(r'Chrome/|CriOS/')),
+    ('Safari', re.compile(r'Safari/')),
+]
+OPERATING_SYSTEMS = [
+    ('Android', re.compile(r'Android')),
+    ('iOS', re.compile(r'iPhone|iPad|iPod')),
+    ('Windows', re.compile(r'Windows')),
+    ('macOS', re.compile(r'Mac OS X|Macintosh')),
+    ('ChromeOS', re.compile(r'CrOS')),
+    ('Linux', re.compile(r'Linux')),
+]
+BOT_RE = re.compile(r'bot|crawl|spider|slurp', re.IGNORECASE)
+TABLET_RE = re.compile(r'iPad|Tablet|Android(?!.*Mobile)')
+MOBILE_RE = re.compile(r'Mobile|iPhone|iPod|Android')
+
+
+def first_match(patterns, user_agent):
+    for name, pattern in patterns:
+        if pattern.search(user_agent):
+            return name
+    return None
+
+
+@lru_cache(maxsize=1024)
+def parse_user_agent(user_agent):
+    """
+    Returns the (device type, OS, browser) of a User-Agent header, None for the unknown parts.
+    """
+    if not user_agent:
+        return None, None, None
+    if BOT_RE.search(user_agent):
+        device_type = 'bot'
+    elif TABLET_RE.search(user_agent):
+        device_type = 'tablet'
+    elif MOBILE_RE.search(user_agent):
+        device_type = 'mobile'
+    else:
+        device_type = 'desktop'
+    return device_type, first_match(OPERATING_SYSTEMS, user_agent), first_match(BROWSERS, user_agent)
+
+
+@lru_cache(maxsize=4096)
+def nearest_location(ip_address):
+    """
+    Returns the primary key of the Location closest to the GeoIP position of an address,
+    None without a GeoIP database or when no Location is close enough.
+    """
+    if not getattr(settings, 'GEOIP_PATH', None):
+        return None
+    from django.contrib.gis.db.models.functions import Distance
+    from django.contrib.gis.geoip2 import HAS_GEOIP2
+
+    if not HAS_GEOIP2:
+        return None
+    from django.contrib.gis.geoip2 import GeoIP2, GeoIP2Exception
+    from django.contrib.gis.measure import D
+
+    try:
+        point = GeoIP2().geos(ip_address)
+    except (GeoIP2Exception, ValueError):
+        return None
+    radius = D(km=settings.SEARCH_LOG['LOCATION_RADIUS_KM'])
+    return (
+        Location.objects.filter(coordinates__dwithin=(point, radius))
+        .annotate(distance=Distance('coordinates', point))
+        .order_by('distance')
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+def resolve_visitors(instances):
+    """
+    Sets the Visitor of every queued search, creating the visitors seen for the first time.
+    """
+    sessions = {instance._session_key for instance in instances if instance._session_key}
+    addresses = {instance.ip_address for instance in instances if not instance._session_key}
+    visitors = {}
+    for pk, session_id in Visitor.objects.filter(session_id__in=sessions).values_list('pk', 'session_id'):
+        visitors[session_id] = pk
+    anonymous = Visitor.objects.filter(session_id__isnull=True, ip_address__in=addresses)
+    for pk, ip_address in anonymous.values_list('pk', 'ip_address'):
+        visitors[f'ip:{ip_address}'] = pk
+
+    missing = {}
+    for instance in instances:
+        key = instance._session_key or f'ip:{instance.ip_address}'
+        if key not in visitors and key not in missing:
+            missing[key] = Visitor(
+                username=instance._username,
+                ip_address=instance.ip_address,
+                session_id=instance._session_key,
+            )
+    Visitor.objects.bulk_create(list(missing.values()))
+    for key, visitor in missing.items():
+        visitors[key] = visitor.pk
+
+    for instance in instances:
+        instance.user_id = visitors[instance._session_key or f'ip:{instance.ip_address}']
+
+
+def prepare_searches(instances):
+    """
+    Resolves the visitor, device, OS, browser and location of a batch of queued searches.
+    """
+    resolve_visitors(instances)
+    for instance in instances:
+        instance.device_type, instance.os, instance.browser = parse_user_agent(instance._user_agent)
+        if instance.ip_address and instance.location_id is None:
+            instance.location_id = nearest_location(instance.ip_address)
+
+
+class SearchLog:
+    """
+    Search being logged, whose results_count is set by the code performing the search.
+    """
+    def __init__(self, instance):
+        self.instance = instance
+        self.results_count = 0
+
+
+@contextmanager
+def log_search(request, term, category='general'):
+    """
+    Times the search performed in the block and queues its SearchHistory row.
+
+    The row is queued when the block exits without an exception, the response never
+    waits for it to be written.
+
+    Usage:
+        with log_search(request, term, category) as log:
+            results = search(term, ...)
+            log.results_count = len(results)
+    """
+    instance = SearchHistory(
+        search_term=term[:255],
+        category=category,
+        ip_address=request.META.get('REMOTE_ADDR') or None,
+        referrer_url=request.headers.get('Referer', '')[:200] or None,
+        search_context=request.GET.get('context', '')[:255] or None,
+    )
+    instance._user_agent = request.headers.get('User-Agent', '')[:512]
+    instance._session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    user = getattr(request, 'user', None)
+    instance._username = user.get_username() if user is not None and user.is_authenticated else None
+    log = SearchLog(instance)
+    started = time.perf_counter()
+    yield log
+    instance.search_duration = timedelta(seconds=time.perf_counter() - started)
+    instance.results_count = log.results_count
+    enqueue(instance)
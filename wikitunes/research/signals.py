@@ -0,0 +1,108 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from content.models import Media, MediaIndex, Tag, tag_relations
+
+from .search import SEARCH_SOURCES, forget, mark_stale, source_model
+
+
+def media_categories(media_ids):
+    """
+    Groups media primary keys by their search category (their media type).
+    """
+    categories = {}
+    for pk, media_type in Media.objects.filter(pk__in=list(media_ids)).values_list('pk', 'media_type'):
+        categories.setdefault(media_type, []).append(pk)
+    return categories
+
+
+def mark_tagged_stale(model, ids):
+    if model is Media:
+        for category, pks in media_categories(ids).items():
+            mark_stale(category, pks)
+        return
+    for category in SEARCH_SOURCES:
+        if source_model(category) is model:
+            mark_stale(category, ids)
+
+
+def indexed_tag_relations():
+    """
+    Returns the relations to Tag of the indexed models (posts, articles, blogs and media).
+    """
+    indexed = {source_model(category) for category in SEARCH_SOURCES} | {Media}
+    return {name: rel for name, rel in tag_relations().items() if rel.related_model in indexed}
+
+
+def index_saved(category):
+    def index(sender, instance, raw=False, **kwargs):
+        if not raw:
+            mark_stale(category, [instance.pk])
+    return index
+
+
+def forget_deleted(category):
+    def remove(sender, instance, **kwargs):
+        forget(category, [instance.pk])
+    return remove
+
+
+def index_saved_media(sender, instance, raw=False, **kwargs):
+    # MediaIndex rows are written whenever an Image/Video/Audio/Document is saved.
+    if not raw:
+        mark_stale(instance.media_type, [instance.media_id])
+
+
+def forget_deleted_media(sender, instance, **kwargs):
+    forget(instance.media_type, [instance.media_id])
+
+
+def index_retagged(rel):
+    """
+    Returns the m2m_changed handler queueing the items of one tagged model whose tags changed.
+    """
+    model = rel.related_model
+    item_column = rel.field.m2m_field_name()
+    tag_column = rel.field.m2m_reverse_field_name()
+
+    def index(sender, instance, action, reverse, pk_set, **kwargs):
+        if not reverse:
+            if action in ('post_add', 'post_remove', 'post_clear'):
+                mark_tagged_stale(model, [instance.pk])
+        elif action in ('post_add', 'post_remove'):
+            mark_tagged_stale(model, pk_set)
+        elif action == 'pre_clear':
+            items = rel.through.objects.filter(**{f'{tag_column}_id': instance.pk})
+            mark_tagged_stale(model, items.values_list(f'{item_column}_id', flat=True))
+    return index
+
+
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    for rel in indexed_tag_relations().values():
+        index_retagged(rel)(rel.through, instance, 'pre_clear', True, None)
+
+
+def index_deleted_tag(sender, instance, **kwargs):
+    # Deleting a tag removes its through rows without m2m_changed.
+    index_renamed_tag(sender, instance, created=False)
+
+
+def connect_signals():
+    """
+    Connects the handlers queueing changed items for the search indexer.
+    """
+    for category in SEARCH_SOURCES:
+        model = source_model(category)
+        uid = f'research.search.{category}'
+        post_save.connect(index_saved(category), sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(forget_deleted(category), sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(index_saved_media, sender=MediaIndex, dispatch_uid='research.search.media')
+    post_delete.connect(forget_deleted_media, sender=MediaIndex, dispatch_uid='research.search.media')
+
+    for related_name, rel in indexed_tag_relations().items():
+        m2m_changed.connect(
+            index_retagged(rel), sender=rel.through, weak=False, dispatch_uid=f'research.search.{related_name}'
+        )
+    post_save.connect(index_renamed_tag, sender=Tag, dispatch_uid='research.search.tag')
+    pre_delete.connect(index_deleted_tag, sender=Tag, dispatch_uid='research.search.tag')
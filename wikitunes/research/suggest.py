@@ -0,0 +1,252 @@
+"""
+Type-ahead search suggestions from an in-memory prefix index.
+
+Every process keeps a sorted array of normalized terms (searched terms from
+SearchHistory, tag names and content titles from the search index) with their
+weights. Completions of a prefix are the contiguous range of terms found by binary
+search, and the best completions of the shortest prefixes (the widest ranges) are
+precomputed, so a lookup never scans more than the range of a long prefix.
+
+The index is built and refreshed in a background thread, the first time it is
+used and then once it is older than REFRESH_INTERVAL, while requests keep being
+answered from the previous snapshot (empty until the first build completes): only
+the searches recorded since the last refresh and the titles changed since then are
+read, and only the precomputed prefixes of changed terms are recomputed. It is
+rebuilt from scratch every REBUILD_INTERVAL to forget deleted content.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from content.models import Tag
+
+from .models import SearchDocument, SearchHistory
+
+logger = logging.getLogger(__name__)
+
+MAX_TERM_LENGTH = 100
+
+
+def normalize(term):
+    """
+    Lowercases a term and collapses its whitespace.
+    """
+    return ' '.join(term.casefold().split())[:MAX_TERM_LENGTH]
+
+
+class Snapshot:
+    """
+    Immutable state of the index: sorted terms, their weights and the precomputed completions.
+    """
+    def __init__(self, terms, weights, top):
+        self.terms = terms
+        self.weights = weights
+        self.top = top
+
+    def range(self, prefix):
+        low = bisect.bisect_left(self.terms, prefix)
+        return low, bisect.bisect_left(self.terms, prefix + '\U0010ffff', low)
+
+    def best(self, prefix, limit):
+        low, high = self.range(prefix)
+        best = heapq.nlargest(limit, range(low, high), key=self.weights.__getitem__)
+        return [(self.terms[index], self.weights[index]) for index in best]
+
+
+class SuggestionIndex:
+    """
+    Per-process prefix index of search suggestions.
+    """
+    def __init__(self):
+        self.snapshot = Snapshot([], [], {})
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.refreshed_at = None
+        self.rebuilt_at = None
+        self.reset()
+
+    def reset(self):
+        self.last_search_id = 0
+        self.titles_since = None
+        self.searches = {}
+        self.titles = {}
+        self.title_counts = {}
+        self.tags = {}
+
+    def weight(self, term):
+        weights = settings.SUGGEST['WEIGHTS']
+        searches = self.searches.get(term, 0)
+        if searches < settings.SUGGEST['MIN_SEARCHES']:
+            searches = 0
+        return (
+            weights['search'] * searches
+            + weights['tag'] * self.tags.get(term, 0)
+            + weights['title'] * self.title_counts.get(term, 0)
+        )
+
+    def load_searches(self):
+        upper = SearchHistory.objects.aggregate(upper=Max('id'))['upper'] or 0
+        rows = (
+            SearchHistory.objects.filter(id__gt=self.last_search_id, id__lte=upper)
+            .values(term=Lower('search_term'))
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        changed = set()
+        for row in rows:
+            term = normalize(row['term'])
+            if term:
+                self.searches[term] = self.searches.get(term, 0) + row['count']
+                changed.add(term)
+        self.last_search_id = upper
+        return changed
+
+    def load_tags(self):
+        # Popularity is maintained with UPDATEs, all tags are reread (there are few of them).
+        tags = {}
+        for name, popularity in Tag.objects.values_list('name', 'popularity'):
+            term = normalize(name)
+            if term:
+                tags[term] = tags.get(term, 0) + max(popularity, 1)
+        changed = {term for term in tags.keys() | self.tags.keys() if tags.get(term) != self.tags.get(term)}
+        self.tags = tags
+        return changed
+
+    def load_titles(self, started):
+        documents = SearchDocument.objects.all()
+        if self.titles_since is not None:
+            # Entries are stamped when their transaction starts and are only visible once it
+            # commits, an overlap is reread (unchanged titles are skipped).
+            overlap = timedelta(seconds=settings.SUGGEST['TITLES_OVERLAP'])
+            documents = documents.filter(updated_at__gte=self.titles_since - overlap)
+        changed = set()
+        for pk, title in documents.values_list('pk', 'title').iterator(chunk_size=10000):
+            term = normalize(title)
+            previous = self.titles.get(pk)
+            if previous == term:
+                continue
+            if previous:
+                self.title_counts[previous] -= 1
+                if not self.title_counts[previous]:
+                    del self.title_counts[previous]
+                changed.add(previous)
+            if term:
+                self.titles[pk] = term
+                self.title_counts[term] = self.title_counts.get(term, 0) + 1
+                changed.add(term)
+            else:
+                self.titles.pop(pk, None)
+        self.titles_since = started
+        return changed
+
+    def refresh(self):
+        """
+        Reads the changes since the last refresh (everything when a rebuild is due) and
+        publishes a new snapshot.
+        """
+        now = time.monotonic()
+        base = self.snapshot
+        if self.rebuilt_at is None or now - self.rebuilt_at >= settings.SUGGEST['REBUILD_INTERVAL']:
+            self.reset()
+            base = Snapshot([], [], {})
+            self.rebuilt_at = now
+        started = timezone.now()
+        changed = self.load_searches() | self.load_tags() | self.load_titles(started)
+        self.snapshot = self.merge(base, changed)
+        self.refreshed_at = now
+
+    def merge(self, base, changed):
+        """
+        Returns a new snapshot with the changed terms merged into the sorted array of
+        `base` and their precomputed prefixes recomputed.
+        """
+        weights = {}
+        for term in changed:
+            weight = self.weight(term)
+            if weight > 0:
+                weights[term] = weight
+        kept = ((term, weight) for term, weight in zip(base.terms, base.weights) if term not in changed)
+        terms, values = [], []
+        for term, weight in heapq.merge(kept, sorted(weights.items())):
+            terms.append(term)
+            values.append(weight)
+        snapshot = Snapshot(terms, values, dict(base.top))
+
+        limit = settings.SUGGEST['MAX_LIMIT']
+        prefixes = {
+            term[:length]
+            for term in changed
+            for length in range(1, settings.SUGGEST['PRECOMPUTED_PREFIX'] + 1)
+            if len(term) >= length
+        }
+        for prefix in prefixes:
+            best = snapshot.best(prefix, limit)
+            if best:
+                snapshot.top[prefix] = best
+            else:
+                snapshot.top.pop(prefix, None)
+        return snapshot
+
+    def refresh_in_background(self):
+        def run():
+            try:
+                close_old_connections()
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the search suggestions failed.")
+            finally:
+                close_old_connections()
+                self.refreshing = False
+
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=run, name='search-suggestions', daemon=True).start()
+
+    def suggest(self, prefix, limit):
+        """
+        Returns the best completions of `prefix` as (term, weight) pairs.
+        """
+        # Never built on the request thread: until the first build of this process is
+        # published, the empty snapshot is served.
+        if self.refreshed_at is None or time.monotonic() - self.refreshed_at >= settings.SUGGEST['REFRESH_INTERVAL']:
+            self.refresh_in_background()
+
+        snapshot = self.snapshot
+        normalized = normalize(prefix)
+        if not normalized:
+            return []
+        if prefix[-1:].isspace():
+            normalized += ' '
+        if len(normalized) <= settings.SUGGEST['PRECOMPUTED_PREFIX']:
+            return snapshot.top.get(normalized, [])[:limit]
+        return snapshot.best(normalized, limit)
+
+
+suggestion_index = SuggestionIndex()
+
+
+def suggest(prefix, limit=None):
+    """
+    Returns search suggestions completing a prefix.
+
+    Parameters:
+        prefix (str): What the user typed so far.
+        limit (int): Maximum number of suggestions (settings.SUGGEST['MAX_LIMIT'] at most).
+
+    Returns:
+        list: Dicts with the suggested term and its weight, best first.
+    """
+    config = settings.SUGGEST
+    limit = min(limit or config['LIMIT'], config['MAX_LIMIT'])
+    return [{'term': term, 'weight': weight} for term, weight in suggestion_index.suggest(prefix, limit)]
@@ -1,3 +1,258 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account, Visitor
+from forums.models import Forum
+
+from .models import SearchDocument, SearchHistory
+from .search import forget, index_batch, mark_stale, search
+from .searchcache import bump_generations, cached_search, get_cache, stats
+from .searchlog import log_search, parse_user_agent
+from .suggest import Snapshot, SuggestionIndex
+
+
+class SearchViewTests(TestCase):
+    def test_rejects_missing_terms_and_pages_below_one(self):
+        self.assertEqual(self.client.get(reverse('search')).status_code, 400)
+        for page in ('0', '-1'):
+            response = self.client.get(reverse('search'), {'q': 'jazz', 'page': page})
+            self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Search vectors are computed by PostgreSQL.")
+@override_settings(SEARCH={**settings.SEARCH, 'PAGE_SIZE': 2})
+class SearchTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        titles = ['Jazz standards', 'Jazz ballads', 'Modal jazz', 'Delta blues']
+        forums = [Forum.objects.create(title=title, account=account) for title in titles]
+        mark_stale('forum', [forum.pk for forum in forums])
+        index_batch(10)
+
+    def test_pages_every_listing(self):
+        first = search('jazz', 1)
+        self.assertEqual((first['general']['count'], first['forum']['count'], first['post']['count']), (3, 3, 0))
+        self.assertEqual(len(first['general']['results']), 2)
+        self.assertEqual(first['general']['results'], first['forum']['results'])
+
+        second = search('jazz', 2, 'forum')
+        self.assertEqual(set(second), {'general', 'forum'})
+        self.assertEqual((second['general']['count'], second['forum']['count']), (3, 3))
+        self.assertEqual(len(second['forum']['results']), 1)
+        titles = {result['title'] for page in (first, second) for result in page['forum']['results']}
+        self.assertEqual(titles, {'Jazz standards', 'Jazz ballads', 'Modal jazz'})
+
+    def test_pages_past_the_last_keep_the_counts(self):
+        results = search('jazz', 5)
+        self.assertEqual((results['general']['count'], results['forum']['results']), (3, []))
+
+
+class SuggestViewTests(TestCase):
+    def test_rejects_limits_below_one(self):
+        for limit in ('0', '-1'):
+            response = self.client.get(reverse('suggest'), {'q': 'ja', 'limit': limit})
+            self.assertEqual(response.status_code, 400)
+
+
+class SuggestionRefreshTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SuggestionIndex()
+        self.jazz = Snapshot(['jazz'], [3], {'ja': [('jazz', 3)]})
+
+    @mock.patch.object(SuggestionIndex, 'refresh_in_background')
+    @mock.patch.object(SuggestionIndex, 'refresh')
+    def test_requests_never_wait_for_the_index(self, refresh, refresh_in_background):
+        self.assertEqual(self.index.suggest('ja', 5), [])
+        refresh_in_background.assert_called_once_with()
+
+        # Outdated snapshots are served while the next one is built.
+        self.index.snapshot = self.jazz
+        self.index.refreshed_at = time.monotonic() - settings.SUGGEST['REFRESH_INTERVAL']
+        self.assertEqual(self.index.suggest('ja', 5), [('jazz', 3)])
+        self.assertEqual(refresh_in_background.call_count, 2)
+        refresh.assert_not_called()
+
+    @mock.patch('research.suggest.close_old_connections')
+    def test_only_one_refresh_runs_at_a_time(self, close_old_connections):
+        started, release = threading.Event(), threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait(5)
+            self.index.snapshot = self.jazz
+            self.index.refreshed_at = time.monotonic()
+
+        with mock.patch.object(self.index, 'refresh', side_effect=refresh) as mocked:
+            self.index.suggest('ja', 5)
+            started.wait(5)
+            self.index.suggest('ja', 5)
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == 'search-suggestions':
+                    thread.join()
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual(self.index.suggest('ja', 5), [('jazz', 3)])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Search vectors are computed by PostgreSQL.")
+class SuggestionIndexTests(TestCase):
+    def setUp(self):
+        account = Account.objects.create(
+            username='author', account_location='here', reg_device_ip='127.0.0.1', date_of_birth=date(2000, 1, 1)
+        )
+        self.forum = Forum.objects.create(title='Jazz standards', account=account)
+        mark_stale('forum', [self.forum.pk])
+        index_batch(10)
+
+    def terms(self, index, prefix):
+        return [term for term, weight in index.suggest(prefix, 10)]
+
+    def test_refresh_reads_titles_written_by_the_indexer(self):
+        index = SuggestionIndex()
+        index.refresh()
+        self.assertEqual(self.terms(index, 'jazz'), ['jazz standards'])
+        # The entry was last written long before the refresh watermark.
+        SearchDocument.objects.update(updated_at=timezone.now() - timedelta(days=1))
+
+        Forum.objects.filter(pk=self.forum.pk).update(title='Jazz ballads')
+        mark_stale('forum', [self.forum.pk])
+        index_batch(10)
+        index.refresh()
+
+        self.assertEqual(self.terms(index, 'jazz'), ['jazz ballads'])
+
+
+# Outdated pages are recomputed by another thread, which must see the committed cache rows.
+class SearchCacheTests(TransactionTestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.computed = []
+
+    def search(self, term):
+        def compute(normalized):
+            self.computed.append(normalized)
+            return {'general': {'count': len(self.computed)}}
+        return cached_search(term, 'general', 1, ['post', 'forum'], compute)
+
+    def test_pages_are_cached_by_normalized_term(self):
+        self.assertEqual(self.search('Jazz  Standards'), {'general': {'count': 1}})
+        self.assertEqual(self.search('jazz standards'), {'general': {'count': 1}})
+        self.assertEqual(self.computed, ['jazz standards'])
+        self.assertEqual((stats()['hits'], stats()['misses']), (1, 1))
+
+    def test_bumped_generations_outdate_pages(self):
+        self.search('jazz')
+        bump_generations(['forum'])
+        # The outdated page is served while it is recomputed in the background.
+        self.assertEqual(self.search('jazz'), {'general': {'count': 1}})
+        for thread in threading.enumerate():
+            if thread.name == 'search-cache':
+                thread.join()
+        self.assertEqual(self.search('jazz'), {'general': {'count': 2}})
+        self.assertEqual((stats()['hits'], stats()['stale_hits'], stats()['misses']), (1, 1, 1))
+
+    def test_stats_command(self):
+        self.search('jazz')
+        out = StringIO()
+        call_command('search_cache_stats', '--reset', stdout=out)
+        self.assertIn("0 hits, 0 stale hits, 1 misses", out.getvalue())
+        self.assertEqual(stats()['misses'], 0)
+
+    def test_process_local_caches_are_refused(self):
+        with self.settings(SEARCH_CACHE={**settings.SEARCH_CACHE, 'ALIAS': 'default'}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.search('jazz')
+
+    def test_unavailable_caches_are_bypassed(self):
+        cache = get_cache()
+        with mock.patch.object(cache, 'get_many', side_effect=ConnectionError), self.assertLogs('research.searchcache'):
+            self.assertEqual(self.search('jazz'), {'general': {'count': 1}})
+            self.assertEqual(self.search('jazz'), {'general': {'count': 2}})
+
+    def test_failed_bumps_are_logged(self):
+        cache = get_cache()
+        with mock.patch.object(cache, 'incr', side_effect=ConnectionError), self.assertLogs('research.searchcache'):
+            bump_generations(['forum'])
+
+
+class SearchIndexQueueTests(TestCase):
+    def test_only_committed_removals_outdate_cached_results(self):
+        with mock.patch('research.search.bump_generations') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                mark_stale('forum', [1, 2])
+                forget('post', [3])
+                bump.assert_not_called()
+        bump.assert_called_once_with(['post'])
+        self.assertEqual(
+            set(SearchDocument.objects.values_list('category', 'object_id', 'is_stale')),
+            {('forum', 1, True), ('forum', 2, True)},
+        )
+
+
+class UserAgentTests(SimpleTestCase):
+    def test_devices_systems_and_browsers_are_recognized(self):
+        agents = {
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/120.0 Safari/537.36 Edg/120.0': ('desktop', 'Windows', 'Edge'),
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) '
+            'Version/17.0 Mobile/15E148 Safari/604.1': ('mobile', 'iOS', 'Safari'),
+            'Mozilla/5.0 (Linux; Android 14; SM-X700) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/120.0 Safari/537.36': ('tablet', 'Android', 'Chrome'),
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)': ('bot', None, None),
+            '': (None, None, None),
+        }
+        for user_agent, expected in agents.items():
+            self.assertEqual(parse_user_agent(user_agent), expected)
+
+
+@override_settings(ANALYTICS_INGEST={**settings.ANALYTICS_INGEST, 'SYNC': True})
+class SearchLogTests(TestCase):
+    def request(self, ip_address='10.0.0.1', session_key=None):
+        request = RequestFactory().get(
+            '/research/search', {'context': 'header'}, REMOTE_ADDR=ip_address,
+            headers={'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0'},
+        )
+        request.session = mock.Mock(session_key=session_key)
+        return request
+
+    def search(self, request, term='jazz'):
+        with log_search(request, term, 'forum') as log:
+            log.results_count = 3
+
+    def test_searches_are_written_with_their_request_details(self):
+        self.search(self.request())
+        search = SearchHistory.objects.get()
+        self.assertEqual(
+            (search.search_term, search.category, search.results_count, search.search_context),
+            ('jazz', 'forum', 3, 'header'),
+        )
+        self.assertEqual((search.device_type, search.os, search.browser), ('desktop', 'Linux', 'Firefox'))
+        self.assertIsNotNone(search.search_duration)
+
+    def test_visitors_are_found_by_session_then_by_address(self):
+        self.search(self.request(session_key='abc'))
+        self.search(self.request(ip_address='10.0.0.2', session_key='abc'))
+        self.search(self.request(ip_address='10.0.0.3'))
+        self.search(self.request(ip_address='10.0.0.3'))
+        self.assertEqual(Visitor.objects.count(), 2)
+        by_visitor = SearchHistory.objects.values_list('user__session_id', 'user__ip_address').distinct()
+        self.assertEqual(set(by_visitor), {('abc', '10.0.0.1'), (None, '10.0.0.3')})
+
+    def test_failed_searches_are_not_logged(self):
+        with self.assertRaises(ValueError):
+            with log_search(self.request(), 'jazz'):
+                raise ValueError
+        self.assertFalse(SearchHistory.objects.exists())
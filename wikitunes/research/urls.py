@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import search, suggest
+
+urlpatterns = [
+    path('search', search, name='search'),
+    path('suggest', suggest, name='suggest'),
+]
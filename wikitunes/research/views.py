@@ -1,3 +1,54 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
 
-# Create your views here.
+from .search import CATEGORIES, search as search_items
+from .searchcache import cached_search
+from .searchlog import log_search
+from .suggest import suggest as suggest_terms
+
+
+@require_safe
+def search(request):
+    """
+    Returns one page of ranked full-text search results for every search category.
+
+    Query parameters: `q` (search terms, web search syntax), `category` (one of
+    SearchHistory.SEARCH_CATEGORIES, all of them by default) and `page`.
+    """
+    term = request.GET.get('q', '').strip()
+    if not term:
+        return JsonResponse({'detail': "q is required."}, status=400)
+    category = request.GET.get('category') or 'general'
+    if category not in CATEGORIES:
+        return JsonResponse({'detail': f"category must be one of {', '.join(CATEGORIES)}."}, status=400)
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return JsonResponse({'detail': "page must be an integer."}, status=400)
+    if page < 1:
+        return JsonResponse({'detail': "page must be at least 1."}, status=400)
+    depends_on = [name for name in CATEGORIES if name != 'general'] if category == 'general' else [category]
+    with log_search(request, term, category) as log:
+        results = cached_search(
+            term, category, page, depends_on, lambda normalized: search_items(normalized, page, category)
+        )
+        log.results_count = results['general']['count']
+    return JsonResponse({'query': term, 'page': page, 'results': results})
+
+
+@require_safe
+def suggest(request):
+    """
+    Returns type-ahead suggestions completing what the user typed.
+
+    Query parameters: `q` (the typed prefix) and `limit`. Suggestions are answered
+    from the in-memory prefix index of the process.
+    """
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'detail': "limit must be an integer."}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'detail': "limit must be at least 1."}, status=400)
+    prefix = request.GET.get('q', '')
+    return JsonResponse({'query': prefix, 'suggestions': suggest_terms(prefix, limit)})
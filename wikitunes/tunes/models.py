@@ -4,6 +4,7 @@ import uuid
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 from accounts.models import Account, Visitor
+from wikitunes.filecache import read_text
 
 def privilege_dir_path(instance, filename):
     return f"privileges/docs/{datetime.now().strftime('%Y/%m/%d')}/{filename}"
@@ -106,4 +107,11 @@ class Privilege(BaseModel):
     
     def __str__(self):
         return f"privilege for {self.owner}"
+
+    def get_description(self):
+        """
+        Returns the text of the privilege description, served from the process-wide file body cache.
+        """
+        return read_text(self.description)
+
     
\ No newline at end of file
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models.query_utils import DeferredAttribute
+from django.db.models.signals import pre_save
+
+from wikitunes.filecache import read_text
+
+
+class HybridTextDescriptor(DeferredAttribute):
+    """
+    Returns the inline body of a HybridTextField, or reads it from its file when it was spilled.
+    """
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if value is None:
+            return self.field.read_file(instance)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class HybridTextField(models.TextField):
+    """
+    Stores a text body inline in a database column, spilling it to a sibling FileField
+    when it is larger than a size threshold.
+
+    Reading the attribute returns the inline text, or the content of the file when the
+    body was spilled (or has not been moved inline yet, see the `inline_text_bodies`
+    management command). Assigning a text stores it inline on save when it fits,
+    otherwise it is written to the file and the column is set to NULL.
+    """
+    descriptor_class = HybridTextDescriptor
+
+    def __init__(self, *args, file_field=None, threshold=None, **kwargs):
+        """
+        Parameters:
+            file_field (str): Name of the FileField of the same model holding spilled bodies.
+            threshold (int): Maximum size in bytes of an inline body (settings.INLINE_TEXT_MAX_SIZE by default).
+        """
+        self.file_field = file_field
+        self._threshold = threshold
+        kwargs.setdefault('null', True)
+        kwargs.setdefault('blank', True)
+        super().__init__(*args, **kwargs)
+
+    @property
+    def threshold(self):
+        return self._threshold or settings.INLINE_TEXT_MAX_SIZE
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['file_field'] = self.file_field
+        if self._threshold is not None:
+            kwargs['threshold'] = self._threshold
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            pre_save.connect(self.spill_to_file, sender=cls)
+
+    def pre_save(self, model_instance, add):
+        # The column value, not the body read back from the file.
+        return model_instance.__dict__.get(self.attname)
+
+    def read_file(self, instance):
+        """
+        Reads the spilled body of `instance` from its file, once per file name.
+        """
+        fieldfile = getattr(instance, self.file_field)
+        if not fieldfile:
+            return ''
+        cache_name = f'_{self.attname}_file_cache'
+        cached = instance.__dict__.get(cache_name)
+        if cached is not None and cached[0] == fieldfile.name:
+            return cached[1]
+        text = read_text(fieldfile)
+        instance.__dict__[cache_name] = (fieldfile.name, text)
+        return text
+
+    def spill_to_file(self, sender, instance, raw=False, **kwargs):
+        """
+        Moves a body larger than the threshold to the file before the row is written.
+        """
+        value = instance.__dict__.get(self.attname)
+        if raw or value is None:
+            return
+        data = value.encode('utf-8')
+        if len(data) <= self.threshold:
+            return
+        cached = instance.__dict__.get(f'_{self.attname}_file_cache')
+        fieldfile = getattr(instance, self.file_field)
+        if not (fieldfile and cached and cached[0] == fieldfile.name and cached[1] == value):
+            previous = fieldfile.name
+            fieldfile.save(f'{self.name}.txt', ContentFile(data), save=False)
+            instance.__dict__[f'_{self.attname}_file_cache'] = (fieldfile.name, value)
+            if previous and previous != fieldfile.name:
+                # The previous body is only dropped once the row points to the new one.
+                storage = fieldfile.storage
+                transaction.on_commit(lambda: storage.delete(previous))
+        instance.__dict__[self.attname] = None
@@ -0,0 +1,131 @@
+import mmap
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class FileBodyCache:
+    """
+    Process-wide, byte-size bounded LRU cache of file-backed text bodies.
+
+    Entries are keyed by the storage path of the file and revalidated against its
+    mtime and size on every read, so a rewritten file is never served stale. Files
+    larger than `mmap_threshold` are decoded straight from a memory map, without
+    first copying their bytes. The size budget counts the memory of the decoded
+    strings, not the size of the files.
+    """
+    def __init__(self, max_bytes, max_entry_bytes, mmap_threshold):
+        """
+        Parameters:
+            max_bytes (int): Total memory of the cached bodies.
+            max_entry_bytes (int): Largest body that is cached, larger ones are always read from disk.
+            mmap_threshold (int): Files from this size on are read with mmap.
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.mmap_threshold = mmap_threshold
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def read(self, path):
+        """
+        Returns the text of the file at `path`, from memory when it did not change on disk.
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        text = self.read_file(path, stat.st_size)
+        size = sys.getsizeof(text)
+        if size <= self.max_entry_bytes:
+            self.store(path, version, text, size)
+        return text
+
+    def read_file(self, path, size):
+        """
+        Returns the decoded text of a file, decoding large files from a memory map.
+        """
+        with open(path, 'rb') as body:
+            if size < self.mmap_threshold or size == 0:
+                return body.read().decode('utf-8', errors='replace')
+            with mmap.mmap(body.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return str(mapped, 'utf-8', 'replace')
+
+    def store(self, path, version, text, size):
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+            self.entries[path] = (version, text, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and self.entries:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, path):
+        with self.lock:
+            entry = self.entries.pop(path, None)
+            if entry is not None:
+                self.current_bytes -= entry[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Returns the hit/miss/eviction counters and the current occupancy of the cache.
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+file_body_cache = FileBodyCache(
+    max_bytes=settings.FILE_BODY_CACHE['MAX_BYTES'],
+    max_entry_bytes=settings.FILE_BODY_CACHE['MAX_ENTRY_BYTES'],
+    mmap_threshold=settings.FILE_BODY_CACHE['MMAP_THRESHOLD'],
+)
+
+
+def read_text(fieldfile):
+    """
+    Returns the text content of a FieldFile, through the process-wide body cache when
+    its storage exposes local paths.
+
+    Parameters:
+        fieldfile: FieldFile of a FileField (e.g. Article.content_path).
+
+    Returns:
+        str: The decoded content, '' when no file is set.
+    """
+    if not fieldfile:
+        return ''
+    try:
+        path = fieldfile.storage.path(fieldfile.name)
+    except NotImplementedError:
+        # Remote storage: no mtime to revalidate against, read it directly.
+        with fieldfile.open('rb') as body:
+            return body.read().decode('utf-8', errors='replace')
+    return file_body_cache.read(path)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -186,11 +187,166 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5 MB
 
+# Resized/WebP renditions generated in background worker processes after upload
+IMAGE_DERIVATIVES = {
+    'FIELDS': {
+        'content.Image': 'upload',
+        'accounts.Account': 'profile_picture',
+        'research.Article': 'featured_image',
+        'research.Blog': 'cover_image',
+    },
+    'WIDTHS': [160, 320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'WORKERS': 2,
+}
+
+# Analytics events are queued per process and written in batches by a background thread
+ANALYTICS_INGEST = {
+    'SYNC': False,  # write every event immediately (e.g. in tests)
+    'MAX_QUEUE': 10000,  # queued events, further events are dropped
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'BLOCK_TIMEOUT': 0.05,  # seconds enqueue() waits for room in a full queue
+}
+
+# Monthly partitions of the analytics event tables (PostgreSQL), see `manage_partitions`
+ANALYTICS_PARTITIONS = {
+    'MONTHS_AHEAD': 3,  # future months partitions are created for
+    'RETENTION_MONTHS': 24,  # older partitions are dropped, 0 keeps everything
+}
+
+# Trending listings: event weights, score half-life and listing sizes, see analytics.trending
+TRENDING = {
+    'HALF_LIFE': timedelta(hours=24),
+    'WEIGHTS': {'view': 1.0, 'like': 3.0, 'share': 5.0, 'repost': 4.0, 'star': 1.0},  # 'star' is per reaction star
+    'TOP_K': 50,
+    'MIN_SCORE': 0.01,  # items whose decayed score falls below are forgotten at compaction
+}
+
+# Precomputed tag cloud: number of tags per listing and number of display sizes, see `refresh_tag_cloud`
+TAG_CLOUD = {
+    'TOP_K': 100,
+    'LEVELS': 5,
+}
+
+# Related content index (tag co-occurrence matrices), updated by `update_related_content`
+RELATED_CONTENT = {
+    'PATH': BASE_DIR / 'var' / 'related_content.npz',
+    'LIMIT': 10,  # related items returned by default
+    'MAX_LIMIT': 100,
+}
+
+# Full-text search (PostgreSQL text search configuration, page size), see research.search
+SEARCH = {
+    'CONFIG': 'english',
+    'PAGE_SIZE': 10,  # results per category and page
+    'MAX_BODY_CHARS': 200000,  # longer bodies are indexed truncated (tsvector values are limited to 1 MB)
+}
+
+# Search logging: SearchHistory rows are written by the analytics ingestion buffer, see research.searchlog
+SEARCH_LOG = {
+    'LOCATION_RADIUS_KM': 50,  # searches are attached to the nearest Location within this distance of their GeoIP position
+}
+
+# Caches. The search cache is shared by the web workers and the indexing command, its
+# table is created by the research migrations (a Redis or memcached backend also works).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'research_search_cache',
+    },
+}
+
+# Search result cache, see research.searchcache
+SEARCH_CACHE = {
+    'ALIAS': 'search',  # entry of CACHES holding the results and generation counters, a shared backend
+    'TTL': 300,  # seconds a cached page is fresh
+    'STALE_TTL': 3600,  # seconds an outdated page is still served while it is recomputed
+    'REBUILD_TIMEOUT': 30,  # seconds before another process may retry a stuck recomputation
+}
+
+# Search suggestions (in-memory prefix index per process), see research.suggest
+SUGGEST = {
+    'LIMIT': 8,  # suggestions returned by default
+    'MAX_LIMIT': 20,
+    'REFRESH_INTERVAL': 60,  # seconds between incremental refreshes
+    'REBUILD_INTERVAL': 6 * 3600,  # seconds between full rebuilds
+    'TITLES_OVERLAP': 600,  # seconds of title changes reread, covering indexing transactions committed late
+    'PRECOMPUTED_PREFIX': 2,  # completions of prefixes up to this length are precomputed
+    'MIN_SEARCHES': 2,  # searched terms are suggested once searched this many times
+    'WEIGHTS': {'search': 1.0, 'tag': 1.0, 'title': 2.0},
+}
+
+# "Near me" queries over locations, see locations.nearby
+NEARBY = {
+    'K': 20,  # locations returned by default
+    'MAX_K': 100,
+    'MAX_RADIUS': 200000,  # meters
+    'LINKED_LIMIT': 10,  # events and forums returned per location
+}
+
+# Vector tiles of the locations, see locations.tiles. Tiles up to CACHE_MAX_ZOOM
+# are kept on disk until a location drawn in them changes
+TILES = {
+    'CACHE_DIR': BASE_DIR / 'var' / 'tiles',
+    'MAX_ZOOM': 22,
+    'CACHE_MAX_ZOOM': 16,
+    'EXTENT': 4096,  # tile coordinate space
+    'BUFFER': 64,  # margin drawn around tiles, in tile coordinates
+    'MAX_AGE': 300,  # seconds browsers may reuse a tile
+}
+
+# Location clusters precomputed per zoom level, see locations.clusters
+CLUSTERS = {
+    'MAX_ZOOM': 16,  # deeper zoom levels are served from MAX_ZOOM
+    'CELLS_PER_TILE': 4,  # grid cells per tile side (64 px cells on 256 px tiles)
+    'MAX_CLUSTERS': 500,  # clusters returned per viewport
+}
+
+# Resumable chunked uploads of large media, the partial files must be on the same
+# filesystem as MEDIA_ROOT so that completed uploads are moved instead of copied
+CHUNKED_UPLOAD = {
+    'TEMP_DIR': BASE_DIR / 'media' / 'partial',
+    'MAX_SIZE': 2 * 1024 * 1024 * 1024,  # 2 GB
+    'BUFFER_SIZE': 1024 * 1024,  # bytes read from the request at a time
+    'EXPIRY': timedelta(days=1),  # unfinished uploads are purged after this delay
+}
+
+INLINE_TEXT_MAX_SIZE = 16 * 1024  # 16 KB, larger text bodies are spilled to files
+
+# Process-wide LRU cache of file-backed text bodies (articles, blogs, posts, privileges)
+FILE_BODY_CACHE = {
+    'MAX_BYTES': 64 * 1024 * 1024,  # 64 MB of decoded text per process
+    'MAX_ENTRY_BYTES': 4 * 1024 * 1024,  # larger decoded bodies are not cached
+    'MMAP_THRESHOLD': 256 * 1024,  # files from 256 KB on are decoded from a memory map
+}
+
 
 MEDIA_ROOT = BASE_DIR / 'media'  # Directory to store uploaded files
 
 MEDIA_URL = '/media/'           # URL to access uploaded files
 
+# Uploads are stored once per content (SHA-256 blobs), upload_to names are hard links to them
+STORAGES = {
+    'default': {
+        'BACKEND': 'wikitunes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Video/audio streaming: OFFLOAD is None (sendfile through wsgi.file_wrapper),
+# 'x-accel-redirect' (nginx, internal location at ACCEL_PREFIX) or 'x-sendfile' (Apache/lighttpd)
+MEDIA_STREAMING = {
+    'OFFLOAD': os.getenv('MEDIA_STREAMING_OFFLOAD') or None,
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
 GDAL_LIBRARY_PATH = os.getenv('GDAL_LIBRARY_PATH', r'C:/OSGeo4W/bin/gdal309.dll')
 
 GEOS_LIBRARY_PATH = "C:/OSGeo4W/bin/geos_c.dll"
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def unshare(path):
+    """
+    Gives the file at `path` an inode of its own when it shares one with other names,
+    so that it can be modified in place without changing them.
+    """
+    if os.stat(path).st_nlink <= 1:
+        return
+    fd, copy = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copy2(path, copy)
+        os.replace(copy, path)
+    except BaseException:
+        os.remove(copy)
+        raise
+
+
+@deconstructible(path='wikitunes.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage keeping a single copy of identical uploads.
+
+    The bytes of every saved file are stored once as a blob named after their SHA-256
+    (under `.blobs/` in the storage root), and the name handed out by the upload_to
+    functions (e.g. `account_<id>/images/...`) is a hard link to that blob. Uploading
+    a file that is already stored therefore only adds a directory entry. The link
+    count of a blob is its reference count: deleting a file only removes its name,
+    blobs no longer referenced by any name are removed by the `gc_media_blobs`
+    management command.
+
+    Files are never modified in place, a saved file must not be opened for writing
+    since that would change every name sharing its blob.
+    """
+    blob_dir = '.blobs'
+    hash_buffer_size = 1024 * 1024
+
+    @property
+    def blob_root(self):
+        return os.path.join(self.location, self.blob_dir)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_root, digest[:2], digest[2:4], digest)
+
+    def references(self, name):
+        """
+        Returns the number of names sharing the blob of the file `name`.
+        """
+        return os.stat(self.path(name)).st_nlink - 1
+
+    def file_digest(self, path):
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as source:
+            while data := source.read(self.hash_buffer_size):
+                hasher.update(data)
+        return hasher.hexdigest()
+
+    def make_directory(self, directory):
+        try:
+            if self.directory_permissions_mode is not None:
+                # os.makedirs() does not apply the mode to intermediate directories.
+                old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+                try:
+                    os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+                finally:
+                    os.umask(old_umask)
+            else:
+                os.makedirs(directory, exist_ok=True)
+        except FileExistsError:
+            raise FileExistsError("%s exists and is not a directory." % directory)
+
+    def spool(self, content):
+        """
+        Writes `content` to a temporary file next to the blobs, hashing it on the way.
+
+        Returns:
+            tuple: (path of the temporary file, hex SHA-256 of the content)
+        """
+        self.make_directory(self.blob_root)
+        fd, path = tempfile.mkstemp(dir=self.blob_root, suffix='.tmp')
+        hasher = hashlib.sha256()
+        with os.fdopen(fd, 'wb') as spooled:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                hasher.update(chunk)
+                spooled.write(chunk)
+        return path, hasher.hexdigest()
+
+    def store_blob(self, source, digest):
+        """
+        Stores the file at `source` as the blob of `digest`, unless it is already stored.
+
+        Returns:
+            str: Absolute path of the blob.
+        """
+        blob = self.blob_path(digest)
+        self.make_directory(os.path.dirname(blob))
+        try:
+            os.link(source, blob)
+        except FileExistsError:
+            # Same content uploaded before.
+            pass
+        except OSError:
+            # The source is on another file system (e.g. a temporary upload in /tmp).
+            fd, copy = tempfile.mkstemp(dir=self.blob_root, suffix='.tmp')
+            os.close(fd)
+            try:
+                shutil.copyfile(source, copy)
+                try:
+                    os.link(copy, blob)
+                except FileExistsError:
+                    pass
+            finally:
+                os.remove(copy)
+        if self.file_permissions_mode is not None:
+            os.chmod(blob, self.file_permissions_mode)
+        return blob
+
+    def link_name(self, blob, name):
+        """
+        Creates `name` as a new reference to `blob`, picking another name when it is taken.
+
+        Returns:
+            str: The name actually created.
+        """
+        full_path = self.path(name)
+        self.make_directory(os.path.dirname(full_path))
+        while True:
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                if self._allow_overwrite:
+                    os.remove(full_path)
+                else:
+                    name = self.get_available_name(name)
+                    full_path = self.path(name)
+            except FileNotFoundError:
+                # The blob was collected meanwhile, the caller stores it again.
+                raise
+            except OSError:
+                # Too many links to the blob or no hard link support: fall back to a copy.
+                shutil.copyfile(blob, full_path)
+                return name
+            else:
+                return name
+
+    def _save(self, name, content):
+        if hasattr(content, 'temporary_file_path'):
+            # Uploads already on disk are linked (or moved) instead of being copied.
+            source = content.temporary_file_path()
+            digest = self.file_digest(source)
+        else:
+            source, digest = self.spool(content)
+        try:
+            for attempt in range(3):
+                blob = self.store_blob(source, digest)
+                try:
+                    name = self.link_name(blob, name)
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
+                raise OSError(f"Could not store the blob of {name}.")
+        finally:
+            os.remove(source)
+
+        full_path = self.path(name)
+        self._ensure_location_group_id(full_path)
+        # Store filenames with forward slashes, even on Windows.
+        return str(os.path.relpath(full_path, self.location)).replace('\\', '/')
+
+    def adopt(self, name):
+        """
+        Turns an existing file saved before the storage was content addressed into a
+        reference to its blob, freeing its space when the blob was already stored.
+
+        Only immutable files may be adopted: a file that is later written in place
+        (e.g. a partial upload) would change every name sharing its blob.
+
+        Returns:
+            bool: Whether the file was a duplicate of an already stored blob.
+        """
+        full_path = self.path(name)
+        if os.stat(full_path).st_nlink > 1:
+            return False
+        digest = self.file_digest(full_path)
+        blob = self.blob_path(digest)
+        duplicate = os.path.exists(blob)
+        blob = self.store_blob(full_path, digest)
+        if not os.path.samefile(blob, full_path):
+            fd, link = tempfile.mkstemp(dir=os.path.dirname(full_path), suffix='.tmp')
+            os.close(fd)
+            os.remove(link)
+            os.link(blob, link)
+            os.replace(link, full_path)
+        return duplicate
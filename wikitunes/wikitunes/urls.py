@@ -17,7 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from locations.views import tile
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('tunes/', include('tunes.urls')),
+    path('content/', include('content.urls')),
+    path('analytics/', include('analytics.urls')),
+    path('research/', include('research.urls')),
+    path('locations/', include('locations.urls')),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', tile, name='location-tile'),
 ]